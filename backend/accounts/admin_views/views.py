@@ -35,6 +35,7 @@ def toggle_account_status(request, account_id):
 
     account.is_active = not account.is_active
     account.save()
+    delete_account_cache(account.id)
 
     return JsonResponse({
         'message': f'Cập nhật trạng thái thành công!',
@@ -1,3 +1,4 @@
+import logging
 from random import random
 from django.core.cache import cache
 from django.core.mail import send_mail
@@ -11,8 +12,13 @@ from rest_framework_simplejwt.exceptions import TokenError
 from accounts.models import Account, User
 from accounts.serializers import UserSerializer
 from backend import settings
+from cart.guest import merge_guest_cart
+from utils.cache_fetch import get_or_build
+from utils.cache_tags import user_tag, ACCOUNT_TAG
 from utils.delete_cache import delete_account_cache
 
+logger = logging.getLogger(__name__)
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -98,6 +104,15 @@ def login_view(request):
     # Lấy User liên kết
     user = User.objects.filter(account=account).first()
 
+    # Gộp giỏ của khách (nếu có) vào giỏ tài khoản; lỗi không chặn đăng nhập
+    cart_merged = 0
+    guest_token = data.get("guest_token")
+    if guest_token:
+        try:
+            cart_merged = merge_guest_cart(guest_token, account)
+        except Exception:
+            logger.exception("Lỗi gộp giỏ hàng của tài khoản %s", account.id)
+
     # Tạo token
     refresh = RefreshToken.for_user(account)
 
@@ -105,6 +120,7 @@ def login_view(request):
         "message": "success",
         "access_token": str(refresh.access_token),
         "refresh_token": str(refresh),
+        "cart_merged": cart_merged,
         "user": {
             'id': account.id,
             'username': account.username,
@@ -155,13 +171,11 @@ def refresh_token_view(request):
 @permission_classes([IsAuthenticated])
 def get_user_info(request, account_id):
     try:
-        cache_key = f"user_{account_id}"
-        data = cache.get(cache_key)
-
-        if data is None:
+        def build():
             user = User.objects.get(account_id=account_id)
-            data = UserSerializer(user).data
-            cache.set(cache_key, data, timeout=86400)
+            return UserSerializer(user).data
+
+        data = get_or_build(f"user_{account_id}", build, tags=(user_tag(ACCOUNT_TAG, account_id),))
 
         return JsonResponse({"user": data}, status=200)
 
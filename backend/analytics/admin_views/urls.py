@@ -0,0 +1,6 @@
+from django.urls import path
+from analytics.admin_views import views
+
+urlpatterns = [
+    path('dashboard/', views.get_dashboard),
+]
@@ -0,0 +1,27 @@
+import logging
+from django.http import JsonResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from analytics.reports import sales_summary
+from utils.cache_fetch import get_or_build
+
+logger = logging.getLogger(__name__)
+
+MAX_DASHBOARD_DAYS = 366
+DASHBOARD_TIMEOUT = 60
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_dashboard(request):
+    try:
+        days = max(1, min(int(request.query_params.get("days", 30)), MAX_DASHBOARD_DAYS))
+    except ValueError:
+        return JsonResponse({"error": "days không hợp lệ"}, status=400)
+
+    try:
+        data = get_or_build(f"analytics_dashboard_{days}", lambda: sales_summary(days), timeout=DASHBOARD_TIMEOUT)
+        return JsonResponse({"success": True, "data": data}, status=200)
+    except Exception as e:
+        logger.exception("Lỗi tính số liệu dashboard %s ngày", days)
+        return JsonResponse({"error": str(e)}, status=500)
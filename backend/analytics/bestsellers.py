@@ -0,0 +1,112 @@
+import logging
+from collections import defaultdict
+from django.db.models import Sum
+from django.utils import timezone
+from django_redis import get_redis_connection
+from analytics.models import ProductSalesDaily
+from analytics.reports import date_range
+from products.models import Product
+
+logger = logging.getLogger(__name__)
+
+# Bảng xếp hạng bán chạy trong Redis sorted set, đọc top-K bằng 1 lệnh ZREVRANGE.
+# - Mỗi cửa sổ (7 / 30 ngày) có 1 bảng chung và 1 bảng cho từng category.
+# - Điểm = số lượng bán có giảm dần theo tuổi: đơn bán hôm nay tính 1, cứ HALF_LIFE ngày giảm 1 nửa.
+# - Hòa điểm thì sản phẩm có average_rating cao hơn đứng trước: điểm lưu dạng
+#   round(units * 100) * RATING_SLOTS + round(rating * 100), phần rating không vượt được 0.01 sản phẩm.
+# - rebuild_rankings tính lại toàn bộ từ ProductSalesDaily (chạy định kỳ, lệnh rebuild_bestsellers);
+#   giữa 2 lần tính lại, mỗi đơn mới / đơn hủy được cộng / trừ thẳng vào bảng (record_sales).
+
+WINDOWS = {7: 3, 30: 10}  # số ngày -> half-life (ngày)
+DEFAULT_WINDOW = 30
+UNIT_SCALE = 100
+RATING_SLOTS = 1000
+
+
+def ranking_key(window, category_id=None):
+    if category_id is None:
+        return f"bestsellers:{window}:all"
+    return f"bestsellers:{window}:cat:{category_id}"
+
+
+def _score(units, rating=0):
+    return round(units * UNIT_SCALE) * RATING_SLOTS + round((rating or 0) * 100)
+
+
+def _weight(age_days, half_life):
+    return 0.5 ** (age_days / half_life)
+
+
+def rebuild_rankings():
+    """Tính lại mọi bảng xếp hạng; ghi vào key tạm rồi RENAME nên người đọc không thấy bảng rỗng."""
+    redis = get_redis_connection("default")
+    today = timezone.localdate()
+    longest = max(WINDOWS)
+    start, _ = date_range(longest)
+
+    rows = ProductSalesDaily.objects.filter(date__gte=start).values("date", "product_id").annotate(
+        units=Sum("units")
+    )
+    products = {
+        p["id"]: p for p in Product.objects.filter(status="Active").values("id", "category_id", "average_rating")
+    }
+
+    scores = {window: defaultdict(float) for window in WINDOWS}
+    for row in rows:
+        if row["product_id"] not in products or row["units"] <= 0:
+            continue
+        age = (today - row["date"]).days
+        for window, half_life in WINDOWS.items():
+            if age < window:
+                scores[window][row["product_id"]] += row["units"] * _weight(age, half_life)
+
+    old_keys = set()
+    for pattern in ("bestsellers:*:all", "bestsellers:*:cat:*"):
+        old_keys.update(k.decode() if isinstance(k, bytes) else k for k in redis.scan_iter(pattern))
+
+    pipe = redis.pipeline(transaction=True)
+    new_keys = set()
+    for window, product_scores in scores.items():
+        tables = defaultdict(dict)
+        for product_id, units in product_scores.items():
+            product = products[product_id]
+            score = _score(units, product["average_rating"])
+            tables[ranking_key(window)][product_id] = score
+            tables[ranking_key(window, product["category_id"])][product_id] = score
+
+        for key, members in tables.items():
+            tmp_key = f"{key}:tmp"
+            pipe.delete(tmp_key)
+            pipe.zadd(tmp_key, members)
+            pipe.rename(tmp_key, key)
+            new_keys.add(key)
+
+    stale = old_keys - new_keys
+    if stale:
+        pipe.delete(*stale)
+    pipe.execute()
+    return {window: len(product_scores) for window, product_scores in scores.items()}
+
+
+def record_sales(product_units, sign=1):
+    # product_units: {(product_id, category_id): units}; bán hôm nay nên trọng số = 1
+    if not product_units:
+        return
+    try:
+        redis = get_redis_connection("default")
+        pipe = redis.pipeline(transaction=False)
+        for (product_id, category_id), units in product_units.items():
+            delta = sign * units * UNIT_SCALE * RATING_SLOTS
+            for window in WINDOWS:
+                pipe.zincrby(ranking_key(window), delta, product_id)
+                pipe.zincrby(ranking_key(window, category_id), delta, product_id)
+        pipe.execute()
+    except Exception:
+        # Bảng xếp hạng sẽ đúng lại ở lần rebuild kế tiếp
+        logger.exception("Không cập nhật được bảng xếp hạng bán chạy")
+
+
+def top_products(limit, window=DEFAULT_WINDOW, category_id=None):
+    redis = get_redis_connection("default")
+    ids = redis.zrevrangebyscore(ranking_key(window, category_id), "+inf", f"({RATING_SLOTS}", start=0, num=limit)
+    return [int(pid) for pid in ids]
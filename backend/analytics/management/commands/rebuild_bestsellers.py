@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from analytics.bestsellers import rebuild_rankings
+from utils.cache_tags import PRODUCT_TAG, invalidate_tags
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại bảng xếp hạng bán chạy (Redis sorted set) từ bảng ProductSalesDaily. "
+        "Nên chạy định kỳ (vd. mỗi giờ qua cron) để áp dụng giảm dần theo thời gian và rating mới."
+    )
+
+    def handle(self, *args, **options):
+        counts = rebuild_rankings()
+        invalidate_tags(PRODUCT_TAG)
+        for window, count in counts.items():
+            self.stdout.write(f"{window} ngày: {count} sản phẩm")
+        self.stdout.write(self.style.SUCCESS("Đã tính lại bảng xếp hạng bán chạy"))
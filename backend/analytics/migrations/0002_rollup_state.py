@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+CANCELLED_STATUSES = ["Cancelled", "Đã hủy"]
+
+
+def mark_existing_orders(apps, schema_editor):
+    # Rollup hiện có đã tính mọi đơn cũ (backfill + sự kiện), ghi lại trạng thái tương ứng;
+    # đơn còn sự kiện "created" chưa xử lý thì để sự kiện đó cộng như bình thường
+    Order = apps.get_model("orders", "Order")
+    OrderRollupState = apps.get_model("analytics", "OrderRollupState")
+    orders = Order.objects.exclude(events__event_type="created", events__processed_at__isnull=True)
+    rows = []
+    for order_id, ship_status in orders.values_list("id", "ship_status").iterator(chunk_size=1000):
+        rows.append(OrderRollupState(order_id=order_id, cancelled=ship_status in CANCELLED_STATUSES))
+        if len(rows) >= 1000:
+            OrderRollupState.objects.bulk_create(rows)
+            rows = []
+    OrderRollupState.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('orders', '0008_order_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRollupState',
+            fields=[
+                ('order_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('cancelled', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupLock',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.RunPython(mark_existing_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+from django.db import models
+from accounts.models import Account
+
+# Bảng số liệu bán hàng tính sẵn (rollup), cộng dồn theo từng đơn bởi analytics.rollups.
+# Đơn bị hủy được trừ lại vào đúng bucket của ngày / giờ đặt đơn.
+# product_id / variant_id / category_id / voucher_id là số nguyên thường (không phải ForeignKey)
+# để xóa sản phẩm / voucher không xóa theo số liệu đã bán.
+
+
+class HourlySales(models.Model):
+    hour = models.DateTimeField(unique=True)  # đầu giờ, theo TIME_ZONE
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}h"
+
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}"
+
+
+class ProductSalesDaily(models.Model):
+    date = models.DateField()
+    variant_id = models.IntegerField()
+    product_id = models.IntegerField()
+    category_id = models.IntegerField()
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("date", "variant_id")
+        indexes = [
+            models.Index(fields=["date", "product_id"]),
+            models.Index(fields=["date", "category_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - product {self.product_id} / variant {self.variant_id}"
+
+
+class VoucherUsageDaily(models.Model):
+    date = models.DateField()
+    voucher_id = models.IntegerField()
+    uses = models.IntegerField(default=0)
+    discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("date", "voucher_id")
+
+    def __str__(self):
+        return f"{self.date} - voucher {self.voucher_id}"
+
+
+class CustomerStats(models.Model):
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, primary_key=True, related_name='sales_stats')
+    order_count = models.IntegerField(default=0)  # không tính đơn đã hủy
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_count = models.IntegerField(default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Stats {self.account_id}"
+
+
+class OrderRollupState(models.Model):
+    # Đơn nào đã được cộng vào rollup (và đã trừ lại khi hủy chưa): record_order dựa vào đây để
+    # sự kiện chạy lại / sự kiện đến sau backfill không cộng trừ 2 lần
+    order_id = models.IntegerField(primary_key=True)
+    cancelled = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Order {self.order_id}"
+
+
+class RollupLock(models.Model):
+    # 1 dòng dùng làm khóa (SELECT ... FOR UPDATE): record_order và backfill không chạy chồng lên nhau
+    name = models.CharField(max_length=50, primary_key=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from django.db.models import Sum
+from django.utils import timezone
+from analytics.models import CustomerStats, DailySales, HourlySales, ProductSalesDaily, VoucherUsageDaily
+from categories.models import Category
+from products.models import Product
+from voucher.models import Voucher
+
+# Các hàm đọc số liệu cho dashboard / best-seller / thống kê khách hàng.
+# Chỉ đọc bảng rollup (mỗi ngày vài dòng), không quét bảng đơn hàng.
+
+
+def date_range(days):
+    today = timezone.localdate()
+    return today - timedelta(days=days - 1), today
+
+
+def top_product_ids(days=30, limit=32, category_id=None):
+    start, end = date_range(days)
+    rows = ProductSalesDaily.objects.filter(date__range=(start, end))
+    if category_id is not None:
+        rows = rows.filter(category_id=category_id)
+    rows = rows.values("product_id").annotate(
+        total=Sum("units")
+    ).filter(total__gt=0).order_by("-total", "product_id")[:limit]
+    return [row["product_id"] for row in rows]
+
+
+def sales_summary(days=30, top=10):
+    start, end = date_range(days)
+    daily = list(DailySales.objects.filter(date__range=(start, end)).order_by("date").values(
+        "date", "revenue", "order_count", "units", "discount_amount", "cancelled_count"
+    ))
+    totals = {
+        field: sum(row[field] for row in daily)
+        for field in ("revenue", "order_count", "units", "discount_amount", "cancelled_count")
+    }
+
+    since = timezone.now() - timedelta(hours=24)
+    hourly = list(HourlySales.objects.filter(hour__gte=since).order_by("hour").values(
+        "hour", "revenue", "order_count", "units"
+    ))
+
+    products = ProductSalesDaily.objects.filter(date__range=(start, end))
+    top_products = list(products.values("product_id").annotate(
+        units=Sum("units"), revenue=Sum("revenue")
+    ).order_by("-revenue")[:top])
+    names = dict(Product.objects.filter(id__in=[p["product_id"] for p in top_products]).values_list("id", "name"))
+    for row in top_products:
+        row["name"] = names.get(row["product_id"], "")
+
+    top_categories = list(products.values("category_id").annotate(
+        units=Sum("units"), revenue=Sum("revenue")
+    ).order_by("-revenue")[:top])
+    names = dict(Category.objects.filter(id__in=[c["category_id"] for c in top_categories]).values_list("id", "name"))
+    for row in top_categories:
+        row["name"] = names.get(row["category_id"], "")
+
+    vouchers = list(VoucherUsageDaily.objects.filter(date__range=(start, end)).values("voucher_id").annotate(
+        uses=Sum("uses"), discount_amount=Sum("discount_amount")
+    ).order_by("-uses")[:top])
+    codes = dict(Voucher.objects.filter(id__in=[v["voucher_id"] for v in vouchers]).values_list("id", "code"))
+    for row in vouchers:
+        row["code"] = codes.get(row["voucher_id"], "")
+
+    return {
+        "from": start,
+        "to": end,
+        "totals": totals,
+        "daily": daily,
+        "hourly": hourly,
+        "top_products": top_products,
+        "top_categories": top_categories,
+        "vouchers": vouchers,
+    }
+
+
+def customer_stats(account_id):
+    stats = CustomerStats.objects.filter(account_id=account_id).first()
+    if not stats:
+        return None
+    return {
+        "order_count": stats.order_count,
+        "total_spent": stats.total_spent,
+        "cancelled_count": stats.cancelled_count,
+        "last_order_at": stats.last_order_at,
+    }
@@ -0,0 +1,192 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from analytics.bestsellers import record_sales
+from analytics.models import (
+    CustomerStats, DailySales, HourlySales, OrderRollupState, ProductSalesDaily, RollupLock, VoucherUsageDaily,
+)
+from orders.models import CANCELLED_STATUSES, Order, OrderItem
+
+# Cập nhật bảng rollup theo từng đơn:
+# - record_order(order_id, +1) khi tạo đơn, record_order(order_id, -1) khi hủy đơn.
+# - Các số cộng dồn bằng UPDATE ... SET x = x + delta nên nhiều worker ghi cùng bucket không mất số.
+# - Được gọi từ outbox sự kiện đơn hàng (orders.events), ngoài transaction của checkout nên
+#   checkout không phải chờ lock trên dòng rollup nóng; số liệu lệch thì lệnh backfill_analytics tính lại.
+# backfill dùng cùng hàm Rollup.add nên số liệu tăng dần và số liệu tính lại luôn giống nhau.
+# - record_order và backfill cùng giữ lock_rollups() nên không ghi chồng lên nhau; OrderRollupState
+#   ghi lại đơn nào đã được tính, nên sự kiện bị chặn trong lúc backfill (hoặc chạy lại) không cộng 2 lần.
+
+
+def buckets(order_date):
+    local = timezone.localtime(order_date)
+    return local.replace(minute=0, second=0, microsecond=0), local.date()
+
+
+class Rollup:
+    """Gom delta của nhiều đơn theo từng dòng rollup."""
+
+    def __init__(self):
+        self.hourly = defaultdict(lambda: defaultdict(int))
+        self.daily = defaultdict(lambda: defaultdict(int))
+        self.products = defaultdict(lambda: defaultdict(int))
+        self.vouchers = defaultdict(lambda: defaultdict(int))
+        self.customers = defaultdict(lambda: defaultdict(int))
+        self.last_order_at = {}
+        self.orders = {}  # order_id -> đã hủy (chỉ dùng khi backfill)
+
+    def add(self, order, items, sign=1, cancelled=False):
+        # items: [(variant_id, product_id, category_id, quantity, price)]
+        # sign=-1 + cancelled=True: trừ lại đơn đã cộng trước đó và đếm 1 đơn hủy
+        hour, day = buckets(order.order_date)
+        units = sum(qty for _, _, _, qty, _ in items)
+        subtotal = sum((price * qty for _, _, _, qty, price in items), Decimal(0))
+        discount = max(subtotal - order.total_amount, 0) if order.voucher_id else Decimal(0)
+
+        for row in (self.hourly[hour], self.daily[day]):
+            row["revenue"] += sign * order.total_amount
+            row["order_count"] += sign
+            row["units"] += sign * units
+        self.daily[day]["discount_amount"] += sign * discount
+
+        for variant_id, product_id, category_id, qty, price in items:
+            if variant_id is None:
+                continue  # variant đã bị xóa, chỉ còn trong tổng đơn
+            row = self.products[(day, variant_id, product_id, category_id)]
+            row["units"] += sign * qty
+            row["revenue"] += sign * price * qty
+
+        if order.voucher_id:
+            row = self.vouchers[(day, order.voucher_id)]
+            row["uses"] += sign
+            row["discount_amount"] += sign * discount
+
+        customer = self.customers[order.customer_id]
+        customer["order_count"] += sign
+        customer["total_spent"] += sign * order.total_amount
+        if cancelled:
+            self.daily[day]["cancelled_count"] += 1
+            customer["cancelled_count"] += 1
+        if order.customer_id not in self.last_order_at or order.order_date > self.last_order_at[order.customer_id]:
+            self.last_order_at[order.customer_id] = order.order_date
+
+    def add_final(self, order, items):
+        # Trạng thái cuối của đơn (backfill): đơn đã hủy = cộng rồi trừ lại
+        cancelled = order.ship_status in CANCELLED_STATUSES
+        self.add(order, items)
+        if cancelled:
+            self.add(order, items, sign=-1, cancelled=True)
+        self.orders[order.id] = cancelled
+
+    def product_units(self):
+        # {(product_id, category_id): units} cho bảng xếp hạng bán chạy
+        units = defaultdict(int)
+        for (_, _, product_id, category_id), values in self.products.items():
+            units[(product_id, category_id)] += values["units"]
+        return dict(units)
+
+    def rows(self):
+        for hour, values in self.hourly.items():
+            yield HourlySales, {"hour": hour}, values
+        for day, values in self.daily.items():
+            yield DailySales, {"date": day}, values
+        for (day, variant_id, product_id, category_id), values in self.products.items():
+            yield ProductSalesDaily, {"date": day, "variant_id": variant_id}, dict(
+                values, product_id=product_id, category_id=category_id
+            )
+        for (day, voucher_id), values in self.vouchers.items():
+            yield VoucherUsageDaily, {"date": day, "voucher_id": voucher_id}, values
+
+
+def order_items(order_ids):
+    items = defaultdict(list)
+    rows = OrderItem.objects.filter(order_id__in=order_ids).values_list(
+        "order_id", "product_variant_id", "product_variant__product_id",
+        "product_variant__product__category_id", "quantity", "price",
+    )
+    for order_id, *item in rows:
+        items[order_id].append(tuple(item))
+    return items
+
+
+def _increment(model, key, values):
+    # product_id / category_id của ProductSalesDaily chỉ ghi khi tạo dòng
+    counters = {f: v for f, v in values.items() if f not in ("product_id", "category_id")}
+    changes = {f: F(f) + v for f, v in counters.items()}
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **values)
+    except IntegrityError:
+        # Worker khác vừa tạo dòng này
+        model.objects.filter(**key).update(**changes)
+
+
+def apply_increments(rollup):
+    with transaction.atomic():
+        for model, key, values in rollup.rows():
+            _increment(model, key, values)
+
+        for account_id, values in rollup.customers.items():
+            stats, _ = CustomerStats.objects.select_for_update().get_or_create(account_id=account_id)
+            stats.order_count += values["order_count"]
+            stats.total_spent += values["total_spent"]
+            stats.cancelled_count += values["cancelled_count"]
+            last = rollup.last_order_at[account_id]
+            if stats.last_order_at is None or last > stats.last_order_at:
+                stats.last_order_at = last
+            stats.save()
+
+
+def lock_rollups():
+    # Gọi trong transaction; giữ tới khi transaction kết thúc
+    RollupLock.objects.get_or_create(name="rollups")
+    return RollupLock.objects.select_for_update().get(name="rollups")
+
+
+def replace_all(rollup):
+    # Dùng cho backfill: xóa toàn bộ rollup rồi ghi lại từ đầu
+    # Caller phải giữ lock_rollups() từ trước khi đọc đơn hàng tới khi ghi xong
+    models = [HourlySales, DailySales, ProductSalesDaily, VoucherUsageDaily, CustomerStats, OrderRollupState]
+    rows = defaultdict(list)
+    for model, key, values in rollup.rows():
+        rows[model].append(model(**key, **values))
+    for account_id, values in rollup.customers.items():
+        rows[CustomerStats].append(CustomerStats(
+            account_id=account_id, last_order_at=rollup.last_order_at[account_id], **values
+        ))
+    rows[OrderRollupState] = [
+        OrderRollupState(order_id=order_id, cancelled=cancelled) for order_id, cancelled in rollup.orders.items()
+    ]
+
+    with transaction.atomic():
+        for model in models:
+            model.objects.all().delete()
+            model.objects.bulk_create(rows[model], batch_size=1000)
+    return {model.__name__: len(rows[model]) for model in models}
+
+
+def record_order(order_id, sign=1):
+    with transaction.atomic():
+        lock_rollups()
+        order = Order.objects.filter(id=order_id).first()
+        if not order:
+            return
+        state = OrderRollupState.objects.filter(order_id=order_id).first()
+        if sign > 0:
+            if state is not None:
+                return  # đã được tính (backfill hoặc sự kiện chạy lại)
+            OrderRollupState.objects.create(order_id=order_id)
+        else:
+            if state is None or state.cancelled:
+                return  # chưa từng được cộng, hoặc đã trừ rồi
+            state.cancelled = True
+            state.save(update_fields=["cancelled"])
+
+        rollup = Rollup()
+        rollup.add(order, order_items([order_id])[order_id], sign=sign, cancelled=sign < 0)
+        apply_increments(rollup)
+    record_sales(rollup.product_units())
+
@@ -0,0 +1,187 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import Account, User
+from analytics.models import CustomerStats, DailySales, HourlySales, ProductSalesDaily, VoucherUsageDaily
+from analytics.rollups import buckets, record_order
+from categories.models import Category
+from customers.models import CustomerAddress
+from orders.models import Order, OrderItem
+from products.models import Product, ProductVariant
+from voucher.models import Voucher
+
+
+@mock.patch("analytics.rollups.record_sales")
+class RollupTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Áo", status="Active")
+        self.product = Product.objects.create(
+            category=self.category, name="Áo thun", current_price=100000, description="", status="Active",
+            product_img="products/ao-thun.jpg",
+        )
+        self.variants = [
+            ProductVariant.objects.create(
+                product=self.product, sku=f"AO-{size}", size=size, color="Đen", stock_quantity=10, status="Active",
+            ) for size in ["S", "M"]
+        ]
+        self.account = Account.objects.create(username="khach")
+        self.address = CustomerAddress.objects.create(
+            account=self.account, receiver_name="Khách", phone="0900000000",
+            province="Hà Nội", ward="Phường 1", district="Quận 1", address_detail="1 Phố Huế",
+        )
+        now = timezone.now()
+        self.voucher = Voucher.objects.create(
+            code="GIAM50", discount_type="fixed", discount_value=50000, quantity=10,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+
+    def create_order(self, voucher=None, total=300000):
+        # 1 x S + 2 x M, giá 100000
+        order = Order.objects.create(
+            customer=self.account, address=self.address, ship_method="standard", payment_method="cod", note="",
+            total_amount=total, voucher=voucher,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_variant=self.variants[0], quantity=1, price=100000),
+            OrderItem(order=order, product_variant=self.variants[1], quantity=2, price=100000),
+        ])
+        return order
+
+    def cancel(self, order):
+        order.ship_status = "Cancelled"
+        order.save(update_fields=["ship_status"])
+
+    def snapshot(self):
+        return {
+            "hourly": list(HourlySales.objects.order_by("hour").values("hour", "revenue", "order_count", "units")),
+            "daily": list(DailySales.objects.order_by("date").values(
+                "date", "revenue", "order_count", "units", "discount_amount", "cancelled_count"
+            )),
+            "products": list(ProductSalesDaily.objects.order_by("date", "variant_id").values(
+                "date", "variant_id", "product_id", "category_id", "units", "revenue"
+            )),
+            "vouchers": list(VoucherUsageDaily.objects.order_by("date", "voucher_id").values(
+                "date", "voucher_id", "uses", "discount_amount"
+            )),
+            "customers": list(CustomerStats.objects.order_by("account_id").values(
+                "account_id", "order_count", "total_spent", "cancelled_count", "last_order_at"
+            )),
+        }
+
+    def backfill(self):
+        with mock.patch("analytics.management.commands.backfill_analytics.rebuild_rankings"):
+            call_command("backfill_analytics", stdout=StringIO())
+
+    def test_created_order_updates_every_rollup(self, record_sales):
+        order = self.create_order(voucher=self.voucher, total=250000)
+        record_order(order.id)
+
+        hour, day = buckets(order.order_date)
+        daily = DailySales.objects.get(date=day)
+        self.assertEqual((daily.revenue, daily.order_count, daily.units), (Decimal(250000), 1, 3))
+        self.assertEqual((daily.discount_amount, daily.cancelled_count), (Decimal(50000), 0))
+        hourly = HourlySales.objects.get(hour=hour)
+        self.assertEqual((hourly.revenue, hourly.order_count, hourly.units), (Decimal(250000), 1, 3))
+
+        products = ProductSalesDaily.objects.filter(date=day).order_by("variant_id")
+        self.assertEqual(
+            [(p.variant_id, p.product_id, p.category_id, p.units, p.revenue) for p in products],
+            [(self.variants[0].id, self.product.id, self.category.id, 1, Decimal(100000)),
+             (self.variants[1].id, self.product.id, self.category.id, 2, Decimal(200000))],
+        )
+        usage = VoucherUsageDaily.objects.get(date=day, voucher_id=self.voucher.id)
+        self.assertEqual((usage.uses, usage.discount_amount), (1, Decimal(50000)))
+
+        stats = CustomerStats.objects.get(account=self.account)
+        self.assertEqual((stats.order_count, stats.total_spent, stats.cancelled_count), (1, Decimal(250000), 0))
+        self.assertEqual(stats.last_order_at, order.order_date)
+        record_sales.assert_called_once_with({(self.product.id, self.category.id): 3})
+
+    def test_cancel_subtracts_order_and_counts_cancellation(self, record_sales):
+        kept = self.create_order()
+        cancelled = self.create_order(voucher=self.voucher, total=250000)
+        record_order(kept.id)
+        record_order(cancelled.id)
+        self.cancel(cancelled)
+        record_order(cancelled.id, -1)
+
+        _, day = buckets(cancelled.order_date)
+        daily = DailySales.objects.get(date=day)
+        self.assertEqual((daily.revenue, daily.order_count, daily.units), (Decimal(300000), 1, 3))
+        self.assertEqual((daily.discount_amount, daily.cancelled_count), (Decimal(0), 1))
+        usage = VoucherUsageDaily.objects.get(date=day, voucher_id=self.voucher.id)
+        self.assertEqual((usage.uses, usage.discount_amount), (0, Decimal(0)))
+        self.assertEqual(
+            list(ProductSalesDaily.objects.order_by("variant_id").values_list("units", flat=True)), [1, 2]
+        )
+        stats = CustomerStats.objects.get(account=self.account)
+        self.assertEqual((stats.order_count, stats.total_spent, stats.cancelled_count), (1, Decimal(300000), 1))
+
+    def test_repeated_events_are_applied_once(self, record_sales):
+        order = self.create_order()
+        record_order(order.id)
+        record_order(order.id)
+        self.cancel(order)
+        record_order(order.id, -1)
+        record_order(order.id, -1)
+
+        daily = DailySales.objects.get()
+        self.assertEqual((daily.revenue, daily.order_count, daily.cancelled_count), (Decimal(0), 0, 1))
+        stats = CustomerStats.objects.get(account=self.account)
+        self.assertEqual((stats.order_count, stats.cancelled_count), (0, 1))
+
+    def test_cancel_without_created_event_is_ignored(self, record_sales):
+        order = self.create_order()
+        self.cancel(order)
+        record_order(order.id, -1)
+        self.assertFalse(DailySales.objects.exists())
+        self.assertFalse(CustomerStats.objects.exists())
+
+    def test_backfill_matches_incremental_rollup(self, record_sales):
+        orders = [self.create_order(), self.create_order(voucher=self.voucher, total=250000), self.create_order()]
+        for order in orders:
+            record_order(order.id)
+        self.cancel(orders[2])
+        record_order(orders[2].id, -1)
+
+        incremental = self.snapshot()
+        self.backfill()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_events_after_backfill_are_not_counted_twice(self, record_sales):
+        order = self.create_order()
+        self.backfill()
+        expected = self.snapshot()
+
+        # Sự kiện "created" của đơn đã có trong backfill vẫn còn trong outbox
+        record_order(order.id)
+        self.assertEqual(self.snapshot(), expected)
+
+        # Hủy sau backfill thì vẫn trừ đúng 1 lần
+        self.cancel(order)
+        record_order(order.id, -1)
+        record_order(order.id, -1)
+        stats = CustomerStats.objects.get(account=self.account)
+        self.assertEqual((stats.order_count, stats.total_spent, stats.cancelled_count), (0, Decimal(0), 1))
+
+    def test_customer_detail_counts_cancelled_orders_but_not_their_spend(self, record_sales):
+        User.objects.create(account=self.account, full_name="Khách", phone="0900000000")
+        admin = Account.objects.create(username="admin", is_staff=True, is_superuser=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        orders = [self.create_order(), self.create_order(total=250000)]
+        self.cancel(orders[1])
+
+        def detail():
+            data = client.get(f"/api/customers/details/{self.account.id}/").json()["data"]
+            return data["orderCount"], data["totalSpent"]
+
+        # Chưa có CustomerStats: tính trực tiếp từ bảng đơn hàng
+        self.assertEqual(detail(), (2, 300000.0))
+        self.backfill()
+        self.assertEqual(detail(), (2, 300000.0))
@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from decouple import config
 import cloudinary
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -57,7 +58,8 @@ INSTALLED_APPS = [
     'chat',
     'reviews',
     'django_rq',
-    'voucher'
+    'voucher',
+    'analytics',
 ]
 
 #email config
@@ -113,6 +115,25 @@ cloudinary.config(
     secure=True
 )
 
+# Ảnh sản phẩm được lưu tạm trên disk rồi upload nền bằng django_rq (products/uploads.py).
+# Web và worker phải cùng thấy thư mục này (cùng host hoặc volume chung).
+PRODUCT_UPLOAD_STAGING_DIR = BASE_DIR / 'upload_staging'
+PRODUCT_UPLOAD_BACKEND = 'products.uploads.CloudinaryUploadBackend'
+PRODUCT_UPLOAD_WORKERS = 8
+# Slot "uploading" quá thời gian này (giây) coi như worker đã chết, được đưa lại về pending
+PRODUCT_UPLOAD_CLAIM_TIMEOUT = 15 * 60
+
+# Flash sale: tồn kho của variant được bật bằng "flash_stock enable" nằm trong Redis (orders/flash_stock.py)
+FLASH_SALE_ENABLED = config('FLASH_SALE_ENABLED', default=False, cast=bool)
+FLASH_SALE_FLUSH_INTERVAL = 2
+
+# Giỏ hàng trong Redis, ghi xuống bảng cart / cart_item sau CART_PERSIST_INTERVAL giây (cart/store.py)
+CART_REDIS_ENABLED = config('CART_REDIS_ENABLED', default=False, cast=bool)
+CART_REDIS_TTL = 30 * 24 * 3600
+CART_PERSIST_INTERVAL = 5
+# Giỏ của khách chưa đăng nhập (cart/guest.py): chỉ nằm trong Redis, hết hạn sau 7 ngày không sửa
+CART_GUEST_TTL = 7 * 24 * 3600
+
 # settings.py
 VNPAY_TMN_CODE = config('VNPAY_TMN_CODE')
 VNPAY_HASH_SECRET = config('VNPAY_HASH_SECRET')
@@ -248,6 +269,8 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'x-guest-cart')
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Guest-Cart']
 
 CSRF_TRUSTED_ORIGINS = [
     'http://localhost:5173',   # React dev server
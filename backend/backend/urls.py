@@ -36,6 +36,7 @@ urlpatterns = [
     path('payment/', include('payments.urls')),
     path('chat/', include('chat.urls')),
     path('voucher/', include('voucher.urls')),
+    path('api/analytics/', include('analytics.admin_views.urls')),
 
 
     # Swagger UI
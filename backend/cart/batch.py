@@ -0,0 +1,177 @@
+from django.db import transaction
+from products.models import ProductVariant
+from . import store as cart_store
+from .models import Cart, CartItem
+
+# Sửa giỏ hàng loạt: 1 request chứa danh sách thao tác, áp dụng tất cả hoặc không gì cả.
+#   {"operations": [{"op": "add", "product_variant_id": 5, "quantity": 2},
+#                   {"op": "update", "product_variant_id": 7, "quantity": 1},
+#                   {"op": "remove", "product_variant_id": 9},
+#                   {"op": "clear"}]}
+# - Dòng giỏ được xác định bằng product_variant_id (giống nhau ở giỏ DB và giỏ Redis).
+# - Các thao tác chạy lần lượt trên bản sao của giỏ trong bộ nhớ; tồn kho của mọi variant
+#   được đọc bằng 1 query, rồi chỉ ghi phần chênh lệch:
+#   giỏ DB: bulk_create / bulk_update / 1 lệnh delete trong 1 transaction;
+#   giỏ Redis: 1 lệnh EVAL, chỉ ghi khi giỏ chưa bị request khác sửa (thử lại tối đa MAX_RETRIES lần).
+
+OPERATIONS = ("add", "update", "remove", "clear")
+MAX_OPERATIONS = 100
+MAX_RETRIES = 3
+
+
+class BatchError(Exception):
+    def __init__(self, errors):
+        super().__init__("Invalid operations")
+        self.errors = errors
+
+
+class CartConflict(Exception):
+    pass
+
+
+def parse_operations(data):
+    if not isinstance(data, list) or not data:
+        raise BatchError(["operations must be a non-empty list"])
+    if len(data) > MAX_OPERATIONS:
+        raise BatchError([f"At most {MAX_OPERATIONS} operations per request"])
+
+    operations, errors = [], []
+    for index, raw in enumerate(data):
+        op = raw.get("op") if isinstance(raw, dict) else None
+        if op not in OPERATIONS:
+            errors.append(f"#{index}: op must be one of {', '.join(OPERATIONS)}")
+            continue
+        if op == "clear":
+            operations.append({"op": op})
+            continue
+        try:
+            variant_id = int(raw.get("product_variant_id"))
+            quantity = int(raw.get("quantity", 1 if op == "add" else 0))
+        except (TypeError, ValueError):
+            errors.append(f"#{index}: product_variant_id and quantity must be integers")
+            continue
+        if op != "remove" and quantity <= 0:
+            errors.append(f"#{index}: quantity must be greater than 0")
+            continue
+        operations.append({"op": op, "product_variant_id": variant_id, "quantity": quantity})
+
+    if errors:
+        raise BatchError(errors)
+    return operations
+
+
+def load_variants(ids):
+    rows = ProductVariant.objects.filter(id__in=list(ids)).values("id", "product_id", "stock_quantity")
+    return {row["id"]: row for row in rows}
+
+
+def apply_operations(lines, operations, variants):
+    """lines: {variant_id: (product_id, quantity)} hiện tại -> lines sau khi chạy hết các thao tác."""
+    result = dict(lines)
+    errors = []
+    for index, op in enumerate(operations):
+        if op["op"] == "clear":
+            result.clear()
+            continue
+
+        vid = op["product_variant_id"]
+        if op["op"] == "add":
+            variant = variants.get(vid)
+            if variant is None:
+                errors.append(f"#{index}: product variant {vid} not found")
+                continue
+            _, qty = result.get(vid, (variant["product_id"], 0))
+            result[vid] = (variant["product_id"], qty + op["quantity"])
+        elif vid not in result:
+            errors.append(f"#{index}: product variant {vid} is not in cart")
+        elif op["op"] == "update":
+            result[vid] = (result[vid][0], op["quantity"])
+        else:
+            del result[vid]
+
+    # Chỉ chặn dòng bị tăng số lượng vượt tồn kho; dòng giữ nguyên / giảm thì để bước checkout xử lý
+    for vid, (_, qty) in result.items():
+        variant = variants.get(vid)
+        if variant and qty > lines.get(vid, (0, 0))[1] and qty > variant["stock_quantity"]:
+            errors.append(f"Product variant {vid}: only {variant['stock_quantity']} left in stock")
+
+    if errors:
+        raise BatchError(errors)
+    return result
+
+
+def changed_lines(before, after):
+    # {variant_id: (product_id, quantity)} cần ghi, quantity 0 = xóa
+    changes = {vid: (pid, 0) for vid, (pid, _) in before.items() if vid not in after}
+    changes.update({vid: line for vid, line in after.items() if before.get(vid) != line})
+    return changes
+
+
+def merge_lines(lines, incoming, variants):
+    """Gộp giỏ khách vào giỏ tài khoản theo variant: cùng variant thì cộng số lượng,
+    tối đa bằng tồn kho (nhưng không giảm dòng đang có); variant đã bị xóa thì bỏ qua."""
+    result = dict(lines)
+    for vid, (_, qty) in incoming.items():
+        variant = variants.get(vid)
+        if variant is None:
+            continue
+        current = result.get(vid, (variant["product_id"], 0))[1]
+        merged = max(min(current + qty, variant["stock_quantity"]), current)
+        if merged > 0:
+            result[vid] = (variant["product_id"], merged)
+    return result
+
+
+def update_db_cart(account, compute):
+    """compute(lines) -> lines mới; ghi phần chênh lệch trong 1 transaction. Trả về id giỏ."""
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(account=account)
+        # Khóa giỏ để 2 batch cùng lúc không cùng tạo 1 dòng
+        cart = Cart.objects.select_for_update().get(id=cart.id)
+        items = {item.product_variant_id: item for item in CartItem.objects.filter(cart=cart)}
+        before = {vid: (item.product_id, item.quantity) for vid, item in items.items()}
+        after = compute(before)
+
+        to_create, to_update, to_delete = [], [], []
+        for vid, (pid, qty) in changed_lines(before, after).items():
+            item = items.get(vid)
+            if qty <= 0:
+                to_delete.append(item.id)
+            elif item is None:
+                to_create.append(CartItem(cart=cart, product_id=pid, product_variant_id=vid, quantity=qty))
+            else:
+                item.quantity = qty
+                to_update.append(item)
+
+        if to_delete:
+            CartItem.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ["quantity"])
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        if to_create or to_update or to_delete:
+            cart.bump_version()
+    return cart.id
+
+
+def update_redis_cart(store, compute):
+    """Như update_db_cart cho giỏ Redis; trả về state mới."""
+    for _ in range(MAX_RETRIES):
+        state = cart_store.read_cart(store)
+        changes = changed_lines(state["lines"], compute(state["lines"]))
+        if not changes:
+            return state
+        new_state = store.replace(state["version"], changes)
+        if new_state is not None:
+            return new_state
+    raise CartConflict()
+
+
+def apply_db_batch(account, operations):
+    variants = load_variants(op["product_variant_id"] for op in operations if op["op"] != "clear")
+    return update_db_cart(account, lambda lines: apply_operations(lines, operations, variants))
+
+
+def apply_redis_batch(store, operations):
+    variants = load_variants(op["product_variant_id"] for op in operations if op["op"] != "clear")
+    return update_redis_cart(store, lambda lines: apply_operations(lines, operations, variants))
@@ -0,0 +1,86 @@
+import uuid
+from django.conf import settings
+from django.core import signing
+from . import store as cart_store
+from .batch import load_variants, merge_lines, update_db_cart, update_redis_cart
+
+# Giỏ hàng của khách chưa đăng nhập.
+# - Khách giữ 1 token đã ký (django.core.signing) và gửi lại qua header X-Guest-Cart;
+#   token sai / chưa có thì server cấp token mới trong header của response.
+# - Giỏ nằm trong Redis ("cart:guest:<id>", cùng cấu trúc với giỏ tài khoản, không ghi xuống DB),
+#   tự hết hạn sau CART_GUEST_TTL giây kể từ lần sửa cuối.
+# - Khi đăng nhập kèm guest_token, merge_guest_cart lấy và xóa giỏ khách trong 1 lệnh (RedisCart.claim)
+#   rồi gộp vào giỏ tài khoản trong 1 lần ghi (xem batch.merge_lines): 2 lần đăng nhập cùng token
+#   không gộp 2 lần; khách thêm hàng sau lúc lấy thì hàng nằm trong giỏ khách mới, không bị mất.
+
+HEADER = "X-Guest-Cart"
+SALT = "cart.guest"
+
+
+def new_token():
+    return signing.dumps(uuid.uuid4().hex, salt=SALT)
+
+
+def guest_id(token):
+    try:
+        value = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return None
+    return value if isinstance(value, str) else None
+
+
+def guest_cart(gid):
+    return cart_store.RedisCart(f"guest:{gid}", ttl=getattr(settings, "CART_GUEST_TTL", 7 * 24 * 3600))
+
+
+def guest_store(request):
+    """-> (RedisCart, token) của khách gửi request."""
+    token = request.headers.get(HEADER)
+    gid = guest_id(token) if token else None
+    if gid is None:
+        token = new_token()
+        gid = guest_id(token)
+    return guest_cart(gid), token
+
+
+def read_guest_cart(store):
+    # Không tạo giỏ trong Redis chỉ vì khách mở trang giỏ hàng
+    return store.read() or {"version": 0, "cart_id": None, "lines": {}}
+
+
+def merge_guest_cart(token, account):
+    """Gộp giỏ khách vào giỏ của account; trả về số dòng đã gộp."""
+    gid = guest_id(token)
+    if gid is None:
+        return 0
+    store = guest_cart(gid)
+    state = store.claim()
+    if not state or not state["lines"]:
+        return 0
+
+    incoming = state["lines"]
+    try:
+        variants = load_variants(incoming)
+
+        def compute(lines):
+            return merge_lines(lines, incoming, variants)
+
+        if cart_store.is_enabled():
+            update_redis_cart(cart_store.account_cart(account.id), compute)
+        else:
+            update_db_cart(account, compute)
+    except Exception:
+        # Gộp lỗi: trả hàng về giỏ khách để lần đăng nhập sau gộp lại
+        restore_guest_cart(store, incoming)
+        raise
+    return len(incoming)
+
+
+def restore_guest_cart(store, incoming):
+    def compute(lines):
+        result = dict(lines)
+        for vid, (pid, qty) in incoming.items():
+            result[vid] = (pid, result.get(vid, (pid, 0))[1] + qty)
+        return result
+
+    update_redis_cart(store, compute)
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from cart import store
+
+
+class Command(BaseCommand):
+    help = (
+        "Ghi các giỏ hàng đã thay đổi trong Redis xuống bảng cart / cart_item "
+        "(--loop để chạy liên tục khi không có rq scheduler)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true")
+        parser.add_argument("--interval", type=float, default=5)
+
+    def handle(self, *args, **options):
+        while True:
+            persisted = store.persist_dirty()
+            if persisted is None:
+                self.stdout.write("Worker khác đang ghi giỏ hàng.")
+            elif persisted or not options["loop"]:
+                self.stdout.write(f"Đã ghi {persisted} giỏ hàng xuống DB.")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from products.models import Product, ProductVariant
 from accounts.models import Account
 
@@ -9,10 +10,17 @@ class Cart(models.Model):
         on_delete=models.CASCADE,
         related_name="carts"
     )
+    # Tăng sau mỗi lần sửa giỏ; dùng làm ETag cho GET giỏ hàng
+    version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Cart #{self.id} - User: {self.account.username}"
 
+    def bump_version(self):
+        Cart.objects.filter(id=self.id).update(version=F("version") + 1)
+        self.refresh_from_db(fields=["version"])
+        return self.version
+
     class Meta:
         db_table = 'cart'
 
@@ -1,9 +1,23 @@
+from decimal import Decimal
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
 from rest_framework import serializers
 
 from utils.cloudinary_helper import get_cloudinary_url
 from .models import Cart, CartItem
 
 
+def with_read_relations(queryset):
+    # Nạp items + product + variant trong 1 query prefetch: số query cố định dù giỏ có bao nhiêu dòng
+    return queryset.prefetch_related(
+        Prefetch("items", queryset=CartItem.objects.select_related("product", "product_variant").order_by("id"))
+    )
+
+
+def unit_price(product):
+    return product.current_price or product.old_price or Decimal(0)
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField(source='product.id', read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -46,8 +60,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         ]
 
     def get_total_price(self, obj):
-        old_price = obj.product.current_price or obj.product.old_price
-        return float(old_price) * obj.quantity
+        return float(unit_price(obj.product) * obj.quantity)
 
     def get_product_img(self, obj):
         if obj.product.product_img:
@@ -56,21 +69,52 @@ class CartItemSerializer(serializers.ModelSerializer):
 
 
 class CartSerializer(serializers.ModelSerializer):
-    account_id = serializers.IntegerField(source='account.id', read_only=True)
+    account_id = serializers.IntegerField(read_only=True)
     items = CartItemSerializer(many=True, read_only=True)  # ✅ Dùng related_name='items'
-    total_amount = serializers.SerializerMethodField()
-    total_items = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
-        fields = ['id', 'account_id', 'items', 'total_amount', 'total_items']
+        fields = ['id', 'account_id', 'version', 'items']
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+
+        # Tính tổng 1 lượt trên các item đã nạp, cộng bằng Decimal
+        total_amount = Decimal(0)
+        total_items = 0
+        for item in obj.items.all():
+            total_amount += unit_price(item.product) * item.quantity
+            total_items += item.quantity
+
+        data['total_amount'] = float(total_amount)
+        data['total_items'] = total_items
+        return data
+
+
+def serialize_cart(cart_id):
+    # Đọc lại giỏ sau khi ghi: 2 query (cart + items) bất kể số dòng
+    cart = with_read_relations(Cart.objects.filter(id=cart_id)).get()
+    return CartSerializer(cart).data
+
+
+def cart_totals(cart_id):
+    # Tổng tiền / tổng số lượng tính trong DB (1 query), cùng quy tắc giá với unit_price
+    price = Coalesce(NullIf("product__current_price", Value(0)), "product__old_price", Value(0))
+    totals = CartItem.objects.filter(cart_id=cart_id).aggregate(
+        total_amount=Sum(ExpressionWrapper(price * F("quantity"), output_field=DecimalField(max_digits=14, decimal_places=2))),
+        total_items=Sum("quantity"),
+    )
+    return float(totals["total_amount"] or 0), totals["total_items"] or 0
 
-    def get_total_amount(self, obj):
-        total = 0
-        for item in obj.items.all():  # ✅ Dùng related_name='items'
-            old_price = item.product.current_price or item.product.old_price
-            total += float(old_price) * item.quantity
-        return total
 
-    def get_total_items(self, obj):
-        return sum(item.quantity for item in obj.items.all())
\ No newline at end of file
+def cart_delta(cart, item_id, item=None):
+    # Response của thao tác sửa giỏ: chỉ dòng vừa đổi (None nếu đã xóa) + tổng mới + version
+    total_amount, total_items = cart_totals(cart.id)
+    return {
+        'id': cart.id,
+        'version': cart.version,
+        'item_id': item_id,
+        'item': CartItemSerializer(item).data if item else None,
+        'total_amount': total_amount,
+        'total_items': total_items,
+    }
@@ -0,0 +1,456 @@
+import logging
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+import django_rq
+from django.conf import settings
+from django.db import connection, transaction
+from django_redis import get_redis_connection
+from accounts.models import Account
+from cart.models import Cart, CartItem
+from products.cards import load_cards, rebuild_cards
+from products.models import ProductVariant
+
+logger = logging.getLogger(__name__)
+
+# Giỏ hàng nằm trong Redis (bật bằng settings.CART_REDIS_ENABLED).
+# - Mỗi giỏ là 1 hash "cart:<owner>": v:<variant_id> = số lượng, p:<variant_id> = product_id,
+#   o:<variant_id> = thứ tự thêm vào, version, cart_id (id bảng cart nếu đã có).
+# - Mỗi thao tác thêm / sửa / xóa là 1 lệnh EVAL (script Lua): HINCRBY / HSET số lượng, tăng version,
+#   đánh dấu giỏ cần ghi xuống DB và trả về cả giỏ -> 1 round-trip tới Redis.
+# - Giỏ chưa có trong Redis (lần đầu, hoặc hết TTL) được nạp từ bảng cart / cart_item rồi chạy lại lệnh.
+# - Thông tin sản phẩm (tên, giá, ảnh, tồn kho) lấy từ product card lúc đọc, không lưu trong giỏ.
+# - persist_dirty (job django_rq, gom theo CART_PERSIST_INTERVAL giây) ghi các giỏ đã đổi xuống DB;
+#   lệnh "persist_carts --loop" làm việc này khi không có rq scheduler.
+
+DIRTY_KEY = "cart:dirty"
+PERSIST_SCHEDULED_KEY = "cart:persist-scheduled"
+PERSIST_LOCK_KEY = "cart:persist-lock"
+PERSIST_LOCK_TIMEOUT = 60
+PERSIST_BATCH = 100
+
+# KEYS[1] = giỏ, KEYS[2] = tập giỏ cần ghi DB, KEYS[3] = cờ đã xếp job ghi DB
+# ARGV: thao tác (add / set / del), variant_id, product_id, số lượng, TTL, account_id ('' = không ghi DB), chu kỳ ghi
+# Trả về: false nếu giỏ chưa nạp, {0} nếu sửa / xóa dòng không có trong giỏ, {1, cần xếp job, HGETALL}
+MUTATE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'version') == 0 then
+    return false
+end
+local field = 'v:' .. ARGV[2]
+local exists = redis.call('HEXISTS', KEYS[1], field) == 1
+if ARGV[1] ~= 'add' and not exists then
+    return {0}
+end
+
+local qty = 0
+if ARGV[1] == 'add' then
+    qty = redis.call('HINCRBY', KEYS[1], field, ARGV[4])
+elseif ARGV[1] == 'set' then
+    qty = tonumber(ARGV[4])
+    redis.call('HSET', KEYS[1], field, qty)
+end
+
+local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+if qty <= 0 then
+    redis.call('HDEL', KEYS[1], field, 'p:' .. ARGV[2], 'o:' .. ARGV[2])
+elseif ARGV[1] == 'add' then
+    redis.call('HSET', KEYS[1], 'p:' .. ARGV[2], ARGV[3])
+    redis.call('HSETNX', KEYS[1], 'o:' .. ARGV[2], version)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+
+local schedule = 0
+if ARGV[6] ~= '' then
+    redis.call('SADD', KEYS[2], ARGV[6])
+    if redis.call('SET', KEYS[3], 1, 'NX', 'EX', ARGV[7]) then
+        schedule = 1
+    end
+end
+return {1, schedule, redis.call('HGETALL', KEYS[1])}
+"""
+
+# KEYS[1] = giỏ; ARGV[1] = TTL, ARGV[2..] = field, value, ...
+# Chỉ nạp khi giỏ chưa có trong Redis (request khác có thể vừa nạp xong)
+LOAD_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'version') == 1 then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+# Ghi nhiều dòng trong 1 lệnh (thao tác hàng loạt): chỉ ghi nếu version chưa đổi kể từ lúc đọc
+# KEYS giống MUTATE_SCRIPT; ARGV: version đã đọc, TTL, account_id, chu kỳ ghi, rồi từng bộ variant_id, product_id, số lượng
+# (số lượng 0 = xóa dòng). Trả về: false nếu giỏ chưa nạp, {0} nếu version đã đổi, {1, cần xếp job, HGETALL}
+REPLACE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version')
+if not current then
+    return false
+end
+if current ~= ARGV[1] then
+    return {0}
+end
+
+local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+for i = 5, #ARGV, 3 do
+    local vid = ARGV[i]
+    if tonumber(ARGV[i + 2]) <= 0 then
+        redis.call('HDEL', KEYS[1], 'v:' .. vid, 'p:' .. vid, 'o:' .. vid)
+    else
+        redis.call('HSET', KEYS[1], 'v:' .. vid, ARGV[i + 2], 'p:' .. vid, ARGV[i + 1])
+        redis.call('HSETNX', KEYS[1], 'o:' .. vid, version)
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+
+local schedule = 0
+if ARGV[3] ~= '' then
+    redis.call('SADD', KEYS[2], ARGV[3])
+    if redis.call('SET', KEYS[3], 1, 'NX', 'EX', ARGV[4]) then
+        schedule = 1
+    end
+end
+return {1, schedule, redis.call('HGETALL', KEYS[1])}
+"""
+
+# Lấy cả giỏ rồi xóa trong 1 lệnh (gộp giỏ khách): 2 request cùng lấy thì chỉ 1 request nhận được giỏ
+CLAIM_SCRIPT = """
+local raw = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return raw
+"""
+
+
+class CartItemMissing(Exception):
+    pass
+
+
+def is_enabled():
+    return getattr(settings, "CART_REDIS_ENABLED", False)
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _ttl():
+    return getattr(settings, "CART_REDIS_TTL", 30 * 24 * 3600)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def parse_state(raw):
+    """Hash của giỏ (dict từ HGETALL hoặc list phẳng từ Lua) -> {version, cart_id, lines}.
+    lines: {variant_id: (product_id, quantity)} theo thứ tự thêm vào giỏ."""
+    if isinstance(raw, list):
+        raw = dict(zip(raw[::2], raw[1::2]))
+    fields = {_decode(k): _decode(v) for k, v in raw.items()}
+
+    lines, order = {}, {}
+    for field, value in fields.items():
+        if field.startswith("v:"):
+            vid = int(field[2:])
+            lines[vid] = (int(fields.get(f"p:{vid}", 0)), int(value))
+            order[vid] = int(fields.get(f"o:{vid}", 0))
+
+    return {
+        "version": int(fields.get("version", 0)),
+        "cart_id": int(fields["cart_id"]) if fields.get("cart_id") else None,
+        "lines": {vid: lines[vid] for vid in sorted(lines, key=lambda v: (order[v], v))},
+    }
+
+
+class RedisCart:
+    def __init__(self, owner, account_id=None, ttl=None):
+        # account_id: giỏ của tài khoản (được ghi xuống DB); None: giỏ chỉ sống trong Redis
+        self.key = f"cart:{owner}"
+        self.account_id = account_id
+        self.ttl = ttl or _ttl()
+
+    def read(self):
+        raw = _redis().hgetall(self.key)
+        if b"version" not in raw:
+            return None
+        return parse_state(raw)
+
+    def load(self, lines, version=1, cart_id=None):
+        fields = ["version", version]
+        if cart_id:
+            fields += ["cart_id", cart_id]
+        for position, (vid, (pid, qty)) in enumerate(lines.items(), start=1):
+            fields += [f"v:{vid}", qty, f"p:{vid}", pid, f"o:{vid}", -len(lines) + position]
+        return _redis().eval(LOAD_SCRIPT, 1, self.key, self.ttl, *fields)
+
+    def mutate(self, op, variant_id, product_id=0, quantity=0):
+        """Trả về state mới; None nếu giỏ chưa được nạp vào Redis."""
+        result = _redis().eval(
+            MUTATE_SCRIPT, 3, self.key, DIRTY_KEY, PERSIST_SCHEDULED_KEY,
+            op, variant_id, product_id, quantity, self.ttl,
+            self.account_id or "", getattr(settings, "CART_PERSIST_INTERVAL", 5),
+        )
+        if result is None:
+            return None
+        if not result[0]:
+            raise CartItemMissing()
+        if result[1]:
+            schedule_persist()
+        return parse_state(result[2])
+
+    def replace(self, version, changes):
+        """changes: {variant_id: (product_id, quantity)}, quantity 0 = xóa.
+        Trả về state mới; None nếu giỏ chưa nạp hoặc đã bị request khác sửa sau lần đọc (version khác)."""
+        args = []
+        for vid, (pid, qty) in changes.items():
+            args += [vid, pid, qty]
+        result = _redis().eval(
+            REPLACE_SCRIPT, 3, self.key, DIRTY_KEY, PERSIST_SCHEDULED_KEY,
+            version, self.ttl, self.account_id or "", getattr(settings, "CART_PERSIST_INTERVAL", 5), *args,
+        )
+        if not result or not result[0]:
+            return None
+        if result[1]:
+            schedule_persist()
+        return parse_state(result[2])
+
+    def claim(self):
+        """Lấy state rồi xóa giỏ (atomic); None nếu giỏ không có trong Redis."""
+        raw = parse_state(_redis().eval(CLAIM_SCRIPT, 1, self.key) or [])
+        return raw if raw["version"] else None
+
+    def delete(self):
+        _redis().delete(self.key)
+
+
+# ===== GIỎ CỦA TÀI KHOẢN =====
+def account_cart(account_id):
+    return RedisCart(f"acc:{account_id}", account_id=account_id)
+
+
+def _db_lines(account_id):
+    cart = Cart.objects.filter(account_id=account_id).order_by("id").first()
+    if not cart:
+        return None, {}
+    rows = cart.items.order_by("id").values_list("product_variant_id", "product_id", "quantity")
+    return cart, {vid: (pid, qty) for vid, pid, qty in rows}
+
+
+def load_account_cart(store):
+    cart, lines = _db_lines(store.account_id)
+    # Giống giỏ DB: tài khoản không tồn tại thì không tạo giỏ (và không đưa vào cart:dirty)
+    if not cart and not Account.objects.filter(id=store.account_id).exists():
+        raise Account.DoesNotExist()
+    # Dùng lại version của DB nên ETag không đổi khi giỏ chỉ được nạp lại
+    if cart:
+        store.load(lines, version=cart.version, cart_id=cart.id)
+    else:
+        store.load(lines)
+
+
+def ensure_loaded(store):
+    # Giỏ tài khoản nạp từ DB; giỏ khách (guest) chưa có thì bắt đầu rỗng
+    if store.account_id:
+        load_account_cart(store)
+    else:
+        store.load({})
+
+
+def read_cart(store):
+    state = store.read()
+    if state is None:
+        ensure_loaded(store)
+        state = store.read()
+    return state
+
+
+def mutate_cart(store, op, variant_id, product_id=0, quantity=0):
+    state = store.mutate(op, variant_id, product_id, quantity)
+    if state is None:
+        ensure_loaded(store)
+        state = store.mutate(op, variant_id, product_id, quantity)
+    return state
+
+
+def read_account_cart(account_id):
+    return read_cart(account_cart(account_id))
+
+
+def mutate_account_cart(account_id, op, variant_id, product_id=0, quantity=0):
+    return mutate_cart(account_cart(account_id), op, variant_id, product_id, quantity)
+
+
+# ===== ĐỌC GIỎ =====
+def find_variant(card, variant_id):
+    for variant in card.get("product_variants", []):
+        if variant["id"] == variant_id:
+            return variant
+    return None
+
+
+def load_line_cards(lines):
+    # lines: {variant_id: (product_id, quantity)}; chỉ đọc, không build lại card
+    return {card["id"]: card for card in load_cards({pid for pid, _ in lines.values()})}
+
+
+def variant_card(product_id, variant_id):
+    """Card của sản phẩm khi thêm variant vào giỏ (None nếu sản phẩm không tồn tại).
+    Card chưa có variant vừa tạo (card cũ) thì build lại, nhưng chỉ khi variant có thật trong DB."""
+    card = load_line_cards({variant_id: (product_id, 0)}).get(product_id)
+    if card is None or find_variant(card, variant_id) is not None:
+        return card
+    if not ProductVariant.objects.filter(id=variant_id, product_id=product_id).exists():
+        return card
+    return rebuild_cards([product_id]).get(product_id)
+
+
+def _cart_lines(state):
+    # -> (items giống CartItemSerializer, tổng tiền, tổng số lượng);
+    # dòng có sản phẩm / variant đã bị xóa thì bỏ qua
+    cards = load_line_cards(state["lines"])
+
+    items = []
+    total_amount = Decimal(0)
+    total_items = 0
+    for vid, (pid, qty) in state["lines"].items():
+        card = cards.get(pid)
+        variant = find_variant(card, vid) if card else None
+        if variant is None:
+            continue
+
+        price = Decimal(card["current_price"] or card["old_price"] or 0)
+        line_total = price * qty
+        total_amount += line_total
+        total_items += qty
+        items.append({
+            "id": vid,
+            "product_id": pid,
+            "product_name": card["name"],
+            "old_price": card["old_price"],
+            "current_price": card["current_price"],
+            "product_img": card["product_img"],
+            "product_variant_id": vid,
+            "size": variant["size"],
+            "color": variant["color"],
+            "quantity": qty,
+            "stock": variant["stock_quantity"],
+            "total_price": float(line_total),
+        })
+    return items, total_amount, total_items
+
+
+def cart_data(state, account_id):
+    # Dựng response giống CartSerializer từ product card
+    items, total_amount, total_items = _cart_lines(state)
+    return {
+        "id": state["cart_id"],
+        "account_id": account_id,
+        "version": state["version"],
+        "items": items,
+        "total_amount": float(total_amount),
+        "total_items": total_items,
+    }
+
+
+def cart_delta(state, variant_id):
+    # Giống serializers.cart_delta: chỉ dòng vừa đổi + tổng mới + version
+    items, total_amount, total_items = _cart_lines(state)
+    return {
+        "id": state["cart_id"],
+        "version": state["version"],
+        "item_id": variant_id,
+        "item": next((item for item in items if item["id"] == variant_id), None),
+        "total_amount": float(total_amount),
+        "total_items": total_items,
+    }
+
+
+# ===== GHI XUỐNG DB =====
+def schedule_persist():
+    interval = getattr(settings, "CART_PERSIST_INTERVAL", 5)
+    try:
+        django_rq.get_queue("default").enqueue_in(timedelta(seconds=interval), persist_dirty)
+    except Exception:
+        # Không có worker/scheduler thì lệnh "persist_carts --loop" vẫn ghi được
+        logger.exception("Không xếp được job ghi giỏ hàng xuống DB")
+
+
+@contextmanager
+def _persist_lock():
+    r = _redis()
+    token = uuid.uuid4().hex
+    acquired = r.set(PERSIST_LOCK_KEY, token, nx=True, ex=PERSIST_LOCK_TIMEOUT)
+    try:
+        yield bool(acquired)
+    finally:
+        if acquired and r.get(PERSIST_LOCK_KEY) == token.encode():
+            r.delete(PERSIST_LOCK_KEY)
+
+
+def persist_account_cart(account_id):
+    store = account_cart(account_id)
+    state = store.read()
+    if state is None:
+        return  # giỏ đã hết hạn trong Redis, DB đang giữ bản cuối cùng
+
+    lines = state["lines"]
+    valid = set(ProductVariant.objects.filter(id__in=lines).values_list("id", flat=True))
+    deleted = [vid for vid in lines if vid not in valid]
+    if deleted:
+        # Variant đã bị xóa: bỏ luôn khỏi hash, không để lại dòng "ma" trong giỏ
+        fields = [f"{prefix}:{vid}" for vid in deleted for prefix in ("v", "p", "o")]
+        _redis().hdel(store.key, *fields)
+    upsert_options = {"update_conflicts": True, "update_fields": ["product", "quantity"]}
+    if connection.features.supports_update_conflicts_with_target:
+        upsert_options["unique_fields"] = ["cart", "product_variant"]
+
+    with transaction.atomic():
+        cart = Cart.objects.filter(account_id=account_id).order_by("id").first()
+        if cart is None:
+            if not Account.objects.filter(id=account_id).exists():
+                # Tài khoản đã bị xóa: bỏ giỏ trong Redis, không còn gì để ghi
+                logger.warning("Bỏ giỏ hàng của tài khoản không tồn tại %s", account_id)
+                store.delete()
+                return
+            cart = Cart.objects.create(account_id=account_id, version=state["version"])
+            _redis().hset(store.key, "cart_id", cart.id)
+        else:
+            Cart.objects.filter(id=cart.id).update(version=state["version"])
+
+        CartItem.objects.filter(cart=cart).exclude(product_variant_id__in=valid).delete()
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=pid, product_variant_id=vid, quantity=qty)
+            for vid, (pid, qty) in lines.items() if vid in valid
+        ], **upsert_options)
+
+
+def persist_dirty():
+    """Ghi các giỏ đã thay đổi xuống DB; trả về số giỏ đã ghi (None nếu worker khác đang ghi)."""
+    with _persist_lock() as acquired:
+        if not acquired:
+            return None
+
+        r = _redis()
+        total = 0
+        failed = []
+        try:
+            while True:
+                account_ids = r.spop(DIRTY_KEY, PERSIST_BATCH)
+                if not account_ids:
+                    return total
+                for account_id in account_ids:
+                    try:
+                        persist_account_cart(int(account_id))
+                    except Exception:
+                        # 1 giỏ lỗi không chặn các giỏ còn lại; lần chạy sau thử lại giỏ đó
+                        logger.exception("Không ghi được giỏ hàng của tài khoản %s", account_id)
+                        failed.append(account_id)
+                        continue
+                    total += 1
+        finally:
+            if failed:
+                r.sadd(DIRTY_KEY, *failed)
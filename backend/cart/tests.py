@@ -1,3 +1,328 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from accounts.models import Account
+from categories.models import Category
+from products.models import Product, ProductVariant
+from . import guest as cart_guest
+from . import store as cart_store
+from .models import Cart, CartItem
+from .serializers import CartSerializer, serialize_cart
 
-# Create your tests here.
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis cần lupa để chạy script Lua
+except ImportError:
+    fakeredis = None
+
+
+@override_settings(CART_REDIS_ENABLED=False)
+class CartTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Áo", status="Active")
+        self.account = Account.objects.create(username="khach")
+        self.cart = Cart.objects.create(account=self.account)
+        self.client = APIClient()
+        self.client.force_authenticate(self.account)
+
+    def add_items(self, count, price="19.99"):
+        for index in range(count):
+            product = Product.objects.create(
+                category=self.category, name=f"Áo {index}", current_price=Decimal(price), description="",
+                status="Active", product_img="products/ao.jpg",
+            )
+            variant = ProductVariant.objects.create(
+                product=product, sku=f"AO-{index}", size="M", color="Đen", stock_quantity=10, status="Active",
+            )
+            CartItem.objects.create(cart=self.cart, product=product, product_variant=variant, quantity=3)
+        return variant
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return len(ctx.captured_queries)
+
+
+class CartReadQueryCountTest(CartTestCase):
+    def test_serialize_cart_uses_two_queries(self):
+        self.add_items(5)
+        # 1 query cart + 1 query prefetch items (JOIN product + variant)
+        with self.assertNumQueries(2):
+            data = serialize_cart(self.cart.id)
+
+        self.assertEqual(len(data["items"]), 5)
+        self.assertEqual(data["account_id"], self.account.id)
+        self.assertEqual(data["total_items"], 15)
+        # Cộng bằng Decimal: 5 * 3 * 19.99 không bị lệch số thực
+        self.assertEqual(data["total_amount"], 299.85)
+        self.assertEqual(data["items"][0]["total_price"], 59.97)
+
+    def test_output_matches_unoptimized_serializer(self):
+        self.add_items(3)
+        self.assertEqual(serialize_cart(self.cart.id), CartSerializer(Cart.objects.get(id=self.cart.id)).data)
+
+    def test_get_cart_query_count_is_constant(self):
+        self.add_items(1)
+        few = self.count_queries(lambda: self.client.get(f"/cart/{self.account.id}/"))
+
+        self.add_items(20)
+        response = self.client.get(f"/cart/{self.account.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]["items"]), 21)
+        many = self.count_queries(lambda: self.client.get(f"/cart/{self.account.id}/"))
+        self.assertEqual(few, many)
+
+    def test_update_item_query_count_is_constant(self):
+        self.add_items(1)
+        item = CartItem.objects.filter(cart=self.cart).first()
+        few = self.count_queries(
+            lambda: self.client.put(f"/cart/{self.account.id}/item/{item.id}/", {"quantity": 2}, format="json")
+        )
+
+        self.add_items(20)
+        many = self.count_queries(
+            lambda: self.client.put(f"/cart/{self.account.id}/item/{item.id}/", {"quantity": 4}, format="json")
+        )
+        self.assertEqual(few, many)
+        self.assertEqual(CartItem.objects.get(id=item.id).quantity, 4)
+
+
+class CartBatchTest(CartTestCase):
+    def batch(self, operations):
+        return self.client.post(f"/cart/{self.account.id}/batch/", {"operations": operations}, format="json")
+
+    def test_batch_applies_all_operations(self):
+        kept = self.add_items(1)
+        removed = self.add_items(1)
+        new = self.add_items(1)
+        CartItem.objects.filter(product_variant=new).delete()
+
+        response = self.batch([
+            {"op": "update", "product_variant_id": kept.id, "quantity": 5},
+            {"op": "remove", "product_variant_id": removed.id},
+            {"op": "add", "product_variant_id": new.id, "quantity": 2},
+            {"op": "add", "product_variant_id": new.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual([(i["product_variant_id"], i["quantity"]) for i in data["items"]], [(kept.id, 5), (new.id, 3)])
+        self.assertEqual(data["total_items"], 8)
+
+    def test_batch_is_all_or_nothing(self):
+        variant = self.add_items(1)
+        response = self.batch([
+            {"op": "update", "product_variant_id": variant.id, "quantity": 1},
+            {"op": "add", "product_variant_id": variant.id, "quantity": 50},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()["errors"]), 1)
+        self.assertEqual(CartItem.objects.get(product_variant=variant).quantity, 3)
+
+    def test_batch_query_count_is_constant(self):
+        few = [self.add_items(1) for _ in range(2)]
+        few_queries = self.count_queries(lambda: self.batch([
+            {"op": "update", "product_variant_id": v.id, "quantity": 2} for v in few
+        ]))
+
+        many = [self.add_items(1) for _ in range(20)]
+        many_queries = self.count_queries(lambda: self.batch([
+            {"op": "update", "product_variant_id": v.id, "quantity": 2} for v in many
+        ] + [{"op": "remove", "product_variant_id": few[0].id}]))
+        self.assertEqual(few_queries + 1, many_queries)  # +1: lệnh delete
+
+
+class CartVersionTest(CartTestCase):
+    def test_mutation_returns_changed_line_and_version(self):
+        self.add_items(5)
+        item = CartItem.objects.filter(cart=self.cart).first()
+
+        response = self.client.put(f"/cart/{self.account.id}/item/{item.id}/", {"quantity": 1}, format="json")
+        data = response.json()["data"]
+        self.assertEqual(data["version"], 1)
+        self.assertEqual(response["ETag"], '"1"')
+        self.assertEqual(data["item"]["id"], item.id)
+        self.assertEqual(data["item"]["quantity"], 1)
+        self.assertNotIn("items", data)
+        self.assertEqual(data["total_items"], 13)
+        self.assertEqual(data["total_amount"], 259.87)
+
+        response = self.client.delete(f"/cart/{self.account.id}/item/{item.id}/")
+        data = response.json()["data"]
+        self.assertEqual((data["version"], data["item_id"], data["item"]), (2, item.id, None))
+        self.assertEqual(data["total_items"], 12)
+
+    def test_conditional_get_returns_304_until_cart_changes(self):
+        self.add_items(2)
+        response = self.client.get(f"/cart/{self.account.id}/")
+        etag = response["ETag"]
+        self.assertEqual(response.json()["data"]["version"], 0)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/cart/{self.account.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        item = CartItem.objects.filter(cart=self.cart).first()
+        self.client.put(f"/cart/{self.account.id}/item/{item.id}/", {"quantity": 2}, format="json")
+        response = self.client.get(f"/cart/{self.account.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], '"1"')
+
+
+@skipUnless(fakeredis, "cần fakeredis + lupa")
+@override_settings(CART_REDIS_ENABLED=True, CART_PERSIST_INTERVAL=5)
+class RedisCartStoreTest(CartTestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = fakeredis.FakeRedis()
+        redis_patcher = mock.patch("cart.store._redis", return_value=self.redis)
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+        schedule_patcher = mock.patch("cart.store.schedule_persist")
+        self.scheduled = schedule_patcher.start()
+        self.addCleanup(schedule_patcher.stop)
+
+    def lines(self, state):
+        return [(vid, qty) for vid, (_, qty) in state["lines"].items()]
+
+    def test_parse_state_keeps_insertion_order(self):
+        raw = {b"version": b"3", b"cart_id": b"7", b"v:9": b"1", b"p:9": b"2", b"o:9": b"2",
+               b"v:4": b"5", b"p:4": b"1", b"o:4": b"-1"}
+        state = cart_store.parse_state(raw)
+        self.assertEqual((state["version"], state["cart_id"]), (3, 7))
+        self.assertEqual(state["lines"], {4: (1, 5), 9: (2, 1)})
+        self.assertEqual(list(state["lines"]), [4, 9])
+        # Dạng list phẳng (kết quả từ Lua) cho cùng kết quả
+        flat = [item for pair in raw.items() for item in pair]
+        self.assertEqual(cart_store.parse_state(flat), state)
+
+    def test_mutations_load_missing_cart_from_db(self):
+        first = self.add_items(1)
+        second = self.add_items(1)
+        store = cart_store.account_cart(self.account.id)
+        self.assertIsNone(store.mutate("add", first.id, first.product_id, 1))
+
+        state = cart_store.mutate_account_cart(self.account.id, "add", first.id, first.product_id, 2)
+        self.assertEqual(self.lines(state), [(first.id, 5), (second.id, 3)])
+        self.assertEqual(state["cart_id"], self.cart.id)
+        self.assertEqual(state["version"], 1)
+
+        new = Product.objects.create(category=self.category, name="Quần", current_price=1, description="", status="Active")
+        variant = ProductVariant.objects.create(product=new, sku="Q-1", size="L", color="Xám", status="Active")
+        state = cart_store.mutate_account_cart(self.account.id, "add", variant.id, new.id, 1)
+        state = cart_store.mutate_account_cart(self.account.id, "set", first.id, quantity=1)
+        state = cart_store.mutate_account_cart(self.account.id, "del", second.id)
+        self.assertEqual(self.lines(state), [(first.id, 1), (variant.id, 1)])
+        self.assertEqual(state["version"], 4)
+        # Dòng mới giữ product_id khi bị "set" sau đó
+        state = cart_store.mutate_account_cart(self.account.id, "set", variant.id, quantity=2)
+        self.assertEqual(state["lines"][variant.id], (new.id, 2))
+
+        with self.assertRaises(cart_store.CartItemMissing):
+            cart_store.mutate_account_cart(self.account.id, "set", second.id, quantity=1)
+        # Chỉ xếp job ghi DB 1 lần cho cả chuỗi thao tác trong 1 chu kỳ
+        self.assertEqual(self.scheduled.call_count, 1)
+
+    def test_replace_requires_unchanged_version(self):
+        variant = self.add_items(1)
+        store = cart_store.account_cart(self.account.id)
+        state = cart_store.read_account_cart(self.account.id)
+        self.assertIsNone(store.replace(state["version"] + 1, {variant.id: (variant.product_id, 9)}))
+
+        state = store.replace(state["version"], {variant.id: (variant.product_id, 0)})
+        self.assertEqual(state["lines"], {})
+        self.assertEqual(state["version"], 1)
+
+    def test_persist_dirty_upserts_and_removes_lines(self):
+        kept = self.add_items(1)
+        removed = self.add_items(1)
+        deleted = self.add_items(1)
+        cart_store.mutate_account_cart(self.account.id, "set", kept.id, quantity=7)
+        cart_store.mutate_account_cart(self.account.id, "del", removed.id)
+        deleted.delete()
+
+        self.assertEqual(cart_store.persist_dirty(), 1)
+        self.assertEqual(list(CartItem.objects.filter(cart=self.cart).values_list("product_variant_id", "quantity")),
+                         [(kept.id, 7)])
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.version, 2)
+        self.assertEqual(self.redis.scard(cart_store.DIRTY_KEY), 0)
+        # Variant đã bị xóa cũng bị bỏ khỏi hash trong Redis
+        self.assertEqual(self.lines(cart_store.read_account_cart(self.account.id)), [(kept.id, 7)])
+
+    def test_persist_creates_cart_for_new_account(self):
+        variant = self.add_items(1)
+        account = Account.objects.create(username="khach2")
+        cart_store.mutate_account_cart(account.id, "add", variant.id, variant.product_id, 2)
+
+        cart_store.persist_dirty()
+        cart = Cart.objects.get(account=account)
+        self.assertEqual(list(cart.items.values_list("product_variant_id", "quantity")), [(variant.id, 2)])
+        self.assertEqual(cart_store.read_account_cart(account.id)["cart_id"], cart.id)
+
+    def test_guest_cart_is_merged_once(self):
+        variant = self.add_items(1)
+        token = cart_guest.new_token()
+        guest = cart_guest.guest_cart(cart_guest.guest_id(token))
+        cart_store.mutate_cart(guest, "add", variant.id, variant.product_id, 2)
+
+        # Đăng nhập 2 lần cùng token: lần sau không còn gì để gộp
+        self.assertEqual(cart_guest.merge_guest_cart(token, self.account), 1)
+        self.assertEqual(cart_guest.merge_guest_cart(token, self.account), 0)
+        self.assertEqual(self.lines(cart_store.read_account_cart(self.account.id)), [(variant.id, 5)])
+        self.assertIsNone(guest.read())
+
+    def test_failed_guest_merge_restores_guest_cart(self):
+        variant = self.add_items(1)
+        token = cart_guest.new_token()
+        guest = cart_guest.guest_cart(cart_guest.guest_id(token))
+        cart_store.mutate_cart(guest, "add", variant.id, variant.product_id, 2)
+
+        with mock.patch("cart.guest.merge_lines", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                cart_guest.merge_guest_cart(token, self.account)
+        self.assertEqual(self.lines(guest.read()), [(variant.id, 2)])
+
+    def test_missing_account_is_not_added_to_redis(self):
+        variant = self.add_items(1)
+        response = self.client.post("/cart/999999/add/", {
+            "product_id": variant.product_id, "product_variant_id": variant.id, "quantity": 1,
+        }, format="json")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post("/cart/999999/batch/", {
+            "operations": [{"op": "add", "product_variant_id": variant.id}],
+        }, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(self.redis.exists(cart_store.account_cart(999999).key))
+        self.assertEqual(self.redis.scard(cart_store.DIRTY_KEY), 0)
+
+    def test_persist_dirty_skips_failing_accounts(self):
+        variant = self.add_items(1)
+        # Giỏ còn trong Redis của tài khoản đã bị xóa
+        orphan = cart_store.account_cart(999999)
+        orphan.load({variant.id: (variant.product_id, 1)})
+        self.redis.sadd(cart_store.DIRTY_KEY, 999999)
+        cart_store.mutate_account_cart(self.account.id, "set", variant.id, quantity=5)
+
+        cart_store.persist_dirty()
+        self.assertEqual(list(self.cart.items.values_list("quantity", flat=True)), [5])
+        self.assertFalse(self.redis.exists(orphan.key))
+        self.assertEqual(self.redis.scard(cart_store.DIRTY_KEY), 0)
+
+        # Lỗi khác: ghi log, vẫn ghi các giỏ còn lại và giữ giỏ lỗi cho lần sau
+        account = Account.objects.create(username="khach2")
+        cart_store.mutate_account_cart(account.id, "add", variant.id, variant.product_id, 1)
+        cart_store.mutate_account_cart(self.account.id, "set", variant.id, quantity=6)
+        persist = cart_store.persist_account_cart
+
+        def flaky(account_id):
+            if account_id == account.id:
+                raise RuntimeError("db down")
+            persist(account_id)
+
+        with mock.patch("cart.store.persist_account_cart", side_effect=flaky), self.assertLogs("cart.store"):
+            self.assertEqual(cart_store.persist_dirty(), 1)
+        self.assertEqual(list(self.cart.items.values_list("quantity", flat=True)), [6])
+        self.assertEqual(self.redis.smembers(cart_store.DIRTY_KEY), {str(account.id).encode()})
@@ -2,8 +2,12 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path('guest/', views.get_guest_cart, name='get_guest_cart'),
+    path('guest/add/', views.guest_add_to_cart, name='guest_add_to_cart'),
+    path('guest/batch/', views.guest_batch_update_cart, name='guest_batch_update_cart'),
+    path('guest/item/<int:variant_id>/', views.guest_cart_item, name='guest_cart_item'),
     path('<int:account_id>/', views.get_cart_by_userid, name="get_cart"),
     path('<int:user_id>/add/', views.add_to_cart, name='add_to_cart'),
-    path('<int:user_id>/item/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
-    path('<int:user_id>/item/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('<int:user_id>/batch/', views.batch_update_cart, name='batch_update_cart'),
+    path('<int:user_id>/item/<int:item_id>/', views.cart_item, name='cart_item'),
 ]
\ No newline at end of file
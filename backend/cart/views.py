@@ -1,29 +1,58 @@
-from django.http import JsonResponse
+from django.db import transaction
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from accounts.models import Account
 from products.models import Product, ProductVariant
+from . import guest, store as cart_store
+from .batch import BatchError, CartConflict, apply_db_batch, apply_redis_batch, parse_operations
 from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer
+from .serializers import CartSerializer, CartItemSerializer, cart_delta, serialize_cart, with_read_relations
+
+
+# ETag của giỏ = version; client gửi lại trong If-None-Match để nhận 304 khi giỏ chưa đổi
+def with_etag(response, version):
+    response['ETag'] = quote_etag(str(version))
+    return response
+
+
+def not_modified(request, version):
+    if version is None:
+        return False
+    return quote_etag(str(version)) in parse_etags(request.headers.get('If-None-Match', ''))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_cart_by_userid(request, account_id):
     try:
+        if cart_store.is_enabled():
+            state = cart_store.read_account_cart(account_id)
+            if not_modified(request, state['version']):
+                return with_etag(HttpResponseNotModified(), state['version'])
+            response = JsonResponse({'success': True, 'data': cart_store.cart_data(state, account_id)}, status=200)
+            return with_etag(response, state['version'])
+
+        # Kiểm tra version trước (1 query), chưa đổi thì không cần đọc cả giỏ
+        version = Cart.objects.filter(account_id=account_id).order_by('id').values_list('version', flat=True).first()
+        if not_modified(request, version):
+            return with_etag(HttpResponseNotModified(), version)
+
         account = Account.objects.get(id=account_id)
-        cart = Cart.objects.get(account=account)
+        cart = with_read_relations(Cart.objects.filter(account=account)).get()
         serializer = CartSerializer(cart)
 
-        return JsonResponse(
+        response = JsonResponse(
             {
                 'success': True,
                 'data': serializer.data
             },
             status=200
         )
+        return with_etag(response, cart.version)
 
     except Account.DoesNotExist:
         return JsonResponse(
@@ -57,6 +86,10 @@ def add_to_cart(request, user_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if cart_store.is_enabled():
+            store = cart_store.account_cart(user_id)
+            return redis_add_to_cart(store, int(product_id), int(product_variant_id), int(quantity))
+
         # Lấy account và cart
         account = Account.objects.get(id=user_id)
         cart, created = Cart.objects.get_or_create(account=account)
@@ -66,26 +99,29 @@ def add_to_cart(request, user_id):
         product_variant = ProductVariant.objects.get(id=product_variant_id, product=product)
 
         # Thêm hoặc cập nhật cart item
-        cart_item, item_created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            product_variant=product_variant,
-            defaults={'quantity': int(quantity)}
-        )
+        with transaction.atomic():
+            cart_item, item_created = CartItem.objects.get_or_create(
+                cart=cart,
+                product=product,
+                product_variant=product_variant,
+                defaults={'quantity': int(quantity)}
+            )
 
-        if not item_created:
-            cart_item.quantity += int(quantity)
-            cart_item.save()
+            if not item_created:
+                cart_item.quantity += int(quantity)
+                cart_item.save()
+            cart.bump_version()
 
-        serializer = CartSerializer(cart)
-        return Response(
+        # Chỉ trả dòng vừa đổi + tổng mới, không serialize lại cả giỏ
+        response = Response(
             {
                 'success': True,
                 'message': 'Product added to cart',
-                'data': serializer.data
+                'data': cart_delta(cart, cart_item.id, cart_item)
             },
             status=status.HTTP_201_CREATED
         )
+        return with_etag(response, cart.version)
 
     except Account.DoesNotExist:
         return Response(
@@ -109,9 +145,78 @@ def add_to_cart(request, user_id):
         )
 
 
-#Sửa quantity
-@api_view(['PUT'])
+def redis_add_to_cart(store, product_id, product_variant_id, quantity):
+    # Kiểm tra product / variant bằng product card; chỉ query DB khi card thiếu variant
+    card = cart_store.variant_card(product_id, product_variant_id)
+    if card is None:
+        return Response({'success': False, 'message': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    if cart_store.find_variant(card, product_variant_id) is None:
+        return Response({'success': False, 'message': 'Product variant not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    state = cart_store.mutate_cart(store, "add", product_variant_id, product_id, quantity)
+    response = Response(
+        {
+            'success': True,
+            'message': 'Product added to cart',
+            'data': cart_store.cart_delta(state, product_variant_id)
+        },
+        status=status.HTTP_201_CREATED
+    )
+    return with_etag(response, state['version'])
+
+
+# Thêm / sửa / xóa nhiều dòng trong 1 request (xem cart/batch.py), trả về giỏ 1 lần
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
+def batch_update_cart(request, user_id):
+    try:
+        operations = parse_operations(request.data.get('operations'))
+
+        if cart_store.is_enabled():
+            state = apply_redis_batch(cart_store.account_cart(user_id), operations)
+            data = cart_store.cart_data(state, user_id)
+        else:
+            account = Account.objects.get(id=user_id)
+            data = serialize_cart(apply_db_batch(account, operations))
+
+        response = Response(
+            {'success': True, 'message': 'Cart updated', 'data': data},
+            status=status.HTTP_200_OK
+        )
+        return with_etag(response, data['version'])
+
+    except BatchError as e:
+        return Response(
+            {'success': False, 'message': str(e), 'errors': e.errors},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Account.DoesNotExist:
+        return Response(
+            {'success': False, 'message': 'Account not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except CartConflict:
+        return Response(
+            {'success': False, 'message': 'Cart was modified concurrently, please retry'},
+            status=status.HTTP_409_CONFLICT
+        )
+    except Exception as e:
+        return Response(
+            {'success': False, 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Sửa và xóa dùng chung URL nên phân theo method
+@api_view(['PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def cart_item(request, user_id, item_id):
+    if request.method == 'DELETE':
+        return remove_from_cart(request, user_id, item_id)
+    return update_cart_item(request, user_id, item_id)
+
+
+#Sửa quantity (giỏ Redis: item_id là product_variant_id)
 def update_cart_item(request, user_id, item_id):
     try:
         quantity = request.data.get('quantity')
@@ -128,31 +233,41 @@ def update_cart_item(request, user_id, item_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if cart_store.is_enabled():
+            state = cart_store.mutate_account_cart(user_id, "set", item_id, quantity=int(quantity))
+            response = Response(
+                {'success': True, 'message': 'Cart item updated', 'data': cart_store.cart_delta(state, item_id)},
+                status=status.HTTP_200_OK
+            )
+            return with_etag(response, state['version'])
+
         # Lấy cart item
         account = Account.objects.get(id=user_id)
         cart = Cart.objects.get(account=account)
-        cart_item = CartItem.objects.get(id=item_id, cart=cart)
+        cart_item = CartItem.objects.select_related('product', 'product_variant').get(id=item_id, cart=cart)
 
         # Cập nhật quantity
-        cart_item.quantity = int(quantity)
-        cart_item.save()
+        with transaction.atomic():
+            cart_item.quantity = int(quantity)
+            cart_item.save()
+            cart.bump_version()
 
-        serializer = CartSerializer(cart)
-        return Response(
+        response = Response(
             {
                 'success': True,
                 'message': 'Cart item updated',
-                'data': serializer.data
+                'data': cart_delta(cart, cart_item.id, cart_item)
             },
             status=status.HTTP_200_OK
         )
+        return with_etag(response, cart.version)
 
     except (Account.DoesNotExist, Cart.DoesNotExist):
         return Response(
             {'success': False, 'message': 'Cart not found'},
             status=status.HTTP_404_NOT_FOUND
         )
-    except CartItem.DoesNotExist:
+    except (CartItem.DoesNotExist, cart_store.CartItemMissing):
         return Response(
             {'success': False, 'message': 'Cart item not found'},
             status=status.HTTP_404_NOT_FOUND
@@ -164,33 +279,41 @@ def update_cart_item(request, user_id, item_id):
         )
 
 
-#Xóa sản phẩm
-@api_view(['DELETE'])
-@permission_classes([IsAuthenticated])
+#Xóa sản phẩm (giỏ Redis: item_id là product_variant_id)
 def remove_from_cart(request, user_id, item_id):
     try:
+        if cart_store.is_enabled():
+            state = cart_store.mutate_account_cart(user_id, "del", item_id)
+            response = Response(
+                {'success': True, 'message': 'Product removed from cart', 'data': cart_store.cart_delta(state, item_id)},
+                status=status.HTTP_200_OK
+            )
+            return with_etag(response, state['version'])
+
         account = Account.objects.get(id=user_id)
         cart = Cart.objects.get(account=account)
         cart_item = CartItem.objects.get(id=item_id, cart=cart)
 
-        cart_item.delete()
+        with transaction.atomic():
+            cart_item.delete()
+            cart.bump_version()
 
-        serializer = CartSerializer(cart)
-        return Response(
+        response = Response(
             {
                 'success': True,
                 'message': 'Product removed from cart',
-                'data': serializer.data
+                'data': cart_delta(cart, item_id)
             },
             status=status.HTTP_200_OK
         )
+        return with_etag(response, cart.version)
 
     except (Account.DoesNotExist, Cart.DoesNotExist):
         return Response(
             {'success': False, 'message': 'Cart not found'},
             status=status.HTTP_404_NOT_FOUND
         )
-    except CartItem.DoesNotExist:
+    except (CartItem.DoesNotExist, cart_store.CartItemMissing):
         return Response(
             {'success': False, 'message': 'Cart item not found'},
             status=status.HTTP_404_NOT_FOUND
@@ -202,3 +325,118 @@ def remove_from_cart(request, user_id, item_id):
         )
 
 
+# ===== GIỎ CỦA KHÁCH (xem cart/guest.py), dòng giỏ xác định bằng product_variant_id =====
+def with_guest_token(response, token):
+    response[guest.HEADER] = token
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_guest_cart(request):
+    try:
+        store, token = guest.guest_store(request)
+        state = guest.read_guest_cart(store)
+        if not_modified(request, state['version']):
+            return with_guest_token(with_etag(HttpResponseNotModified(), state['version']), token)
+
+        response = JsonResponse({'success': True, 'data': cart_store.cart_data(state, None)}, status=200)
+        return with_guest_token(with_etag(response, state['version']), token)
+
+    except Exception as e:
+        return JsonResponse(
+            {'success': False, 'message': str(e)},
+            status=500
+        )
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def guest_add_to_cart(request):
+    try:
+        product_id = request.data.get('product_id')
+        product_variant_id = request.data.get('product_variant_id')
+        quantity = request.data.get('quantity', 1)
+
+        if not product_id or not product_variant_id or not quantity:
+            return Response(
+                {'success': False, 'message': 'product_id, product_variant_id and quantity are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        store, token = guest.guest_store(request)
+        response = redis_add_to_cart(store, int(product_id), int(product_variant_id), int(quantity))
+        return with_guest_token(response, token)
+
+    except Exception as e:
+        return Response(
+            {'success': False, 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['PUT', 'DELETE'])
+@permission_classes([AllowAny])
+def guest_cart_item(request, variant_id):
+    try:
+        store, token = guest.guest_store(request)
+        if request.method == 'DELETE':
+            state = cart_store.mutate_cart(store, "del", variant_id)
+            message = 'Product removed from cart'
+        else:
+            quantity = request.data.get('quantity')
+            if not quantity or int(quantity) <= 0:
+                return Response(
+                    {'success': False, 'message': 'Quantity must be greater than 0'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            state = cart_store.mutate_cart(store, "set", variant_id, quantity=int(quantity))
+            message = 'Cart item updated'
+
+        response = Response(
+            {'success': True, 'message': message, 'data': cart_store.cart_delta(state, variant_id)},
+            status=status.HTTP_200_OK
+        )
+        return with_guest_token(with_etag(response, state['version']), token)
+
+    except cart_store.CartItemMissing:
+        return Response(
+            {'success': False, 'message': 'Cart item not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        return Response(
+            {'success': False, 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def guest_batch_update_cart(request):
+    try:
+        operations = parse_operations(request.data.get('operations'))
+        store, token = guest.guest_store(request)
+        state = apply_redis_batch(store, operations)
+
+        response = Response(
+            {'success': True, 'message': 'Cart updated', 'data': cart_store.cart_data(state, None)},
+            status=status.HTTP_200_OK
+        )
+        return with_guest_token(with_etag(response, state['version']), token)
+
+    except BatchError as e:
+        return Response(
+            {'success': False, 'message': str(e), 'errors': e.errors},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except CartConflict:
+        return Response(
+            {'success': False, 'message': 'Cart was modified concurrently, please retry'},
+            status=status.HTTP_409_CONFLICT
+        )
+    except Exception as e:
+        return Response(
+            {'success': False, 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
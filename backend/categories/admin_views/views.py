@@ -1,11 +1,12 @@
-from django.core.cache import cache
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAdminUser
 from categories.models import Category
 from categories.serializers import CategorySerializer
-from utils.delete_cache import delete_product_cache
+from products.cards import schedule_product_refresh
+from products.search import index_products
+from utils.delete_cache import delete_category_cache
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
@@ -33,8 +34,7 @@ def add_category(request):
             status="Active"
         )
         category.save()
-        cache.delete("all_categories")
-        delete_product_cache()
+        delete_category_cache()
 
         serializer = CategorySerializer(category)
         return JsonResponse(
@@ -62,8 +62,11 @@ def update_category(request, category_id):
             category.status = status_value
         category.save()
 
-        cache.delete("all_categories")
-        delete_product_cache()
+        if category_name:
+            product_ids = list(category.products.values_list("id", flat=True))
+            index_products(product_ids)
+            schedule_product_refresh(product_ids)
+        delete_category_cache()
 
         serializer = CategorySerializer(category)
         return JsonResponse({"message": "Category updated successfully.", "category": serializer.data}, status=200)
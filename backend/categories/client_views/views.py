@@ -1,5 +1,4 @@
 import logging
-from django.core.cache import cache
 from django.db.models import Prefetch
 from django.http import JsonResponse
 from django.utils.text import slugify
@@ -7,8 +6,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from categories.models import Category
 from categories.serializers import CategorySerializer
-from products.models import Product, ProductImage, ProductVariant
-from products.serializers import ProductSerializer
+from products.models import Product
+from products.cards import load_cards
+from utils.cache_fetch import get_or_build
+from utils.cache_tags import PRODUCT_TAG, CATEGORY_TAG
 
 logger = logging.getLogger(__name__)
 
@@ -17,38 +18,25 @@ logger = logging.getLogger(__name__)
 def get_product_by_category(request, category_name):
     # Cache key
     normalized_name = category_name.lower().strip().replace(" ", "-")
-    CACHE_KEY = f"category_products_{normalized_name}"
 
-    # Kiểm tra cache
-    cached_data = cache.get(CACHE_KEY)
-    if cached_data is not None:
-        logger.info(f"Cache hit: {category_name}")
-        return JsonResponse(cached_data, status=200)
+    def build():
+        # Tìm category
+        category = find_category_by_identifier(category_name)
+        if not category:
+            return None
 
-    logger.info(f"Cache miss: {category_name}")
-
-    # Tìm category
-    category = find_category_by_identifier(category_name)
-    if not category:
-        return JsonResponse({
-            "success": False,
-            "error": f"Không tìm thấy category: {category_name}"
-        }, status=404)
-
-    try:
-        products_qs = (
+        product_ids = (
             Product.objects
             .filter(category=category)
-            .select_related("category")
-            .prefetch_related("product_imgs", "product_variants")
             .order_by("-created_at")
+            .values_list("id", flat=True)
         )
 
-        # Serialize
-        products_data = ProductSerializer(products_qs, many=True).data
+        # Đọc card đã serialize sẵn
+        products_data = load_cards(product_ids)
+        logger.info(f"Cached {len(products_data)} products for: {category.name}")
 
-        # Response
-        response_data = {
+        return {
             "success": True,
             "category": {
                 "id": category.id,
@@ -58,12 +46,12 @@ def get_product_by_category(request, category_name):
             "total": len(products_data)
         }
 
+    try:
         # Cache 6 giờ
-        cache.set(CACHE_KEY, response_data, timeout=60 * 60 * 6)
-        logger.info(f"Cached {len(products_data)} products for: {category.name}")
-
-        return JsonResponse(response_data, status=200)
-
+        response_data = get_or_build(
+            f"category_products_{normalized_name}", build,
+            tags=(PRODUCT_TAG, CATEGORY_TAG), timeout=60 * 60 * 6
+        )
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         return JsonResponse({
@@ -71,6 +59,14 @@ def get_product_by_category(request, category_name):
             "error": "Lỗi khi lấy sản phẩm"
         }, status=500)
 
+    if response_data is None:
+        return JsonResponse({
+            "success": False,
+            "error": f"Không tìm thấy category: {category_name}"
+        }, status=404)
+
+    return JsonResponse(response_data, status=200)
+
 
 def find_category_by_identifier(identifier):
     identifier_lower = identifier.lower().strip()
@@ -102,15 +98,12 @@ def find_category_by_identifier(identifier):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_all_category(request):
-    CACHE_KEY = "all_categories"
-    cached_data = cache.get(CACHE_KEY)
-    if cached_data:
-        return JsonResponse({"categories": cached_data}, status=200)
+    def build():
+        category = Category.objects.filter(status="Active")
+        return CategorySerializer(category, many=True).data
 
-    category = Category.objects.filter(status="Active")
-    if not category.exists():
+    data = get_or_build("all_categories", build, tags=(CATEGORY_TAG, PRODUCT_TAG))
+    if not data:
         return JsonResponse({"message": "Danh sách danh mục trống"}, status=400)
 
-    data = CategorySerializer(category, many=True).data
-    cache.set(CACHE_KEY, data, timeout=86400)
     return JsonResponse({"categories": data}, status=200)
\ No newline at end of file
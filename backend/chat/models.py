@@ -11,3 +11,8 @@ class ChatMessage(models.Model):
     sender = models.ForeignKey(Account, on_delete=models.CASCADE)
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["room", "created_at"]),
+        ]
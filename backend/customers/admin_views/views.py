@@ -1,4 +1,4 @@
-from django.db.models import Sum, Count
+from django.db.models import Count, Q, Sum
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
@@ -6,7 +6,8 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 from accounts.models import Account, User
 from customers.models import CustomerAddress
-from orders.models import Order
+from analytics.reports import customer_stats
+from orders.models import Order, CANCELLED_STATUSES
 from reviews.models import Review
 
 
@@ -24,11 +25,20 @@ def get_user_detail(request, account_id):
             filter(None, [addr.address_detail, addr.ward, addr.district, addr.province])) if addr else "Chưa cập nhật"
 
         # 2. Thống kê đơn hàng (Dùng ship_status theo Model choices)
+        # Đọc từ bảng CustomerStats tính sẵn; khách chưa có dòng (chưa backfill) thì tính trực tiếp
+        # Số đơn tính cả đơn đã hủy (như trước), tổng chi tiêu thì không tính đơn đã hủy
         orders = Order.objects.filter(customer=account_base)
-        order_stats = orders.aggregate(
-            total_orders=Count('id'),
-            total_spent=Sum('total_amount')
-        )
+        stats = customer_stats(account_id)
+        if stats:
+            order_stats = {
+                'total_orders': stats['order_count'] + stats['cancelled_count'],
+                'total_spent': stats['total_spent'],
+            }
+        else:
+            order_stats = orders.aggregate(
+                total_orders=Count('id'),
+                total_spent=Sum('total_amount', filter=~Q(ship_status__in=CANCELLED_STATUSES))
+            )
 
         # 3. Danh sách đơn hàng & Đánh giá (Sử dụng get_FIELD_display() để bỏ map thủ công)
         order_list = [{
@@ -1,4 +1,3 @@
-from django.core.cache import cache
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -7,6 +6,9 @@ from rest_framework import status
 from customers.serializers import CustomerAddressSerializer
 from customers.models import CustomerAddress
 from accounts.models import Account
+from utils.cache_fetch import get_or_build
+from utils.cache_tags import user_tag, ADDRESS_TAG
+from utils.delete_cache import delete_address_cache
 
 
 @api_view(['POST'])
@@ -32,7 +34,7 @@ def add_address(request, account_id):
         )
 
         serializer = CustomerAddressSerializer(address)
-        cache.delete(f"all_address_{account_id}")
+        delete_address_cache(account_id)
 
         return JsonResponse({
             "message": "Thêm địa chỉ thành công",
@@ -62,7 +64,7 @@ def update_address(request, address_id):
         address.is_default = is_default
         address.save()
         serializer = CustomerAddressSerializer(address)
-        cache.delete(f"all_address_{address.account_id}")
+        delete_address_cache(address.account_id)
 
         return JsonResponse({
             "message": "Cập nhật địa chỉ thành công",
@@ -80,7 +82,7 @@ def delete_address(request, address_id):
         address = CustomerAddress.objects.get(id=address_id)
         acc_id = address.account_id
         address.delete()
-        cache.delete(f"all_address_{acc_id}")
+        delete_address_cache(acc_id)
         return Response({"message": "Xóa địa chỉ thành công"}, status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -91,14 +93,11 @@ def delete_address(request, address_id):
 @permission_classes([IsAuthenticated])
 def get_all_address(request, account_id):
     try:
-        KEY = f"all_address_{account_id}"
-        data = cache.get(KEY)
-
-        if data is None:
+        def build():
             addresses = CustomerAddress.objects.filter(account_id=account_id).order_by('-is_default', '-created_at')
-            serializer = CustomerAddressSerializer(addresses, many=True)
-            data = serializer.data
-            cache.set(KEY, data, timeout=86400)
+            return CustomerAddressSerializer(addresses, many=True).data
+
+        data = get_or_build(f"all_address_{account_id}", build, tags=(user_tag(ADDRESS_TAG, account_id),))
 
         return Response({"addresses": data}, status=200)
 
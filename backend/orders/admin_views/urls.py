@@ -3,5 +3,7 @@ from orders.admin_views import views
 
 urlpatterns = [
     path('all-orders/', views.get_all_orders_admin),
+    path('list/', views.list_orders),
+    path('<int:order_id>/', views.get_order_detail_admin),
     path('update/<int:order_id>/', views.update_order_status_admin),
 ]
@@ -1,13 +1,14 @@
+from datetime import date
 from django.core.cache import cache
 from django.db import transaction
-from django.db.models import F, Sum
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
-from orders.models import Order
-from orders.serializers import OrderSerializer
-from products.models import ProductVariant, Product
-from utils.delete_cache import delete_order_cache
+from orders import events, flash_stock, stock
+from orders.models import Order, OrderEvent, OrderSummary, CANCELLED_STATUSES
+from orders.serializers import OrderSerializer, with_read_relations
+from orders.summary import summary_data
+from utils.pagination import cached_count, keyset_paginate, parse_page_size, InvalidCursor
 
 
 # 1. API lấy toàn bộ đơn hàng (Admin)
@@ -15,7 +16,7 @@ from utils.delete_cache import delete_order_cache
 @permission_classes([IsAdminUser])
 def get_all_orders_admin(request):
     try:
-        orders_qs = Order.objects.all().order_by('-order_date')
+        orders_qs = with_read_relations(Order.objects.all().order_by('-order_date'))
         orders_data = OrderSerializer(orders_qs, many=True).data
 
         return JsonResponse({
@@ -28,6 +29,71 @@ def get_all_orders_admin(request):
         return JsonResponse({"error": str(e)}, status=500)
 
 
+ADMIN_ORDER_SORT_FIELDS = ["order_date", "total_amount"]
+ADMIN_ORDER_FILTERS = ["ship_status", "payment_status", "customer", "date_from", "date_to"]
+ADMIN_ORDER_COUNT_TIMEOUT = 60
+
+
+def filter_admin_orders(params):
+    summaries = OrderSummary.objects.all()
+
+    if params.get("ship_status"):
+        summaries = summaries.filter(ship_status=params["ship_status"])
+    if params.get("payment_status"):
+        summaries = summaries.filter(payment_status=params["payment_status"])
+    if params.get("customer"):
+        summaries = summaries.filter(customer_id=int(params["customer"]))
+    if params.get("date_from"):
+        summaries = summaries.filter(order_date__date__gte=date.fromisoformat(params["date_from"]))
+    if params.get("date_to"):
+        summaries = summaries.filter(order_date__date__lte=date.fromisoformat(params["date_to"]))
+
+    return summaries
+
+
+# API danh sách đơn hàng có phân trang + lọc (Admin), đọc từ bảng OrderSummary
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def list_orders(request):
+    params = request.query_params
+    sort = params.get("sort", "order_date")
+    if sort not in ADMIN_ORDER_SORT_FIELDS:
+        return JsonResponse({"error": f"sort chỉ nhận: {', '.join(ADMIN_ORDER_SORT_FIELDS)}"}, status=400)
+    descending = params.get("order", "desc") != "asc"
+    page_size = parse_page_size(params.get("limit"))
+
+    try:
+        summaries = filter_admin_orders(params)
+        items, next_cursor = keyset_paginate(
+            summaries, params.get("cursor"), page_size, field=sort, descending=descending
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({"error": "Tham số lọc không hợp lệ"}, status=400)
+
+    filters = {k: params.get(k) for k in ADMIN_ORDER_FILTERS}
+    total = cached_count("admin_orders_count", filters, summaries, ADMIN_ORDER_COUNT_TIMEOUT)
+
+    return JsonResponse({
+        "orders": [summary_data(s) for s in items],
+        "next_cursor": next_cursor,
+        "page_size": page_size,
+        "total_items": total,
+        "total_is_estimate": True,
+    })
+
+
+# API chi tiết 1 đơn (Admin): items, địa chỉ, khách hàng
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_order_detail_admin(request, order_id):
+    order = with_read_relations(Order.objects.filter(id=order_id)).first()
+    if not order:
+        return JsonResponse({"success": False, "error": "Đơn hàng không tồn tại"}, status=404)
+    return JsonResponse({"success": True, "data": OrderSerializer(order).data}, status=200)
+
+
 # 2. API cập nhật trạng thái (Admin)
 @api_view(['PATCH'])
 @permission_classes([IsAdminUser])
@@ -39,20 +105,13 @@ def update_order_status_admin(request, order_id):
             new_status = request.data.get("status")
             cancel_reason = request.data.get("cancelReason", "")
 
-            if new_status == "Đã hủy" and order.ship_status != "Đã hủy":
-                product_ids = set()
-                for item in order.items.all():
-                    variant = item.product_variant
-                    qty = item.quantity
-                    ProductVariant.objects.filter(id=variant.id).update(
-                        stock_quantity=F("stock_quantity") + qty
-                    )
-                    product_ids.add(variant.product_id)
-
-                for p_id in product_ids:
-                    total_stock = ProductVariant.objects.filter(product_id=p_id).aggregate(Sum("stock_quantity"))[
-                        'stock_quantity__sum']
-                    Product.objects.filter(id=p_id).update(stock_quantity=total_stock or 0)
+            # Đơn đã bị hủy (bởi client hoặc admin) thì không trả tồn kho lần nữa
+            cancelling = new_status in CANCELLED_STATUSES and order.ship_status not in CANCELLED_STATUSES
+            product_deltas = {}
+            if cancelling:
+                flash_quantities, quantities = flash_stock.split(stock.order_quantities(order))
+                product_deltas = stock.release(quantities)
+                transaction.on_commit(lambda: flash_stock.release(flash_quantities))
 
             # Cập nhật thông tin đơn
             order.ship_status = new_status
@@ -61,8 +120,11 @@ def update_order_status_admin(request, order_id):
 
             order.save()
 
-            # Xóa cache liên quan
-            delete_order_cache(order.customer.account_id)
+            # Cache, summary, thống kê... được xử lý nền từ sự kiện này
+            if cancelling:
+                events.emit(order, OrderEvent.CANCELLED, status=new_status, product_ids=list(product_deltas))
+            else:
+                events.emit(order, OrderEvent.STATUS_CHANGED, status=new_status)
 
             return JsonResponse({
                 "success": True,
@@ -1,121 +1,105 @@
-from django.core.cache import cache
 from django.db import transaction
-from django.db.models import F, Sum
+from django.db.models import F
 from django.http import JsonResponse
 from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from customers.models import CustomerAddress
-from products.models import ProductVariant, Product
-from orders.models import Order
-from orders.serializers import OrderSerializer
-from utils.delete_cache import delete_order_cache
+from orders import events, flash_stock, stock
+from orders.models import Order, OrderEvent, CANCELLED_STATUSES
+from orders.serializers import OrderSerializer, with_read_relations
+from utils.cache_fetch import get_or_build
+from utils.cache_tags import user_tag, ORDER_TAG
 from voucher.models import Voucher, UserVoucher
 
 
+class InvalidVoucher(Exception):
+    pass
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_order(request):
     try:
-        with transaction.atomic():
-            data = request.data
-            items = data.get("items", [])
-            variant_ids = [item["product_variant"] for item in items]
-            voucher_id = data.get("voucher_id")  # Voucher optional
-
-            # Lock variants
-            locked_variants = {
-                variant.id: variant
-                for variant in ProductVariant.objects.select_for_update().filter(id__in=variant_ids)
-            }
-
-            if len(locked_variants) != len(variant_ids):
-                return JsonResponse({"error": "Một hoặc nhiều biến thể sản phẩm không tồn tại"}, status=404)
-
-            product_ids = set()
-            for item in items:
-                variant_id = item["product_variant"]
-                quantity = item["quantity"]
-                variant = locked_variants[variant_id]
-                product_ids.add(variant.product_id)
-                if variant.stock_quantity < quantity:
-                    product_name = Product.objects.get(id=variant.product_id).name
-                    return JsonResponse({
-                        "error": f"Biến thể '{variant.name}' của sản phẩm '{product_name}' "
-                                 f"không đủ hàng. Còn lại: {variant.stock_quantity}, bạn cần: {quantity}"
-                    }, status=400)
-
-            # Lock products
-            locked_products = {
-                product.id: product
-                for product in Product.objects.select_for_update().filter(id__in=product_ids)
-            }
-
-            # Update variant stock
-            for item in items:
-                variant_id = item["product_variant"]
-                qty = item["quantity"]
-                ProductVariant.objects.filter(id=variant_id).update(stock_quantity=F("stock_quantity") - qty)
-
-            # Update total stock
-            for product_id in product_ids:
-                total_variant_stock = ProductVariant.objects.select_for_update().filter(
-                    product_id=product_id
-                ).aggregate(total_sum=Sum("stock_quantity"))
-                new_stock = total_variant_stock.get('total_sum') or 0
-                Product.objects.filter(id=product_id).update(stock_quantity=new_stock)
+        data = request.data
+        items = data.get("items", [])
+        voucher_id = data.get("voucher_id")  # Voucher optional
+
+        if not items:
+            return JsonResponse({"error": "Đơn hàng không có sản phẩm"}, status=400)
+
+        serializer = OrderSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse({"success": False, "errors": serializer.errors}, status=400)
+
+        address = CustomerAddress.objects.get(id=data.get("address"))
 
+        # Variant đang flash sale giữ hàng trong Redis, phần còn lại đi DB
+        flash_quantities, quantities = flash_stock.split(stock.merge_quantities(items))
+
+        # Kiểm tra tồn kho không lock, đơn chắc chắn thiếu hàng bị loại trước khi mở transaction
+        variant_products = stock.check_available(quantities)
+
+        with flash_stock.reservation(flash_quantities), transaction.atomic():
             # Voucher
             user_voucher = None
             if voucher_id:
-                user_voucher = UserVoucher.objects.select_for_update().filter(
+                user_voucher = UserVoucher.objects.select_for_update().select_related("voucher").filter(
                     id=voucher_id,
                     user=request.user,
                     is_used=False
                 ).first()
                 if not user_voucher or not user_voucher.voucher.is_valid():
-                    return JsonResponse({"error": "Voucher không hợp lệ hoặc đã sử dụng"}, status=400)
-
-            # Create order
-            address = CustomerAddress.objects.get(id=data.get("address"))
-            serializer = OrderSerializer(data=data)
-            if serializer.is_valid():
-                order = serializer.save(
-                    customer=request.user,
-                    address=address,
-                    voucher=user_voucher.voucher if user_voucher else None,
-                    user_voucher=user_voucher
-                )
-
-                # Tính giảm giá nếu có voucher
-                if user_voucher:
-                    voucher = user_voucher.voucher
-                    if voucher.discount_type == "Percent":
-                        discount = order.total_amount * voucher.discount_value / 100
-                        if hasattr(voucher, "max_discount_amount") and voucher.max_discount_amount:
-                            discount = min(discount, voucher.max_discount_amount)
-                    else:
-                        discount = voucher.discount_value
+                    # raise để transaction rollback và trả lại hàng flash sale đã giữ
+                    raise InvalidVoucher()
 
-                    order.final_amount = max(order.total_amount - discount, 0)
-                    order.save()
+            # Trừ tồn kho cả đơn trong 1 câu UPDATE; thiếu hàng -> OutOfStock, transaction rollback
+            product_deltas = stock.reserve(quantities, variant_products)
 
-                    # Đánh dấu voucher đã dùng + tăng used_count
-                    user_voucher.is_used = True
-                    user_voucher.used_at = timezone.now()
-                    user_voucher.save()
-                    Voucher.objects.filter(id=voucher.id).update(used_count=F("used_count") + 1)
+            # Create order
+            order = serializer.save(
+                customer=request.user,
+                address=address,
+                voucher=user_voucher.voucher if user_voucher else None,
+                user_voucher=user_voucher
+            )
+
+            # Tính giảm giá nếu có voucher
+            if user_voucher:
+                voucher = user_voucher.voucher
+                if voucher.discount_type.lower() == "percent":
+                    discount = order.total_amount * voucher.discount_value / 100
+                    if hasattr(voucher, "max_discount_amount") and voucher.max_discount_amount:
+                        discount = min(discount, voucher.max_discount_amount)
+                else:
+                    discount = voucher.discount_value
+
+                order.total_amount = max(order.total_amount - discount, 0)
+                order.save(update_fields=["total_amount"])
+
+                # Đánh dấu voucher đã dùng + tăng used_count
+                user_voucher.is_used = True
+                user_voucher.used_at = timezone.now()
+                user_voucher.save()
+                Voucher.objects.filter(id=voucher.id).update(used_count=F("used_count") + 1)
 
-                delete_order_cache(request.user.id)
+            # Cache, product card, thống kê... được xử lý nền từ sự kiện này
+            events.emit(order, OrderEvent.CREATED, product_ids=list(product_deltas))
 
-                return JsonResponse({
-                    "success": True,
-                    "message": "Tạo đơn hàng thành công",
-                    "order_id": order.id
-                }, status=200)
-            else:
-                return JsonResponse({"success": False, "errors": serializer.errors}, status=400)
+        return JsonResponse({
+            "success": True,
+            "message": "Tạo đơn hàng thành công",
+            "order_id": order.id
+        }, status=200)
 
+    except InvalidVoucher:
+        return JsonResponse({"error": "Voucher không hợp lệ hoặc đã sử dụng"}, status=400)
+    except stock.UnknownVariant:
+        return JsonResponse({"error": "Một hoặc nhiều biến thể sản phẩm không tồn tại"}, status=404)
+    except stock.OutOfStock as e:
+        return JsonResponse({"error": e.message(), "shortages": e.shortages}, status=400)
+    except CustomerAddress.DoesNotExist:
+        return JsonResponse({"error": "Địa chỉ không tồn tại"}, status=400)
     except Exception as e:
         print(f"Lỗi tạo đơn hàng: {str(e)}")
         return JsonResponse({"success": False, "error": "Đã xảy ra lỗi hệ thống khi tạo đơn hàng."}, status=500)
@@ -139,22 +123,16 @@ def cancel_order(request, order_id):
                     "message": f"Đơn hàng {order_id} không được tìm thấy"
                 }, status=404)
 
-            product_ids = set()
-            for item in order.items.all():
-                variant = item.product_variant
-                qty = item.quantity
-                ProductVariant.objects.filter(id=variant.id).update(
-                    stock_quantity=F("stock_quantity") + qty
-                )
-                product_ids.add(variant.product_id)
+            if order.ship_status in CANCELLED_STATUSES:
+                return JsonResponse({
+                    "success": False,
+                    "message": f"Đơn hàng {order_id} đã bị hủy trước đó"
+                }, status=400)
 
-            # Update total stock
-            for product_id in product_ids:
-                total_variant_stock = ProductVariant.objects.filter(
-                    product_id=product_id
-                ).aggregate(total_sum=Sum("stock_quantity"))
-                new_stock = total_variant_stock.get("total_sum") or 0
-                Product.objects.filter(id=product_id).update(stock_quantity=new_stock)
+            # Trả tồn kho variant + tổng product theo delta; hàng flash sale trả vào Redis sau khi commit
+            flash_quantities, quantities = flash_stock.split(stock.order_quantities(order))
+            product_deltas = stock.release(quantities)
+            transaction.on_commit(lambda: flash_stock.release(flash_quantities))
 
             # Rollback voucher nếu có
             if order.user_voucher and order.user_voucher.is_used:
@@ -170,7 +148,7 @@ def cancel_order(request, order_id):
             order.ship_status = "Cancelled"
             order.save()
 
-            delete_order_cache(user.id)
+            events.emit(order, OrderEvent.CANCELLED, status=order.ship_status, product_ids=list(product_deltas))
 
             return JsonResponse({
                 "success": True,
@@ -187,16 +165,15 @@ def cancel_order(request, order_id):
 @permission_classes([IsAuthenticated])
 def get_user_order(request):
     try:
-        KEY = f"all_orders_{request.user.id}"
-        order = cache.get(KEY)
+        user = request.user
 
-        if order is None:
-            user = request.user
-            order_qs = Order.objects.filter(
+        def build():
+            order_qs = with_read_relations(Order.objects.filter(
                 customer=user
-            ).order_by('-order_date')
-            order = OrderSerializer(order_qs, many=True).data
-            cache.set(KEY, order, timeout=86400)
+            ).order_by('-order_date'))
+            return OrderSerializer(order_qs, many=True).data
+
+        order = get_or_build(f"all_orders_{user.id}", build, tags=(user_tag(ORDER_TAG, user.id),))
 
         return JsonResponse({
             "success": True,
@@ -0,0 +1,131 @@
+import logging
+import django_rq
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+from analytics.rollups import record_order
+from orders.models import OrderEvent
+from orders.summary import refresh_summaries
+from products.cards import schedule_product_refresh
+from utils.delete_cache import delete_order_cache
+
+logger = logging.getLogger(__name__)
+
+# Transactional outbox cho vòng đời đơn hàng.
+# - View chỉ làm phần ghi bắt buộc (đơn, tồn kho, voucher) rồi gọi emit() trong cùng transaction:
+#   đơn commit thì sự kiện commit, đơn rollback thì sự kiện cũng mất.
+# - Sau khi commit, 1 job django_rq chạy dispatch_pending: khóa 1 lô sự kiện chưa xử lý
+#   (SKIP LOCKED nên nhiều worker chạy song song được) và gọi các handler trong HANDLERS.
+# - Handler lỗi thì sự kiện được giữ lại và thử lại ở lần sau (tối đa MAX_ATTEMPTS lần);
+#   lệnh "dispatch_order_events" xử lý bù khi rq không chạy.
+# Phần ghi DB của handler commit cùng lúc với processed_at nên chỉ chạy 1 lần;
+# phần Redis (bảng xếp hạng) có thể chạy lại khi retry; cache chỉ bị bỏ sau khi lô đã commit.
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 100
+
+
+def emit(order, event_type, **payload):
+    payload.setdefault("customer_id", order.customer_id)
+    OrderEvent.objects.create(order=order, event_type=event_type, payload=payload)
+    transaction.on_commit(enqueue_dispatch, robust=True)
+
+
+def enqueue_dispatch():
+    django_rq.get_queue("default").enqueue(dispatch_pending)
+
+
+# ===== HANDLERS =====
+def invalidate_cache(event):
+    # Chạy sau khi cả lô commit (OrderSummary đã ghi, card đã build lại) để người đọc
+    # không cache lại dữ liệu cũ; handler lỗi thì savepoint rollback và callback này cũng bị bỏ
+    customer_id = event.payload["customer_id"]
+    transaction.on_commit(lambda: delete_order_cache(customer_id), robust=True)
+
+
+def refresh_summary(event):
+    refresh_summaries([event.order_id])
+
+
+def refresh_products(event):
+    schedule_product_refresh(event.payload.get("product_ids", []))
+
+
+def add_to_analytics(event):
+    record_order(event.order_id, 1)
+
+
+def remove_from_analytics(event):
+    record_order(event.order_id, -1)
+
+
+def notify(event):
+    # Gửi qua channel layer cho khách và admin đang mở trang đơn hàng
+    # Không quan trọng: lỗi chỉ ghi log, không làm sự kiện phải chạy lại
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    message = {
+        "type": "order_event",
+        "order_id": event.order_id,
+        "event": event.event_type,
+        "status": event.payload.get("status"),
+    }
+    groups = (f"orders_{event.payload['customer_id']}", "orders_admin")
+
+    def send():
+        # Gửi sau khi lô commit để client tải lại thấy dữ liệu mới
+        try:
+            for group in groups:
+                async_to_sync(channel_layer.group_send)(group, message)
+        except Exception:
+            logger.exception("Không gửi được thông báo đơn hàng %s", event.order_id)
+
+    transaction.on_commit(send)
+
+
+# invalidate_cache đứng sau refresh_products: callback on_commit chạy theo thứ tự đăng ký,
+# nên cache chỉ bị bỏ sau khi card sản phẩm đã build lại
+HANDLERS = {
+    OrderEvent.CREATED: [refresh_summary, refresh_products, add_to_analytics, invalidate_cache, notify],
+    OrderEvent.CANCELLED: [refresh_summary, refresh_products, remove_from_analytics, invalidate_cache, notify],
+    OrderEvent.STATUS_CHANGED: [refresh_summary, invalidate_cache, notify],
+    OrderEvent.PAYMENT_UPDATED: [refresh_summary, invalidate_cache, notify],
+}
+
+
+def _handle(event):
+    for handler in HANDLERS.get(event.event_type, []):
+        handler(event)
+
+
+def dispatch_batch(limit=BATCH_SIZE):
+    """Xử lý 1 lô sự kiện; trả về số sự kiện đã lấy ra."""
+    with transaction.atomic():
+        events = list(
+            OrderEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+            .order_by("id")[:limit]
+        )
+        for event in events:
+            try:
+                with transaction.atomic():
+                    _handle(event)
+                event.processed_at = timezone.now()
+                event.last_error = ""
+            except Exception as e:
+                logger.exception("Lỗi xử lý sự kiện đơn hàng %s", event.id)
+                event.last_error = str(e)
+            event.attempts += 1
+            event.save(update_fields=["processed_at", "attempts", "last_error"])
+    return len(events)
+
+
+def dispatch_pending(limit=BATCH_SIZE):
+    total = 0
+    while True:
+        count = dispatch_batch(limit)
+        total += count
+        if count < limit:
+            return total
@@ -0,0 +1,285 @@
+import logging
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+import django_rq
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+from orders import stock
+from orders.models import FlashStockFlush
+from products.cards import schedule_product_refresh
+from products.models import Product, ProductVariant
+
+logger = logging.getLogger(__name__)
+
+# Chế độ flash sale: tồn kho của các variant được chọn nằm trong Redis.
+# - Giữ hàng bằng script Lua: kiểm tra đủ hàng + DECRBY cho mọi variant của đơn trong 1 lệnh nguyên tử,
+#   đồng thời cộng delta vào hash "pending" (phần chưa ghi xuống DB).
+# - Worker flush định kỳ lấy hash pending (RENAME sang key tạm) và ghi xuống
+#   ProductVariant / Product bằng orders.stock.apply_deltas trong 1 transaction.
+#   Mỗi lô được ghi 1 dòng FlashStockFlush trong cùng transaction, nên worker chết sau khi commit
+#   nhưng trước khi xóa key tạm thì lần flush sau bỏ qua lô đó thay vì trừ kho lần nữa.
+# - Bất biến: redis_stock == db_stock + pending; lệnh flash_stock reconcile kiểm tra và sửa lệch.
+# Bật bằng settings.FLASH_SALE_ENABLED; tắt thì mọi variant đi đường DB bình thường.
+
+VARIANTS_KEY = "flash:variants"
+PENDING_KEY = "flash:pending"
+FLUSHING_PREFIX = "flash:pending:flushing:"
+FLUSH_LOCK_KEY = "flash:flush-lock"
+FLUSH_SCHEDULED_KEY = "flash:flush-scheduled"
+FLUSH_LOCK_TIMEOUT = 60
+
+# KEYS[1] = pending, KEYS[2..n+1] = stock key; ARGV[1..n] = số lượng, ARGV[n+1..2n] = variant id
+# Trả về 0 nếu giữ được hết, ngược lại vị trí (1-based) của variant thiếu hàng
+RESERVE_SCRIPT = """
+local n = #ARGV / 2
+for i = 1, n do
+    local available = redis.call('GET', KEYS[i + 1])
+    if not available or tonumber(available) < tonumber(ARGV[i]) then
+        return i
+    end
+end
+for i = 1, n do
+    redis.call('DECRBY', KEYS[i + 1], ARGV[i])
+    redis.call('HINCRBY', KEYS[1], ARGV[n + i], -tonumber(ARGV[i]))
+end
+return 0
+"""
+
+# Cùng tham số với RESERVE_SCRIPT; trả về danh sách vị trí không còn ở chế độ flash (caller trả vào DB)
+RELEASE_SCRIPT = """
+local n = #ARGV / 2
+local missing = {}
+for i = 1, n do
+    if redis.call('EXISTS', KEYS[i + 1]) == 1 then
+        redis.call('INCRBY', KEYS[i + 1], ARGV[i])
+        redis.call('HINCRBY', KEYS[1], ARGV[n + i], ARGV[i])
+    else
+        table.insert(missing, i)
+    end
+end
+return missing
+"""
+
+# KEYS[1] = stock key, KEYS[2] = pending; ARGV[1] = variant id, ARGV[2] = stock trong DB, ARGV[3] = 1 nếu sửa
+# Trả về {redis_stock, pending, lệch}; đọc và sửa trong cùng script nên không lệch với đơn đang giữ hàng
+RECONCILE_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local pending = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+local drift = tonumber(ARGV[2]) + pending - current
+if ARGV[3] == '1' and drift ~= 0 then
+    redis.call('INCRBY', KEYS[1], drift)
+end
+return {current, pending, drift}
+"""
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _stock_key(variant_id):
+    return f"flash:stock:{variant_id}"
+
+
+def is_enabled():
+    return getattr(settings, "FLASH_SALE_ENABLED", False)
+
+
+def split(quantities):
+    """Tách {variant_id: qty} thành (phần flash sale, phần đi DB)."""
+    if not is_enabled() or not quantities:
+        return {}, quantities
+
+    ids = list(quantities)
+    flags = _redis().smismember(VARIANTS_KEY, ids)
+    flash = {vid: quantities[vid] for vid, flag in zip(ids, flags) if flag}
+    regular = {vid: qty for vid, qty in quantities.items() if vid not in flash}
+    return flash, regular
+
+
+def _script_args(quantities):
+    ids = list(quantities)
+    keys = [PENDING_KEY] + [_stock_key(vid) for vid in ids]
+    args = [quantities[vid] for vid in ids] + ids
+    return ids, keys, args
+
+
+def reserve(quantities):
+    if not quantities:
+        return
+
+    r = _redis()
+    ids, keys, args = _script_args(quantities)
+    failed = r.eval(RESERVE_SCRIPT, len(keys), *keys, *args)
+    if failed:
+        vid = ids[failed - 1]
+        variant = ProductVariant.objects.select_related("product").filter(id=vid).first()
+        available = r.get(_stock_key(vid))
+        raise stock.OutOfStock([{
+            "variant_id": vid,
+            "size": variant.size if variant else "",
+            "color": variant.color if variant else "",
+            "product_name": variant.product.name if variant else "",
+            "available": int(available or 0),
+            "requested": quantities[vid],
+        }])
+
+    schedule_flush()
+
+
+def release(quantities):
+    """Trả hàng vào Redis; variant đã tắt flash sale thì trả thẳng vào DB."""
+    if not quantities:
+        return
+
+    ids, keys, args = _script_args(quantities)
+    missing = _redis().eval(RELEASE_SCRIPT, len(keys), *keys, *args)
+    if missing:
+        with transaction.atomic():
+            product_deltas = stock.release({ids[i - 1]: quantities[ids[i - 1]] for i in missing})
+            schedule_product_refresh(product_deltas)
+    schedule_flush()
+
+
+@contextmanager
+def reservation(quantities):
+    # Giữ hàng trong Redis trước khi vào transaction DB; request lỗi / rollback thì trả lại
+    reserve(quantities)
+    try:
+        yield
+    except BaseException:
+        release(quantities)
+        raise
+
+
+def schedule_flush():
+    # Gom các lần giữ hàng trong FLASH_SALE_FLUSH_INTERVAL giây thành 1 job flush
+    interval = getattr(settings, "FLASH_SALE_FLUSH_INTERVAL", 2)
+    if _redis().set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=interval):
+        try:
+            django_rq.get_queue("default").enqueue_in(timedelta(seconds=interval), flush_pending)
+        except Exception:
+            # Không có worker/scheduler thì lệnh "flash_stock flush --loop" vẫn flush được
+            logger.exception("Không xếp được job flush tồn kho flash sale")
+
+
+@contextmanager
+def _flush_lock():
+    r = _redis()
+    token = uuid.uuid4().hex
+    acquired = r.set(FLUSH_LOCK_KEY, token, nx=True, ex=FLUSH_LOCK_TIMEOUT)
+    try:
+        yield bool(acquired)
+    finally:
+        if acquired and r.get(FLUSH_LOCK_KEY) == token.encode():
+            r.delete(FLUSH_LOCK_KEY)
+
+
+def _flush_locked(r):
+    # Key flushing còn sót (lần trước lỗi) được xử lý lại trước
+    keys = [k.decode() for k in r.scan_iter(f"{FLUSHING_PREFIX}*")]
+    batch_key = f"{FLUSHING_PREFIX}{uuid.uuid4().hex}"
+    try:
+        r.rename(PENDING_KEY, batch_key)
+        keys.append(batch_key)
+    except ResponseError:
+        pass  # không có pending
+
+    flushed = 0
+    for key in keys:
+        deltas = {int(vid): int(delta) for vid, delta in r.hgetall(key).items() if int(delta)}
+        if deltas:
+            try:
+                with transaction.atomic():
+                    FlashStockFlush.objects.create(batch_key=key)
+                    product_deltas = stock.apply_deltas(deltas)
+                    # Card build lại + cache catalog bị bỏ sau khi commit
+                    schedule_product_refresh(product_deltas)
+                flushed += len(deltas)
+            except IntegrityError:
+                logger.warning("Lô %s đã được ghi xuống DB trước đó, bỏ qua", key)
+        r.delete(key)
+        FlashStockFlush.objects.filter(batch_key=key).delete()
+    return flushed
+
+
+def flush_pending():
+    """Ghi delta đang chờ xuống DB; trả về số variant đã ghi (None nếu worker khác đang flush)."""
+    with _flush_lock() as acquired:
+        if not acquired:
+            return None
+        return _flush_locked(_redis())
+
+
+def enable(variant_ids):
+    r = _redis()
+    with transaction.atomic():
+        rows = list(
+            ProductVariant.objects.select_for_update().filter(id__in=variant_ids).values_list("id", "stock_quantity")
+        )
+        for vid, qty in rows:
+            r.set(_stock_key(vid), qty, nx=True)
+            r.sadd(VARIANTS_KEY, vid)
+    return [vid for vid, _ in rows]
+
+
+def disable(variant_ids):
+    r = _redis()
+    r.srem(VARIANTS_KEY, *variant_ids)
+    with _flush_lock() as acquired:
+        if not acquired:
+            raise RuntimeError("Đang có worker flush, thử lại sau")
+        _flush_locked(r)
+        r.delete(*[_stock_key(vid) for vid in variant_ids])
+
+
+def flash_variant_ids():
+    return sorted(int(vid) for vid in _redis().smembers(VARIANTS_KEY))
+
+
+def reconcile(fix=False):
+    """So Redis với DB cho mọi variant flash sale; fix=True thì đưa Redis về DB + pending.
+    Trả về danh sách {variant_id, db, redis, pending, drift} của các variant bị lệch."""
+    r = _redis()
+    with _flush_lock() as acquired:
+        if not acquired:
+            raise RuntimeError("Đang có worker flush, thử lại sau")
+        _flush_locked(r)
+
+        ids = flash_variant_ids()
+        db_stock = dict(ProductVariant.objects.filter(id__in=ids).values_list("id", "stock_quantity"))
+
+        drifts = []
+        for vid in ids:
+            if vid not in db_stock:
+                # Variant đã bị xóa khỏi DB
+                drifts.append({"variant_id": vid, "db": None, "redis": None, "pending": None, "drift": None})
+                if fix:
+                    r.srem(VARIANTS_KEY, vid)
+                    r.delete(_stock_key(vid))
+                continue
+
+            current, pending, drift = r.eval(
+                RECONCILE_SCRIPT, 2, _stock_key(vid), PENDING_KEY, vid, db_stock[vid], 1 if fix else 0
+            )
+            if drift:
+                drifts.append({
+                    "variant_id": vid, "db": db_stock[vid], "redis": current, "pending": pending, "drift": drift,
+                })
+
+        if fix:
+            _repair_product_totals(db_stock)
+    return drifts
+
+
+def _repair_product_totals(db_stock):
+    # Tổng product của các variant flash sale = SUM variant (sau flush)
+    product_ids = set(ProductVariant.objects.filter(id__in=db_stock).values_list("product_id", flat=True))
+    for product in Product.objects.filter(id__in=product_ids):
+        total = sum(product.product_variants.values_list("stock_quantity", flat=True))
+        if product.stock_quantity != total:
+            Product.objects.filter(id=product.id).update(stock_quantity=total)
+    schedule_product_refresh(product_ids)
@@ -0,0 +1,139 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from categories.models import Category
+from orders import stock
+from products.models import Product, ProductVariant
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo throughput trừ tồn kho khi nhiều checkout tranh nhau cùng vài variant nóng: "
+        "so sánh cách cũ (SELECT ... FOR UPDATE + UPDATE từng item + SUM lại product) "
+        "với orders.stock.reserve (1 UPDATE có điều kiện). Dữ liệu seed được xóa sau khi chạy. "
+        "Nên chạy trên MySQL; SQLite khóa cả file nên kết quả không phản ánh production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--orders", type=int, default=50, help="Số đơn mỗi thread")
+        parser.add_argument("--variants", type=int, default=4, help="Số variant nóng")
+        parser.add_argument("--items", type=int, default=2, help="Số variant mỗi đơn")
+        parser.add_argument("--stock", type=int, default=100000)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stdout.write(self.style.WARNING("SQLite: các thread ghi sẽ chờ nhau theo lock cả file."))
+
+        for name, checkout in [("legacy", self.legacy_checkout), ("reserve", self.reserve_checkout)]:
+            product, variants = self.seed(options)
+            try:
+                self.run(name, checkout, product, variants, options)
+            finally:
+                Category.objects.filter(id=product.category_id).delete()
+
+    def seed(self, options):
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        category = Category.objects.create(name=tag, status="Active")
+        product = Product.objects.create(
+            category=category, name=tag, current_price=100000, description="bench", status="Active",
+            stock_quantity=options["stock"] * options["variants"],
+        )
+        ProductVariant.objects.bulk_create([
+            ProductVariant(
+                product=product, sku=f"{tag[-8:]}-{i}", size="M", color=str(i),
+                stock_quantity=options["stock"], status="Active",
+            ) for i in range(options["variants"])
+        ])
+        return product, list(ProductVariant.objects.filter(product=product).values_list("id", flat=True))
+
+    def legacy_checkout(self, quantities):
+        # Cách create_order làm trước đây
+        with transaction.atomic():
+            locked = {
+                v.id: v for v in ProductVariant.objects.select_for_update().filter(id__in=quantities)
+            }
+            for vid, qty in quantities.items():
+                if locked[vid].stock_quantity < qty:
+                    raise stock.OutOfStock([])
+            product_ids = {v.product_id for v in locked.values()}
+            list(Product.objects.select_for_update().filter(id__in=product_ids))
+
+            for vid, qty in quantities.items():
+                ProductVariant.objects.filter(id=vid).update(stock_quantity=F("stock_quantity") - qty)
+
+            for product_id in product_ids:
+                total = ProductVariant.objects.select_for_update().filter(
+                    product_id=product_id
+                ).aggregate(total_sum=Sum("stock_quantity"))["total_sum"] or 0
+                Product.objects.filter(id=product_id).update(stock_quantity=total)
+
+    def reserve_checkout(self, quantities):
+        variant_products = stock.check_available(quantities)
+        with transaction.atomic():
+            stock.reserve(quantities, variant_products)
+
+    def run(self, name, checkout, product, variants, options):
+        latencies = []
+        counters = {"ok": 0, "out_of_stock": 0, "error": 0, "units": 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options["threads"])
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            barrier.wait()
+            try:
+                for _ in range(options["orders"]):
+                    picked = rnd.sample(variants, min(options["items"], len(variants)))
+                    quantities = {vid: rnd.randint(1, 3) for vid in picked}
+                    start = time.perf_counter()
+                    try:
+                        checkout(quantities)
+                        result = "ok"
+                    except stock.OutOfStock:
+                        result = "out_of_stock"
+                    except Exception:
+                        result = "error"
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+                        counters[result] += 1
+                        if result == "ok":
+                            counters["units"] += sum(quantities.values())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options["threads"])]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duration = time.perf_counter() - start
+
+        # Kiểm tra không bán vượt và tổng product khớp tổng variant
+        variant_total = ProductVariant.objects.filter(product=product).aggregate(s=Sum("stock_quantity"))["s"]
+        product.refresh_from_db()
+        expected = options["stock"] * len(variants) - counters["units"]
+
+        latencies.sort()
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {name}"))
+        self.stdout.write(
+            f"{counters['ok']} đơn thành công / {len(latencies)} trong {duration:.2f}s "
+            f"-> {counters['ok'] / duration:.1f} đơn/s"
+        )
+        self.stdout.write(
+            f"latency median {statistics.median(latencies):.2f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms"
+        )
+        self.stdout.write(f"hết hàng: {counters['out_of_stock']}, lỗi DB: {counters['error']}")
+        consistent = variant_total == expected == product.stock_quantity
+        style = self.style.SUCCESS if consistent else self.style.ERROR
+        self.stdout.write(style(
+            f"tồn kho variant {variant_total}, product {product.stock_quantity}, kỳ vọng {expected}"
+        ))
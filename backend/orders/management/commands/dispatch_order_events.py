@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from orders import events
+from orders.models import OrderEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Xử lý các sự kiện đơn hàng còn tồn trong outbox (khi worker rq không chạy). "
+        "--loop để chạy liên tục, --retry-failed để thử lại sự kiện đã lỗi quá số lần cho phép."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true")
+        parser.add_argument("--interval", type=float, default=1)
+        parser.add_argument("--retry-failed", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            reset = OrderEvent.objects.filter(
+                processed_at__isnull=True, attempts__gte=events.MAX_ATTEMPTS
+            ).update(attempts=0)
+            self.stdout.write(f"Đặt lại {reset} sự kiện lỗi")
+
+        while True:
+            processed = events.dispatch_pending()
+            if processed or not options["loop"]:
+                self.stdout.write(f"Đã xử lý {processed} sự kiện")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        failed = OrderEvent.objects.filter(processed_at__isnull=True, attempts__gte=events.MAX_ATTEMPTS).count()
+        if failed:
+            self.stderr.write(self.style.WARNING(f"{failed} sự kiện lỗi quá {events.MAX_ATTEMPTS} lần"))
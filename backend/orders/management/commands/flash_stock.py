@@ -0,0 +1,67 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from orders import flash_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Quản lý tồn kho flash sale trong Redis: enable / disable variant, "
+        "flush delta đang chờ xuống DB (--loop để chạy liên tục khi không có rq scheduler), "
+        "reconcile so Redis với DB (--fix để sửa lệch)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["enable", "disable", "flush", "reconcile", "list"])
+        parser.add_argument("variant_ids", nargs="*", type=int)
+        parser.add_argument("--loop", action="store_true", help="flush: lặp lại mỗi --interval giây")
+        parser.add_argument("--interval", type=float, default=2)
+        parser.add_argument("--fix", action="store_true", help="reconcile: đưa Redis về DB + pending")
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        if action in ("enable", "disable") and not options["variant_ids"]:
+            raise CommandError("Cần danh sách variant_ids")
+
+        try:
+            getattr(self, action)(options)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+    def enable(self, options):
+        enabled = flash_stock.enable(options["variant_ids"])
+        missing = set(options["variant_ids"]) - set(enabled)
+        if missing:
+            self.stderr.write(f"Không tìm thấy variant: {sorted(missing)}")
+        self.stdout.write(self.style.SUCCESS(f"Đã bật flash sale cho {len(enabled)} variant."))
+
+    def disable(self, options):
+        flash_stock.disable(options["variant_ids"])
+        self.stdout.write(self.style.SUCCESS(f"Đã tắt flash sale cho {len(options['variant_ids'])} variant."))
+
+    def list(self, options):
+        for vid in flash_stock.flash_variant_ids():
+            self.stdout.write(str(vid))
+
+    def flush(self, options):
+        while True:
+            flushed = flash_stock.flush_pending()
+            if flushed is None:
+                self.stdout.write("Worker khác đang flush.")
+            elif flushed or not options["loop"]:
+                self.stdout.write(f"Đã ghi {flushed} variant xuống DB.")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def reconcile(self, options):
+        drifts = flash_stock.reconcile(fix=options["fix"])
+        for d in drifts:
+            self.stdout.write(
+                f"variant {d['variant_id']}: db={d['db']} redis={d['redis']} pending={d['pending']} lệch={d['drift']}"
+            )
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS("Redis khớp DB."))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"Đã sửa {len(drifts)} variant."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drifts)} variant bị lệch, chạy lại với --fix để sửa."))
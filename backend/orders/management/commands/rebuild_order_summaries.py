@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from orders.models import Order
+from orders.summary import refresh_summaries
+from utils.batching import iter_batches
+
+
+class Command(BaseCommand):
+    help = "Build lại bảng OrderSummary (trang quản trị đơn hàng) từ toàn bộ đơn hàng"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        total = 0
+        for batch in iter_batches(Order.objects.order_by("id").values_list("id", flat=True), batch_size):
+            total += refresh_summaries(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Đã build {total} order summary"))
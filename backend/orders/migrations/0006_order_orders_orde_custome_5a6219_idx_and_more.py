@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_customeraddress_district'),
+        ('orders', '0005_order_user_voucher_order_voucher'),
+        ('voucher', '0002_uservoucher_user_vouche_user_id_dc6ac7_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-order_date'], name='orders_orde_custome_5a6219_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['ship_status', '-order_date'], name='orders_orde_ship_st_2b14bf_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_orders_orde_custome_5a6219_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSummary',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='orders.order')),
+                ('customer_name', models.CharField(blank=True, default='', max_length=100)),
+                ('customer_phone', models.CharField(blank=True, max_length=15, null=True)),
+                ('order_date', models.DateTimeField()),
+                ('ship_method', models.CharField(max_length=50)),
+                ('payment_method', models.CharField(max_length=50)),
+                ('ship_status', models.CharField(max_length=20)),
+                ('payment_status', models.CharField(max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-order_date'], name='orders_orde_order_d_c86dc9_idx'), models.Index(fields=['ship_status', '-order_date'], name='orders_orde_ship_st_f30d6b_idx'), models.Index(fields=['payment_status', '-order_date'], name='orders_orde_payment_1bd0cf_idx'), models.Index(fields=['customer', '-order_date'], name='orders_orde_custome_7cd875_idx')],
+            },
+        ),
+    ]
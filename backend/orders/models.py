@@ -6,6 +6,9 @@ from customers.models import CustomerAddress
 from products.models import Product, ProductVariant
 from voucher.models import Voucher, UserVoucher
 
+# Client hủy đơn ghi "Cancelled", admin ghi "Đã hủy"
+CANCELLED_STATUSES = ["Cancelled", "Đã hủy"]
+
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -28,6 +31,12 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     is_rating = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "-order_date"]),  # đơn của user
+            models.Index(fields=["ship_status", "-order_date"]),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.customer}"
 
@@ -40,3 +49,72 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product_variant} x {self.quantity}"
+
+
+# Bản tóm tắt của đơn cho trang quản trị: 1 dòng / đơn, không cần JOIN items, variant, product, profile.
+# Được cập nhật bởi orders.summary sau khi tạo / hủy / đổi trạng thái / thanh toán.
+class OrderSummary(models.Model):
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    customer = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='+')
+    customer_name = models.CharField(max_length=100, blank=True, default="")
+    customer_phone = models.CharField(max_length=15, null=True, blank=True)
+    order_date = models.DateTimeField()
+    ship_method = models.CharField(max_length=50)
+    payment_method = models.CharField(max_length=50)
+    ship_status = models.CharField(max_length=20)
+    payment_status = models.CharField(max_length=20)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-order_date"]),
+            models.Index(fields=["ship_status", "-order_date"]),
+            models.Index(fields=["payment_status", "-order_date"]),
+            models.Index(fields=["customer", "-order_date"]),
+        ]
+
+    def __str__(self):
+        return f"Summary #{self.order_id}"
+
+
+# Outbox: sự kiện vòng đời đơn hàng, ghi cùng transaction với đơn.
+# orders.events.dispatch_pending (chạy nền bằng django_rq) xử lý các tác vụ phụ: cache, thống kê, thông báo...
+class OrderEvent(models.Model):
+    CREATED = "created"
+    CANCELLED = "cancelled"
+    STATUS_CHANGED = "status_changed"
+    PAYMENT_UPDATED = "payment_updated"
+    TYPE_CHOICES = [
+        (CREATED, "Created"),
+        (CANCELLED, "Cancelled"),
+        (STATUS_CHANGED, "Status changed"),
+        (PAYMENT_UPDATED, "Payment updated"),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    event_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["processed_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} - {self.event_type}"
+
+
+class FlashStockFlush(models.Model):
+    # Lô delta flash sale đã ghi xuống DB (orders/flash_stock.py); ghi cùng transaction với tồn kho
+    # nên lô bị flush lại sau khi worker chết giữa chừng không bị trừ kho 2 lần
+    batch_key = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.batch_key
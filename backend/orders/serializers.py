@@ -1,7 +1,23 @@
+from django.db.models import OuterRef, Prefetch, Subquery
 from rest_framework import serializers
+from accounts.models import User
 from .models import Order, OrderItem
 
 
+def with_read_relations(queryset):
+    """Nạp sẵn mọi quan hệ OrderSerializer cần: số query cố định, không phụ thuộc số đơn.
+    - address: JOIN
+    - tên / sđt khách: subquery lấy profile đầu tiên (giống customer.user.first())
+    - items + variant + product: 1 query prefetch cho cả danh sách"""
+    profile = User.objects.filter(account=OuterRef("customer_id")).order_by("id")
+    return queryset.select_related("address").annotate(
+        customer_name=Subquery(profile.values("full_name")[:1]),
+        customer_phone=Subquery(profile.values("phone")[:1]),
+    ).prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.select_related("product_variant__product").order_by("id"))
+    )
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product_variant.product.name', read_only=True)
     image_url = serializers.URLField(source='product_variant.product.product_img.url', read_only=True)
@@ -61,10 +77,18 @@ class OrderSerializer(serializers.ModelSerializer):
 
         return order
 
+    # Đơn lấy qua with_read_relations đã có sẵn customer_name / customer_phone
+    def _profile(self, obj):
+        return obj.customer.user.first()  # vì là ForeignKey
+
     def get_customer(self, obj):
-        profile = obj.customer.user.first()  # vì là ForeignKey
+        if hasattr(obj, "customer_name"):
+            return obj.customer_name
+        profile = self._profile(obj)
         return profile.full_name if profile else None
 
     def get_phone(self, obj):
-        profile = obj.customer.user.first()
+        if hasattr(obj, "customer_phone"):
+            return obj.customer_phone
+        profile = self._profile(obj)
         return profile.phone if profile else None
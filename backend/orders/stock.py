@@ -0,0 +1,151 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from products.models import Product, ProductVariant
+
+# Giữ / trả tồn kho cho đơn hàng.
+# - check_available: đọc không lock, loại sớm đơn chắc chắn thiếu hàng trước khi mở transaction.
+# - reserve: 1 câu UPDATE có điều kiện stock >= qty cho mọi variant của đơn, không SELECT ... FOR UPDATE.
+#   Nếu số dòng được update ít hơn số variant thì có variant thiếu hàng -> raise OutOfStock
+#   để transaction của caller rollback toàn bộ.
+# - Tồn kho tổng của product được cộng / trừ theo delta trong 1 câu UPDATE, không SUM lại variant.
+# Các hàm reserve / release phải được gọi trong transaction.atomic().
+
+
+class OutOfStock(Exception):
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__("Không đủ hàng")
+
+    def message(self):
+        parts = [
+            f"Biến thể '{s['size']}/{s['color']}' của sản phẩm '{s['product_name']}' không đủ hàng. "
+            f"Còn lại: {s['available']}, bạn cần: {s['requested']}"
+            for s in self.shortages
+        ]
+        return " ".join(parts)
+
+
+class UnknownVariant(Exception):
+    pass
+
+
+class _PartialReserve(Exception):
+    pass
+
+
+def merge_quantities(items):
+    # [{product_variant, quantity}] -> {variant_id: tổng quantity}
+    quantities = defaultdict(int)
+    for item in items:
+        quantities[int(item["product_variant"])] += int(item["quantity"])
+    return dict(quantities)
+
+
+def _read_stock(quantities):
+    rows = ProductVariant.objects.filter(id__in=quantities).values(
+        "id", "product_id", "size", "color", "stock_quantity", "product__name"
+    )
+    found = {row["id"]: row for row in rows}
+    if len(found) != len(quantities):
+        raise UnknownVariant()
+    return found
+
+
+def _shortages(quantities, found=None):
+    found = found or _read_stock(quantities)
+    return [
+        {
+            "variant_id": vid,
+            "size": found[vid]["size"],
+            "color": found[vid]["color"],
+            "product_name": found[vid]["product__name"],
+            "available": found[vid]["stock_quantity"],
+            "requested": qty,
+        }
+        for vid, qty in quantities.items()
+        if found[vid]["stock_quantity"] < qty
+    ]
+
+
+def check_available(quantities):
+    """Fast path không lock; kết quả có thể cũ, reserve mới là chốt cuối. Trả về {variant_id: product_id}."""
+    found = _read_stock(quantities)
+    shortages = _shortages(quantities, found)
+    if shortages:
+        raise OutOfStock(shortages)
+    return {vid: row["product_id"] for vid, row in found.items()}
+
+
+def _product_deltas(variant_quantities, variant_products=None):
+    product_ids = variant_products or dict(ProductVariant.objects.filter(
+        id__in=variant_quantities
+    ).values_list("id", "product_id"))
+
+    deltas = defaultdict(int)
+    for vid, qty in variant_quantities.items():
+        if vid in product_ids:
+            deltas[product_ids[vid]] += qty
+    return dict(deltas)
+
+
+def _apply_product_deltas(deltas, sign):
+    if not deltas:
+        return
+    Product.objects.filter(id__in=deltas).update(stock_quantity=Case(
+        *[When(id=pid, then=F("stock_quantity") + sign * qty) for pid, qty in deltas.items()]
+    ))
+
+
+def reserve(quantities, variant_products=None):
+    """Trừ tồn kho cho cả đơn; trả về {product_id: số lượng đã trừ}.
+    variant_products ({variant_id: product_id}, lấy từ check_available) giúp bỏ 1 query."""
+    if not quantities:
+        return {}
+
+    condition = reduce(or_, [Q(id=vid, stock_quantity__gte=qty) for vid, qty in quantities.items()])
+    try:
+        # Savepoint: thiếu hàng thì hoàn lại phần đã trừ trước khi đọc lại tồn kho để báo lỗi
+        with transaction.atomic():
+            updated = ProductVariant.objects.filter(condition).update(stock_quantity=Case(
+                *[When(id=vid, then=F("stock_quantity") - qty) for vid, qty in quantities.items()]
+            ))
+            if updated != len(quantities):
+                raise _PartialReserve()
+    except _PartialReserve:
+        raise OutOfStock(_shortages(quantities))
+
+    deltas = _product_deltas(quantities, variant_products)
+    _apply_product_deltas(deltas, -1)
+    return deltas
+
+
+def apply_deltas(variant_deltas):
+    """Cộng delta (âm hoặc dương) vào variant và tổng product; variant đã bị xóa thì bỏ qua.
+    Trả về {product_id: delta}."""
+    variant_deltas = {vid: delta for vid, delta in variant_deltas.items() if delta}
+    if not variant_deltas:
+        return {}
+
+    ProductVariant.objects.filter(id__in=variant_deltas).update(stock_quantity=Case(
+        *[When(id=vid, then=F("stock_quantity") + delta) for vid, delta in variant_deltas.items()]
+    ))
+
+    deltas = _product_deltas(variant_deltas)
+    _apply_product_deltas(deltas, 1)
+    return deltas
+
+
+def release(quantities):
+    """Cộng trả tồn kho (hủy đơn). Trả về {product_id: số lượng}."""
+    return apply_deltas(quantities)
+
+
+def order_quantities(order):
+    quantities = defaultdict(int)
+    for variant_id, qty in order.items.values_list("product_variant_id", "quantity"):
+        if variant_id is not None:
+            quantities[variant_id] += qty
+    return dict(quantities)
@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from accounts.models import User
+from orders.models import Order, OrderItem, OrderSummary
+
+# Projection "order_summary" cho trang quản trị đơn hàng.
+# Mỗi lần đơn thay đổi (tạo, hủy, đổi trạng thái, thanh toán), handler của outbox (orders.events)
+# tính lại dòng summary từ Order.
+# Lệnh "rebuild_order_summaries" build lại toàn bộ (backfill / sửa lệch).
+
+def _summary_rows(order_ids):
+    profile = User.objects.filter(account=OuterRef("customer_id")).order_by("id")
+    items = OrderItem.objects.filter(order=OuterRef("id")).values("order").annotate(
+        total=Sum("quantity")
+    ).values("total")
+    orders = Order.objects.filter(id__in=order_ids).annotate(
+        customer_name=Subquery(profile.values("full_name")[:1]),
+        customer_phone=Subquery(profile.values("phone")[:1]),
+        item_count=Subquery(items),
+    )
+    return [
+        OrderSummary(
+            order_id=o.id,
+            customer_id=o.customer_id,
+            customer_name=o.customer_name or "",
+            customer_phone=o.customer_phone,
+            order_date=o.order_date,
+            ship_method=o.ship_method,
+            payment_method=o.payment_method,
+            ship_status=o.ship_status,
+            payment_status=o.payment_status,
+            total_amount=o.total_amount,
+            item_count=o.item_count or 0,
+        )
+        for o in orders
+    ]
+
+
+def refresh_summaries(order_ids):
+    order_ids = list(set(order_ids))
+    rows = _summary_rows(order_ids)
+    with transaction.atomic():
+        # Đơn đã bị xóa thì summary cũng bị xóa theo
+        OrderSummary.objects.filter(order_id__in=order_ids).delete()
+        OrderSummary.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def summary_data(summary):
+    return {
+        "id": summary.order_id,
+        "customer_id": summary.customer_id,
+        "customer": summary.customer_name,
+        "phone": summary.customer_phone,
+        "order_date": summary.order_date,
+        "ship_method": summary.ship_method,
+        "payment_method": summary.payment_method,
+        "ship_status": summary.ship_status,
+        "payment_status": summary.payment_status,
+        "total_amount": summary.total_amount,
+        "item_count": summary.item_count,
+    }
@@ -1,3 +1,107 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from accounts.models import Account, User
+from categories.models import Category
+from customers.models import CustomerAddress
+from orders.models import Order, OrderItem
+from orders.serializers import OrderSerializer, with_read_relations
+from products.models import Product, ProductVariant
 
-# Create your tests here.
+
+class OrderReadQueryCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Áo", status="Active")
+        self.product = Product.objects.create(
+            category=category, name="Áo thun", current_price=100000, description="", status="Active",
+            product_img="products/ao-thun.jpg",
+        )
+        self.variants = [
+            ProductVariant.objects.create(
+                product=self.product, sku=f"AO-{size}", size=size, color="Đen", stock_quantity=10, status="Active",
+            ) for size in ["S", "M", "L"]
+        ]
+        self.admin = Account.objects.create(username="admin", is_staff=True, is_superuser=True)
+        self.customers = []
+
+    def create_orders(self, count):
+        for _ in range(count):
+            index = len(self.customers)
+            account = Account.objects.create(username=f"khach{index}")
+            User.objects.create(account=account, full_name=f"Khách {index}", phone=f"090000{index:04d}")
+            address = CustomerAddress.objects.create(
+                account=account, receiver_name="Khách", phone="0900000000",
+                province="Hà Nội", ward="Phường 1", district="Quận 1", address_detail="1 Phố Huế",
+            )
+            order = Order.objects.create(
+                customer=account, address=address, ship_method="standard", payment_method="cod", note="",
+                total_amount=300000,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_variant=v, quantity=1, price=100000) for v in self.variants
+            ])
+            self.customers.append(account)
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return len(ctx.captured_queries)
+
+    def serialize_all(self):
+        return OrderSerializer(with_read_relations(Order.objects.order_by("-order_date")), many=True).data
+
+    def test_serializer_uses_two_queries(self):
+        self.create_orders(5)
+        # 1 query đơn hàng (JOIN address + subquery profile) + 1 query prefetch items
+        with self.assertNumQueries(2):
+            data = self.serialize_all()
+
+        self.assertEqual(len(data), 5)
+        first = data[-1]
+        self.assertEqual(first["customer"], "Khách 0")
+        self.assertEqual(first["phone"], "0900000000")
+        self.assertEqual(first["address"], "1 Phố Huế, Phường 1, Quận 1, Hà Nội")
+        self.assertEqual([item["size"] for item in first["items"]], ["S", "M", "L"])
+        self.assertEqual(first["items"][0]["product_name"], "Áo thun")
+
+    def test_serializer_output_matches_unoptimized_queryset(self):
+        self.create_orders(3)
+        plain = OrderSerializer(Order.objects.order_by("-order_date"), many=True).data
+        self.assertEqual(self.serialize_all(), plain)
+
+    def test_admin_list_query_count_is_constant(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        self.create_orders(1)
+        few = self.count_queries(lambda: client.get("/api/order/all-orders/"))
+        self.create_orders(20)
+        many = self.count_queries(lambda: client.get("/api/order/all-orders/"))
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(client.get("/api/order/all-orders/").json()["data"]), 21)
+
+    def test_user_order_list_query_count_is_constant(self):
+        self.create_orders(1)
+        client = APIClient()
+        client.force_authenticate(self.customers[0])
+        few = self.count_queries(lambda: client.get("/order/all-orders/"))
+
+        # Thêm đơn cho cùng khách rồi xóa cache để build lại
+        account = self.customers[0]
+        for _ in range(20):
+            order = Order.objects.create(
+                customer=account, address=account.addresses.first(), ship_method="standard",
+                payment_method="cod", note="", total_amount=300000,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_variant=v, quantity=1, price=100000) for v in self.variants
+            ])
+        cache.clear()
+        many = self.count_queries(lambda: client.get("/order/all-orders/"))
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(client.get("/order/all-orders/").json()["data"]), 21)
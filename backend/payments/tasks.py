@@ -2,6 +2,8 @@
 from django.db import transaction
 from .models import Payment
 from .vnpay import Vnpay
+from orders import events
+from orders.models import OrderEvent
 
 def process_vnpay_ipn(params):
     vnpay = Vnpay()
@@ -30,12 +32,14 @@ def process_vnpay_ipn(params):
                 if hasattr(payment, 'order'):
                     payment.order.payment_status = 'Paid'
                     payment.order.save()
+                    events.emit(payment.order, OrderEvent.PAYMENT_UPDATED, status='Paid')
             else:
                 payment.status = 'FAILED'
                 payment.save()
                 if hasattr(payment, 'order'):
                     payment.order.payment_status = 'Failed'
                     payment.order.save()
+                    events.emit(payment.order, OrderEvent.PAYMENT_UPDATED, status='Failed')
 
     except Payment.DoesNotExist:
         return
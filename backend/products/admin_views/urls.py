@@ -3,8 +3,11 @@ from products.admin_views import views
 
 urlpatterns = [
     path('all-product/', views.get_all_product, name="get_all_product"),
+    path('list/', views.list_products, name="list_products"),
     path('add/', views.add_product, name="add_product"),
     path('update/<int:product_id>/', views.update_product, name="update_product"),
-    path('update/status/<int:product_id>/', views.update_status, name="update_product")
+    path('update/status/<int:product_id>/', views.update_status, name="update_product"),
+    path('import/', views.import_products, name="import_products"),
+    path('export/', views.export_products, name="export_products"),
 
 ]
\ No newline at end of file
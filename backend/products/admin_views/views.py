@@ -1,13 +1,20 @@
-from django.http import JsonResponse
+import csv
+from datetime import date
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAdminUser
 from django.core.cache import cache
-from ..models import Product, Category, ProductVariant, ProductImage
+from ..models import Product, Category
+from .. import importer
+from ..cards import load_cards, schedule_product_refresh
+from ..search import index_product
+from ..services import parse_variants, create_product, update_product as update_product_data
 from ..serializers import ProductSerializer
 import json
 from decouple import config
 from utils.delete_cache import delete_product_cache
+from utils.pagination import cached_count, keyset_paginate, parse_page_size, InvalidCursor
 
 
 @api_view(['GET'])
@@ -32,6 +39,69 @@ def get_all_product(request):
 
     return JsonResponse(data)
 
+ADMIN_SORT_FIELDS = ["created_at", "current_price", "stock_quantity"]
+ADMIN_COUNT_TIMEOUT = 300
+
+
+def filter_admin_products(params):
+    products = Product.objects.all()
+
+    if params.get("status"):
+        products = products.filter(status=params["status"])
+    if params.get("category"):
+        products = products.filter(category_id=int(params["category"]))
+
+    # stock: "in" còn hàng, "out" hết hàng, "low" còn ít (<= low_stock, mặc định 5)
+    stock = params.get("stock")
+    if stock == "in":
+        products = products.filter(stock_quantity__gt=0)
+    elif stock == "out":
+        products = products.filter(stock_quantity__lte=0)
+    elif stock == "low":
+        products = products.filter(stock_quantity__gt=0, stock_quantity__lte=int(params.get("low_stock", 5)))
+
+    if params.get("created_from"):
+        products = products.filter(created_at__date__gte=date.fromisoformat(params["created_from"]))
+    if params.get("created_to"):
+        products = products.filter(created_at__date__lte=date.fromisoformat(params["created_to"]))
+
+    return products
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def list_products(request):
+    params = request.query_params
+    sort = params.get("sort", "created_at")
+    if sort not in ADMIN_SORT_FIELDS:
+        return JsonResponse({"error": f"sort chỉ nhận: {', '.join(ADMIN_SORT_FIELDS)}"}, status=400)
+    descending = params.get("order", "desc") != "asc"
+    page_size = parse_page_size(params.get("limit"))
+
+    try:
+        products = filter_admin_products(params)
+        items, next_cursor = keyset_paginate(
+            products.only("id", sort), params.get("cursor"), page_size, field=sort, descending=descending
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({"error": "Tham số lọc không hợp lệ"}, status=400)
+
+    # Tổng số chỉ tính 1 lần cho mỗi bộ lọc rồi cache theo TTL (số gần đúng),
+    # các trang sau không phải COUNT(*) lại
+    filters = {k: params.get(k) for k in ("status", "category", "stock", "low_stock", "created_from", "created_to")}
+    total = cached_count("admin_products_count", filters, products, ADMIN_COUNT_TIMEOUT)
+
+    return JsonResponse({
+        "products": load_cards([p.id for p in items]),
+        "next_cursor": next_cursor,
+        "page_size": page_size,
+        "total_items": total,
+        "total_is_estimate": True,
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
 def add_product(request):
@@ -53,7 +123,12 @@ def add_product(request):
         except (ValueError, TypeError):
             return JsonResponse({"error": "Giá không hợp lệ"}, status=400)
 
-        product = Product.objects.create(
+        try:
+            variants = parse_variants(data.get("variants"), request.FILES)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Variants JSON không hợp lệ"}, status=400)
+
+        product = Product(
             category=category,
             name=data.get("name"),
             old_price=old_price,
@@ -63,49 +138,19 @@ def add_product(request):
             is_new=str(data.get("isNew", "false")).lower() == "true",
             is_featured=str(data.get("isFeatured", "false")).lower() == "true",
         )
+        # Ảnh được upload nền, response trả về số ảnh đang chờ
+        pending_uploads = create_product(
+            product, variants, request.FILES.getlist("related_images"), request.FILES.get("mainImage")
+        )
 
-        main_img = request.FILES.get("mainImage")
-        if main_img:
-            product.product_img = main_img
-            product.save()
-
-        extra_images = request.FILES.getlist("related_images")
-        for img in extra_images:
-            ProductImage.objects.create(product=product, PI_img=img)
-
-        total_stock = 0
-        variants_json = data.get("variants")
-        if variants_json:
-            try:
-                variants = json.loads(variants_json)
-                for i, v in enumerate(variants):
-                    if not all([v.get("sku"), v.get("size"), v.get("color")]):
-                        continue
-                    stock = int(v.get("stock", 0))
-                    total_stock += stock
-                    pv_img = request.FILES.get(f"variant_images_{i}")
-                    ProductVariant.objects.create(
-                        product=product,
-                        sku=v.get("sku"),
-                        size=v.get("size"),
-                        color=v.get("color"),
-                        stock_quantity=stock,
-                        status=v.get("status", "Active"),
-                        PV_img=pv_img,
-                    )
-
-            except json.JSONDecodeError:
-                return JsonResponse({"error": "Variants JSON không hợp lệ"}, status=400)
-
-        product.stock_quantity = total_stock
-        product.update_status_by_stockq()
-        product.save()
-
+        index_product(product)
+        schedule_product_refresh([product.id])
         serializer = ProductSerializer(product)
         delete_product_cache()
 
         return JsonResponse({
             "message": "Thêm sản phẩm thành công",
+            "pending_uploads": pending_uploads,
             **serializer.data
         }, status=201)
 
@@ -135,80 +180,39 @@ def update_product(request, product_id):
         product.is_new = str(data.get("isNew")).lower() == "true"
         product.is_featured = str(data.get("isFeatured")).lower() == "true"
 
-        # MAIN IMAGE - Chỉ update nếu có file mới
+        # MAIN IMAGE - File mới được upload nền, ảnh cũ giữ đến khi upload xong
         main_img = request.FILES.get("mainImage")
-        if main_img:
-            product.product_img = main_img
         # Nếu không có file mới nhưng có mainImage_url thì giữ nguyên (không làm gì)
         # Nếu cả 2 đều không có thì có thể xóa ảnh chính
-        elif not data.get("mainImage_url"):
+        if not main_img and not data.get("mainImage_url"):
             product.product_img = None
 
-        product.save()
-
-        # RELATED IMAGES - Xử lý cả ảnh cũ và mới
-        product.product_imgs.all().delete()
-
-        # Thêm lại các ảnh cũ (nếu có)
-        existing_images = data.get("existing_related_images")
-        if existing_images:
+        # RELATED IMAGES - giữ ảnh cũ còn trong danh sách, thêm ảnh mới upload
+        existing_images = []
+        if data.get("existing_related_images"):
             try:
-                existing_urls = json.loads(existing_images)
-                for url in existing_urls:
-                    # Tạo ProductImage với URL cũ (không upload lại)
-                    ProductImage.objects.create(product=product, PI_img=url)
+                existing_images = json.loads(data.get("existing_related_images"))
             except json.JSONDecodeError:
                 pass
 
-        # Thêm các ảnh mới được upload
-        new_extra_images = request.FILES.getlist("related_images")
-        for img in new_extra_images:
-            ProductImage.objects.create(product=product, PI_img=img)
-
-        # VARIANTS - Xử lý cả ảnh cũ và mới
-        product.product_variants.all().delete()
-        total_stock = 0
-        variants_json = data.get("variants")
-        if variants_json:
-            variants = json.loads(variants_json)
-            for i, v in enumerate(variants):
-                stock = int(v.get("stock", 0))
-                total_stock += stock
-
-                # Ưu tiên file mới, nếu không có thì dùng URL cũ
-                PV_img_file = request.FILES.get(f"variant_images_{i}")
-                PV_img_url = v.get("image_url")
-
-                if PV_img_file:
-                    # Có file mới → upload file
-                    PV_img = PV_img_file
-                elif PV_img_url:
-                    # Không có file mới nhưng có URL cũ → giữ nguyên URL
-                    PV_img = PV_img_url
-                else:
-                    # Không có gì cả
-                    PV_img = None
-
-                ProductVariant.objects.create(
-                    product=product,
-                    sku=v.get("sku"),
-                    size=v.get("size"),
-                    color=v.get("color"),
-                    stock_quantity=stock,
-                    status=v.get("status", "Active"),
-                    PV_img=PV_img,
-                )
-
-        # Update stock
-        product.stock_quantity = total_stock
-        product.update_status_by_stockq()
-        product.save()
+        # VARIANTS - khớp theo SKU, file mới được ưu tiên hơn URL cũ
+        try:
+            variants = parse_variants(data.get("variants"), request.FILES)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Variants JSON không hợp lệ"}, status=400)
 
+        pending_uploads = update_product_data(
+            product, variants, existing_images, request.FILES.getlist("related_images"), main_img
+        )
+
+        index_product(product)
+        schedule_product_refresh([product.id])
         serializer = ProductSerializer(product)
         delete_product_cache()
 
         return JsonResponse({
             "message": "Cập nhật sản phẩm thành công!",
+            "pending_uploads": pending_uploads,
             **serializer.data
         }, status=200)
 
@@ -233,6 +237,7 @@ def update_status(request, product_id):
         product.status = status_value
         product.save()
 
+        schedule_product_refresh([product.id])
         delete_product_cache()
 
         return JsonResponse({
@@ -245,3 +250,52 @@ def update_status(request, product_id):
 
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_products(request):
+    upload = request.FILES.get("file")
+    if not upload:
+        return JsonResponse({"error": "Thiếu file import"}, status=400)
+
+    fmt = request.data.get("type") or importer.detect_format(upload.name)
+    reader = importer.get_reader(fmt)
+    if reader is None:
+        return JsonResponse({"error": "Chỉ hỗ trợ định dạng csv hoặc jsonl"}, status=400)
+
+    dry_run = str(request.data.get("dry_run", "false")).lower() == "true"
+
+    try:
+        # File lớn được Django lưu tạm ra disk, importer đọc từng dòng nên không giữ cả file trong RAM
+        result = importer.import_products(reader(upload.file), dry_run=dry_run)
+    except (csv.Error, UnicodeDecodeError) as e:
+        return JsonResponse({"error": f"File không đọc được: {str(e)}"}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+    if result.products and not dry_run:
+        delete_product_cache()
+
+    return JsonResponse({
+        "message": "Kiểm tra file import xong" if dry_run else "Import sản phẩm xong",
+        "dry_run": dry_run,
+        **result.as_dict()
+    }, status=200)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_products(request):
+    # Không dùng "format" vì DRF dành tham số này cho content negotiation
+    fmt = request.query_params.get("type", "csv")
+    if fmt == "csv":
+        stream, content_type = importer.export_csv(), "text/csv; charset=utf-8"
+    elif fmt == "jsonl":
+        stream, content_type = importer.export_jsonl(), "application/x-ndjson; charset=utf-8"
+    else:
+        return JsonResponse({"error": "Chỉ hỗ trợ định dạng csv hoặc jsonl"}, status=400)
+
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="products.{fmt}"'
+    return response
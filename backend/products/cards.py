@@ -0,0 +1,51 @@
+from django.db import transaction
+from products.facets import schedule_facet_refresh
+from products.models import Product, ProductCard
+from products.serializers import ProductSerializer
+from utils.cache_tags import PRODUCT_TAG, invalidate_tags
+
+# "Product card" = JSON của ProductSerializer được tính sẵn và lưu vào bảng ProductCard.
+# Các trang catalog chỉ đọc lại JSON này thay vì serialize + dựng URL Cloudinary mỗi lần.
+
+
+def rebuild_cards(product_ids):
+    product_ids = list(set(product_ids))
+    products = Product.objects.select_related("category").prefetch_related(
+        "product_imgs", "product_variants"
+    ).filter(id__in=product_ids)
+
+    data = {item["id"]: item for item in ProductSerializer(products, many=True).data}
+
+    with transaction.atomic():
+        ProductCard.objects.filter(product_id__in=product_ids).delete()
+        ProductCard.objects.bulk_create(
+            [ProductCard(product_id=pid, data=card) for pid, card in data.items()],
+            batch_size=500,
+        )
+    return data
+
+
+def load_cards(product_ids):
+    # Giữ đúng thứ tự product_ids; card nào chưa có thì build bù ngay
+    product_ids = list(product_ids)
+    cards = dict(ProductCard.objects.filter(product_id__in=product_ids).values_list("product_id", "data"))
+
+    missing = [pid for pid in product_ids if pid not in cards]
+    if missing:
+        cards.update(rebuild_cards(missing))
+
+    return [cards[pid] for pid in product_ids if pid in cards]
+
+
+def refresh_cards(product_ids):
+    # Bỏ cache catalog sau khi card mới đã ghi xong: request chen vào giữa
+    # (sau lần invalidate trong transaction, trước khi card được build lại) không giữ được card cũ
+    rebuild_cards(product_ids)
+    invalidate_tags(PRODUCT_TAG)
+
+
+def schedule_product_refresh(product_ids):
+    # Build lại card + facet sau khi transaction commit; lỗi ở đây không làm hỏng request
+    product_ids = list(set(product_ids))
+    transaction.on_commit(lambda: refresh_cards(product_ids), robust=True)
+    schedule_facet_refresh(product_ids)
@@ -3,8 +3,11 @@ from products.client_views import views
 
 urlpatterns = [
     path('all-product/', views.get_all_product, name="get_all_product"),
+    path('<int:product_id>/', views.get_product_detail, name="get_product_detail"),
     path('best-seller/', views.get_bs_products, name="get_bs_product"),
     path('new-arrival/', views.get_new_products, name="get_new_product"),
     path('get_home_products/', views.get_home_product, name="get_home_product"),
+    path('browse/', views.browse_products),
     path('search/', views.get_search_products),
+    path('search/suggest/', views.get_search_suggestions),
 ]
\ No newline at end of file
@@ -1,141 +1,197 @@
-from django.db.models import Q
+import logging
 from django.http import JsonResponse
+from redis.exceptions import RedisError
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
-from django.core.cache import cache
+from analytics.bestsellers import DEFAULT_WINDOW, WINDOWS, top_products
+from analytics.reports import top_product_ids
+from products.cards import load_cards
+from products.facets import facet_search, FACETS
 from products.models import Product
-from products.serializers import ProductSerializer
+from products.search import search_product_ids, normalized_query
 from reviews.models import Review
 from reviews.serializers import ReviewSerializer
+from utils.cache_fetch import get_or_build
+from utils.cache_tags import PRODUCT_TAG, REVIEW_TAG
+from utils.pagination import keyset_paginate, parse_page_size, InvalidCursor
+from utils.response_cache import cached_json_response
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_LIMIT = 8
+BEST_SELLER_LIMIT = 32
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_all_product(request):
-    ALL_PRODUCTS_KEY = "all_products"
-    alls = cache.get(ALL_PRODUCTS_KEY)
-    if alls is None:
-        products = Product.objects.select_related("category").prefetch_related(
-            'product_imgs','product_variants'
-        ).filter(status="Active")
-        alls = ProductSerializer(products, many=True).data
-        cache.set(ALL_PRODUCTS_KEY, alls, timeout=86400)
-
-        if not products.exists():
-            return JsonResponse(
-                {"message": "Danh sách sản phẩm trống"},
-                status=200
-            )
-    return JsonResponse(
-         {"products": alls},
-         status=200,
-         safe=False
-    )
+    if "cursor" in request.GET or "limit" in request.GET:
+        return get_product_page(request)
+
+    def build():
+        product_ids = Product.objects.filter(status="Active").values_list("id", flat=True)
+        alls = load_cards(product_ids)
+        if not alls:
+            return {"message": "Danh sách sản phẩm trống"}
+        return {"products": alls}
+
+    return cached_json_response(request, "all_products", build, tags=(PRODUCT_TAG,))
+
+
+def get_product_page(request):
+    cursor = request.GET.get("cursor") or None
+    page_size = parse_page_size(request.GET.get("limit"))
+
+    def build():
+        products = Product.objects.filter(status="Active").only("id", "created_at")
+        items, next_cursor = keyset_paginate(products, cursor, page_size, field="created_at")
+        return {
+            "products": load_cards([p.id for p in items]),
+            "next_cursor": next_cursor,
+            "page_size": page_size,
+        }
+
+    try:
+        return cached_json_response(
+            request, f"products_page_{page_size}_{cursor or 'first'}", build, tags=(PRODUCT_TAG,)
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_product_detail(request, product_id):
+    def build():
+        cards = load_cards([product_id])
+        return cards[0] if cards else None
+
+    product = get_or_build(f"product_{product_id}", build, tags=(PRODUCT_TAG,))
+    # Sản phẩm ẩn / ngừng bán không được xem qua id, giống các trang danh sách
+    if product is None or product.get("status") != "Active":
+        return JsonResponse({"error": "Product không tồn tại"}, status=404)
+
+    return JsonResponse({"product": product}, status=200)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_home_product(request):
-    FEATURED_KEY = "home_featured_products"
-    NEW_KEY = "home_new_products"
-    REVIEW_KEY = "home_review"
-
-    cache.delete(REVIEW_KEY)
-    featured = cache.get(FEATURED_KEY)
-    news = cache.get(NEW_KEY)
-    reviews = cache.get(REVIEW_KEY)
-
-    if featured is None:
-        feature_qs = Product.objects.select_related("category").prefetch_related(
-            'product_imgs','product_variants'
-        ).filter(is_featured=True)[:4]
-        featured = ProductSerializer(feature_qs, many=True).data
-        cache.set(FEATURED_KEY, featured, timeout=86400)
-
-    if news is None:
-        new_qs = Product.objects.select_related(
-            "category"
-        ).prefetch_related(
-            'product_imgs',
-            'product_variants'
-        ).filter(is_new=True)[:4]
-        news = ProductSerializer(new_qs, many=True).data
-        cache.set(NEW_KEY, news, timeout=86400)
-
-    if reviews is None:
+    def build():
+        feature_ids = Product.objects.filter(is_featured=True).values_list("id", flat=True)[:4]
+        new_ids = Product.objects.filter(is_new=True).values_list("id", flat=True)[:4]
+
         review_qs = Review.objects.filter(status="approved"
                     ).select_related(
                         'product'
                     ).prefetch_related(
                         'account__user'
                     ).all().order_by('-review_date')[:4]
-        reviews = ReviewSerializer(review_qs, many=True).data
-        cache.set(REVIEW_KEY, reviews, timeout=86400)
 
-    return JsonResponse({
-        "featured": featured,
-        "new": news,
-        "reviews": reviews
-    }, status=200)
+        return {
+            "featured": load_cards(feature_ids),
+            "new": load_cards(new_ids),
+            "reviews": ReviewSerializer(review_qs, many=True).data
+        }
+
+    return cached_json_response(request, "home_products", build, tags=(PRODUCT_TAG, REVIEW_TAG))
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_new_products(request):
-    NEW_PRODUCT_KEY = "new_products"
-    all_product = cache.get(NEW_PRODUCT_KEY)
+    def build():
+        product_ids = Product.objects.filter(is_new=True).values_list("id", flat=True)
+        return {'products': load_cards(product_ids)}
 
-    if all_product is None:
-        product_qs = Product.objects.select_related("category").prefetch_related(
-            'product_imgs','product_variants'
-        ).filter(is_new=True)
-        all_product = ProductSerializer(product_qs, many=True).data
-        cache.set(NEW_PRODUCT_KEY, all_product, timeout=86400)
-
-    return JsonResponse({
-        'products': all_product,
-    }, status=200)
+    return cached_json_response(request, "new_products", build, tags=(PRODUCT_TAG,))
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_bs_products(request):
-    BS_PRODUCT_KEY = "bs_products"
-    bs_product = cache.get(BS_PRODUCT_KEY)
+    # ?window=7|30 (ngày), ?category=<id> để lấy bảng xếp hạng của 1 category
+    try:
+        window = int(request.GET.get("window", DEFAULT_WINDOW))
+        category_id = int(request.GET["category"]) if request.GET.get("category") else None
+    except ValueError:
+        return JsonResponse({"error": "Tham số không hợp lệ"}, status=400)
+    if window not in WINDOWS:
+        return JsonResponse({"error": f"window chỉ nhận: {', '.join(map(str, WINDOWS))}"}, status=400)
+
+    def build():
+        # Top-K từ bảng xếp hạng Redis; Redis chưa có dữ liệu thì tính từ rollup,
+        # chưa đủ 32 thì bù bằng sản phẩm mới
+        try:
+            product_ids = top_products(BEST_SELLER_LIMIT, window, category_id)
+        except RedisError:
+            logger.exception("Lỗi đọc bảng xếp hạng bán chạy")
+            product_ids = []
+        if not product_ids:
+            product_ids = top_product_ids(days=window, limit=BEST_SELLER_LIMIT, category_id=category_id)
+        if len(product_ids) < BEST_SELLER_LIMIT:
+            newest = Product.objects.filter(is_new=True, status="Active").exclude(id__in=product_ids)
+            if category_id is not None:
+                newest = newest.filter(category_id=category_id)
+            product_ids += list(newest.values_list("id", flat=True)[:BEST_SELLER_LIMIT - len(product_ids)])
+        return {'products': load_cards(product_ids)}
+
+    key = f"bs_products_{window}_{category_id or 'all'}"
+    return cached_json_response(request, key, build, tags=(PRODUCT_TAG,))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def browse_products(request):
+    filters = {facet: request.GET.getlist(facet) for facet in FACETS}
+    page_size = parse_page_size(request.GET.get("limit"))
+    cursor = request.GET.get("cursor")
+
+    try:
+        before_id = int(cursor) if cursor else None
+    except ValueError:
+        return JsonResponse({"error": "Cursor không hợp lệ"}, status=400)
 
-    if bs_product is None:
-        product_qs = Product.objects.select_related("category").prefetch_related(
-            'product_imgs', 'product_variants'
-        ).filter(is_new=True)[:32]
-        bs_product = ProductSerializer(product_qs, many=True).data
-        cache.set(BS_PRODUCT_KEY, bs_product, timeout=86400)
+    ids, total, counts = facet_search(filters, page_size, before_id=before_id)
+
+    next_cursor = None
+    if len(ids) > page_size:
+        ids = ids[:page_size]
+        next_cursor = str(ids[-1])
 
     return JsonResponse({
-        'products': bs_product,
+        "products": load_cards(ids),
+        "facets": counts,
+        "total": total,
+        "next_cursor": next_cursor,
     }, status=200)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_search_products(request):
-    search = request.GET.get('q', '')
-    if not search:
+    query = normalized_query(request.GET.get('q', ''))
+    if not query:
         return JsonResponse({'products': []})
-    KEY = f"search_products_{search}"
-    bs_product = cache.get(KEY)
-
-    if bs_product is None:
-        product_qs = Product.objects.select_related("category").prefetch_related(
-            'product_imgs', 'product_variants'
-        ).filter(
-            Q(name__icontains=search) |
-            Q(product_variants__sku__icontains=search)
-        ).distinct()
-        bs_product = ProductSerializer(product_qs, many=True).data
-        cache.set(KEY, bs_product, timeout=86400)
 
-    return JsonResponse({
-        'products': bs_product,
-    }, status=200)
+    def build():
+        return {'products': load_cards(search_product_ids(query))}
+
+    return cached_json_response(request, f"search_products_{query.replace(' ', '_')}", build, tags=(PRODUCT_TAG,), timeout=600)
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_search_suggestions(request):
+    query = normalized_query(request.GET.get('q', ''))
+    if not query:
+        return JsonResponse({'suggestions': []})
+
+    def build():
+        product_ids = search_product_ids(query, limit=SUGGESTION_LIMIT)
+        names = dict(Product.objects.filter(id__in=product_ids).values_list("id", "name"))
+        return {'suggestions': [
+            {'id': pid, 'name': names[pid]} for pid in product_ids if pid in names
+        ]}
+
+    return cached_json_response(request, f"search_suggest_{query.replace(' ', '_')}", build, tags=(PRODUCT_TAG,), timeout=600)
@@ -0,0 +1,193 @@
+import uuid
+from django.db import transaction
+from django_redis import get_redis_connection
+from products.models import Product
+
+# Facet index dạng bitmap trong Redis: mỗi giá trị facet là 1 bitmap,
+# bit thứ N bật nghĩa là product id N có giá trị đó.
+# Lọc = BITOP AND/OR, đếm = BITCOUNT, nên truy vấn facet không đụng tới bảng product.
+
+FACETS = ["category", "size", "color", "price", "in_stock"]
+
+PRICE_BUCKETS = [
+    (0, 200000),
+    (200000, 500000),
+    (500000, 1000000),
+    (1000000, 2000000),
+    (2000000, None),
+]
+
+ACTIVE_KEY = "facet:active"
+
+
+def _value_key(facet, value):
+    return f"facet:{facet}:{value}"
+
+
+def _values_key(facet):
+    return f"facet:values:{facet}"
+
+
+def _membership_key(product_id):
+    return f"facet:product:{product_id}"
+
+
+def price_bucket(price):
+    for low, high in PRICE_BUCKETS:
+        if high is None or price < high:
+            return f"{low}-{high}" if high is not None else f"{low}+"
+    return None
+
+
+def product_facet_values(product):
+    values = {
+        ("category", str(product.category_id)),
+        ("price", price_bucket(product.current_price or 0)),
+    }
+    for variant in product.product_variants.all():
+        values.add(("size", variant.size))
+        values.add(("color", variant.color))
+    if product.stock_quantity > 0:
+        values.add(("in_stock", "1"))
+    return values
+
+
+def index_facets(product_ids):
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return
+
+    redis = get_redis_connection("default")
+    products = {
+        p.id: p for p in Product.objects.prefetch_related("product_variants").filter(id__in=product_ids)
+    }
+
+    pipe = redis.pipeline(transaction=False)
+    for product_id in product_ids:
+        pipe.smembers(_membership_key(product_id))
+    old_memberships = pipe.execute()
+
+    pipe = redis.pipeline(transaction=True)
+    for product_id, old_keys in zip(product_ids, old_memberships):
+        old_keys = {k.decode() if isinstance(k, bytes) else k for k in old_keys}
+        product = products.get(product_id)
+
+        new_keys = set()
+        if product is not None and product.status == "Active":
+            for facet, value in product_facet_values(product):
+                new_keys.add(_value_key(facet, value))
+                pipe.sadd(_values_key(facet), value)
+            new_keys.add(ACTIVE_KEY)
+
+        for key in old_keys - new_keys:
+            pipe.setbit(key, product_id, 0)
+        for key in new_keys:
+            pipe.setbit(key, product_id, 1)
+
+        pipe.delete(_membership_key(product_id))
+        if new_keys:
+            pipe.sadd(_membership_key(product_id), *new_keys)
+    pipe.execute()
+
+
+def schedule_facet_refresh(product_ids):
+    # Chạy sau khi transaction commit; lỗi Redis không làm hỏng request
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: index_facets(product_ids), robust=True)
+
+
+def _decode_ids(bitmap, before_id=None, limit=None):
+    # Duyệt bitmap từ id lớn xuống nhỏ (sản phẩm mới trước)
+    ids = []
+    for byte_index in range(len(bitmap) - 1, -1, -1):
+        byte = bitmap[byte_index]
+        if not byte:
+            continue
+        for bit in range(8):
+            if byte & (1 << bit):
+                product_id = byte_index * 8 + (7 - bit)
+                if before_id is not None and product_id >= before_id:
+                    continue
+                ids.append(product_id)
+                if limit is not None and len(ids) >= limit:
+                    return ids
+    return ids
+
+
+def facet_search(filters, page_size, before_id=None):
+    """
+    filters: {facet: [value, ...]}; các giá trị trong 1 facet là OR, giữa các facet là AND.
+    Trả về (product_ids của trang, tổng số kết quả, số đếm cho từng giá trị facet).
+    Số đếm của mỗi facet bỏ qua filter của chính facet đó (disjunctive faceting).
+    """
+    redis = get_redis_connection("default")
+    prefix = f"facet:tmp:{uuid.uuid4().hex}"
+    filters = {f: v for f, v in filters.items() if f in FACETS and v}
+
+    pipe = redis.pipeline(transaction=False)
+    for facet in FACETS:
+        pipe.smembers(_values_key(facet))
+    facet_values = {
+        facet: sorted(v.decode() if isinstance(v, bytes) else v for v in values)
+        for facet, values in zip(FACETS, pipe.execute())
+    }
+
+    tmp_keys = []
+
+    def tmp(name):
+        key = f"{prefix}:{name}"
+        tmp_keys.append(key)
+        return key
+
+    pipe = redis.pipeline(transaction=False)
+    filter_keys = {}
+    for facet, values in filters.items():
+        key = tmp(f"filter:{facet}")
+        pipe.bitop("OR", key, *[_value_key(facet, v) for v in values])
+        filter_keys[facet] = key
+
+    result_key = tmp("result")
+    pipe.bitop("AND", result_key, ACTIVE_KEY, *filter_keys.values())
+    pipe.bitcount(result_key)
+
+    count_slots = []
+    for facet in FACETS:
+        base_key = tmp(f"base:{facet}")
+        others = [key for f, key in filter_keys.items() if f != facet]
+        pipe.bitop("AND", base_key, ACTIVE_KEY, *others)
+        for value in facet_values[facet]:
+            count_key = tmp(f"count:{facet}:{value}")
+            pipe.bitop("AND", count_key, base_key, _value_key(facet, value))
+            pipe.bitcount(count_key)
+            count_slots.append((facet, value))
+
+    pipe.get(result_key)
+    pipe.delete(*tmp_keys)
+    replies = pipe.execute()
+
+    # replies: [bitop x len(filters)], bitop result, bitcount result, rồi các cặp (bitop, bitcount)...
+    pos = len(filter_keys) + 1
+    total = replies[pos]
+    pos += 1
+
+    counts = {facet: {} for facet in FACETS}
+    slot_iter = iter(count_slots)
+    for facet in FACETS:
+        pos += 1  # bitop base
+        for _ in facet_values[facet]:
+            f, value = next(slot_iter)
+            count = replies[pos + 1]
+            pos += 2
+            if count:
+                counts[f][value] = count
+
+    bitmap = replies[pos] or b""
+    ids = _decode_ids(bitmap, before_id=before_id, limit=page_size + 1)
+    return ids, total, counts
+
+
+def clear_facet_index():
+    redis = get_redis_connection("default")
+    keys = list(redis.scan_iter(match="facet:*", count=1000))
+    for i in range(0, len(keys), 1000):
+        redis.delete(*keys[i:i + 1000])
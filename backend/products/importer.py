@@ -0,0 +1,334 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from django.db import connection, transaction
+from categories.models import Category
+from products.cards import schedule_product_refresh
+from products.models import Product, ProductVariant
+from products.search import index_products
+from products.services import image_url
+
+# Import / export sản phẩm hàng loạt.
+# - CSV: mỗi dòng là 1 variant, các dòng liên tiếp cùng name + category thuộc cùng 1 product.
+# - JSONL: mỗi dòng là 1 product, variant nằm trong key "variants".
+# File được đọc từng dòng và ghi theo từng chunk product trong 1 transaction,
+# nên bộ nhớ chỉ phụ thuộc chunk_size chứ không phụ thuộc kích thước file.
+
+CSV_COLUMNS = [
+    "name", "category", "current_price", "old_price", "description", "status",
+    "is_new", "is_featured", "product_img",
+    "sku", "size", "color", "stock", "variant_status", "variant_img",
+]
+PRODUCT_FIELDS = CSV_COLUMNS[:9]
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+class RowError(ValueError):
+    pass
+
+
+def get_reader(fmt):
+    return {"csv": read_csv, "jsonl": read_jsonl}.get(fmt)
+
+
+def detect_format(filename, default="csv"):
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def text_stream(fileobj):
+    # File upload / file mở ở chế độ binary -> đọc text từng dòng, bỏ BOM của Excel
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+
+
+def read_csv(fileobj):
+    # yield (số dòng, dữ liệu product, lỗi)
+    reader = csv.DictReader(text_stream(fileobj))
+    current, start_line = None, None
+
+    for row in reader:
+        line = reader.line_num
+        row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+        key = (row.get("name"), row.get("category"))
+
+        if current is None or key != (current["name"], current["category"]):
+            if current is not None:
+                yield start_line, current, None
+            current = {field: row.get(field, "") for field in PRODUCT_FIELDS}
+            current["variants"] = []
+            start_line = line
+
+        if row.get("sku"):
+            current["variants"].append({
+                "sku": row.get("sku"),
+                "size": row.get("size"),
+                "color": row.get("color"),
+                "stock": row.get("stock") or 0,
+                "status": row.get("variant_status") or "Active",
+                "image": row.get("variant_img"),
+            })
+
+    if current is not None:
+        yield start_line, current, None
+
+
+def read_jsonl(fileobj):
+    for line, raw in enumerate(text_stream(fileobj), start=1):
+        if not raw.strip():
+            continue
+        try:
+            data = json.loads(raw)
+        except json.JSONDecodeError as e:
+            yield line, None, f"JSON không hợp lệ: {e.msg}"
+            continue
+        if not isinstance(data, dict):
+            yield line, None, "Mỗi dòng phải là 1 object"
+            continue
+        yield line, data, None
+
+
+def _category_lookup():
+    lookup = {}
+    for cid, name in Category.objects.values_list("id", "name"):
+        lookup[str(cid)] = cid
+        lookup[name.strip().lower()] = cid
+    return lookup
+
+
+def _decimal(value, field, required=False):
+    if value in (None, ""):
+        if required:
+            raise RowError(f"Thiếu {field}")
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise RowError(f"{field} không hợp lệ: {value}")
+    if number < 0:
+        raise RowError(f"{field} không được âm")
+    return number
+
+
+def _bool(value, default):
+    if value in (None, ""):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _max_len(value, field, length):
+    if len(value) > length:
+        raise RowError(f"{field} dài quá {length} ký tự: {value}")
+    return value
+
+
+def build_product(data, categories):
+    name = str(data.get("name") or "").strip()
+    if not name:
+        raise RowError("Thiếu name")
+
+    category_id = categories.get(str(data.get("category") or "").strip().lower())
+    if category_id is None:
+        raise RowError(f"Category không tồn tại: {data.get('category')}")
+
+    product = Product(
+        category_id=category_id,
+        name=name,
+        current_price=_decimal(data.get("current_price"), "current_price", required=True),
+        old_price=_decimal(data.get("old_price"), "old_price"),
+        description=data.get("description") or "",
+        status=data.get("status") or "Active",
+        is_new=_bool(data.get("is_new"), True),
+        is_featured=_bool(data.get("is_featured"), False),
+        product_img=data.get("product_img") or None,
+    )
+
+    variants = []
+    seen = set()
+    for v in data.get("variants") or []:
+        sku = _max_len(str(v.get("sku") or "").strip(), "sku", 20)
+        size = _max_len(str(v.get("size") or "").strip(), "size", 3)
+        color = _max_len(str(v.get("color") or "").strip(), "color", 15)
+        if not all([sku, size, color]):
+            raise RowError("Variant thiếu sku/size/color")
+        if sku in seen:
+            raise RowError(f"SKU bị trùng trong product: {sku}")
+        seen.add(sku)
+
+        try:
+            stock = int(v.get("stock") or 0)
+        except (TypeError, ValueError):
+            raise RowError(f"stock không hợp lệ: {v.get('stock')}")
+        if stock < 0:
+            raise RowError("stock không được âm")
+
+        variants.append(ProductVariant(
+            sku=sku, size=size, color=color, stock_quantity=stock,
+            status=v.get("status") or "Active", PV_img=v.get("image") or None,
+        ))
+
+    product.stock_quantity = sum(v.stock_quantity for v in variants)
+    product.update_status_by_stockq(save=False)
+    return product, variants
+
+
+class ImportResult:
+    def __init__(self):
+        self.products = 0
+        self.variants = 0
+        self.error_count = 0
+        self.errors = []
+        self.dry_run_skus = set()
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        return {
+            "products": self.products,
+            "variants": self.variants,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def _save_chunk(chunk, result, dry_run):
+    # chunk: [(line, product, variants)]
+    skus = [v.sku for _, _, variants in chunk for v in variants]
+    existing = set(ProductVariant.objects.filter(sku__in=skus).values_list("sku", flat=True))
+    # dry-run không ghi DB nên phải tự nhớ SKU của các chunk trước
+    batch_skus = result.dry_run_skus if dry_run else set()
+
+    batch = []
+    for line, product, variants in chunk:
+        dup = [v.sku for v in variants if v.sku in existing or v.sku in batch_skus]
+        if dup:
+            result.add_error(line, f"SKU đã tồn tại: {', '.join(dup)}")
+            continue
+        batch_skus.update(v.sku for v in variants)
+        batch.append((product, variants))
+
+    if dry_run or not batch:
+        result.products += len(batch)
+        result.variants += sum(len(variants) for _, variants in batch)
+        return
+
+    with transaction.atomic():
+        products = [product for product, _ in batch]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Product.objects.bulk_create(products)
+        else:
+            # MySQL không trả về id sau bulk_create nên product phải insert từng cái
+            for product in products:
+                product.save()
+
+        rows = []
+        for product, variants in batch:
+            for v in variants:
+                v.product = product
+                rows.append(v)
+        ProductVariant.objects.bulk_create(rows, batch_size=1000)
+
+        ids = [p.id for p in products]
+        transaction.on_commit(lambda: index_products(ids), robust=True)
+        schedule_product_refresh(ids)
+
+    result.products += len(batch)
+    result.variants += len(rows)
+
+
+def import_products(records, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    # records: iterator (line, data, error) từ read_csv / read_jsonl
+    categories = _category_lookup()
+    result = ImportResult()
+    chunk = []
+
+    for line, data, error in records:
+        if error:
+            result.add_error(line, error)
+            continue
+        try:
+            product, variants = build_product(data, categories)
+        except RowError as e:
+            result.add_error(line, str(e))
+            continue
+
+        chunk.append((line, product, variants))
+        if len(chunk) >= chunk_size:
+            _save_chunk(chunk, result, dry_run)
+            chunk = []
+
+    if chunk:
+        _save_chunk(chunk, result, dry_run)
+    return result
+
+
+def _export_queryset():
+    return Product.objects.select_related("category").prefetch_related("product_variants").order_by("id")
+
+
+def _product_data(product):
+    return {
+        "name": product.name,
+        "category": product.category.name,
+        "current_price": product.current_price,
+        "old_price": product.old_price,
+        "description": product.description,
+        "status": product.status,
+        "is_new": product.is_new,
+        "is_featured": product.is_featured,
+        "product_img": image_url(product.product_img),
+    }
+
+
+def _variant_data(variant):
+    return {
+        "sku": variant.sku,
+        "size": variant.size,
+        "color": variant.color,
+        "stock": variant.stock_quantity,
+        "status": variant.status,
+        "image": image_url(variant.PV_img),
+    }
+
+
+class _Echo:
+    # csv.writer ghi vào đây để lấy lại chuỗi của từng dòng
+    def write(self, value):
+        return value
+
+
+def export_csv(chunk_size=DEFAULT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+
+    for product in _export_queryset().iterator(chunk_size=chunk_size):
+        base = _product_data(product)
+        product_row = [base[field] if base[field] is not None else "" for field in PRODUCT_FIELDS]
+        variants = list(product.product_variants.all())
+        if not variants:
+            yield writer.writerow(product_row + [""] * (len(CSV_COLUMNS) - len(PRODUCT_FIELDS)))
+        for v in variants:
+            data = _variant_data(v)
+            yield writer.writerow(product_row + [
+                data["sku"], data["size"], data["color"], data["stock"], data["status"], data["image"] or "",
+            ])
+
+
+def export_jsonl(chunk_size=DEFAULT_CHUNK_SIZE):
+    for product in _export_queryset().iterator(chunk_size=chunk_size):
+        data = _product_data(product)
+        data["variants"] = [_variant_data(v) for v in product.product_variants.all()]
+        yield json.dumps(data, ensure_ascii=False, default=str) + "\n"
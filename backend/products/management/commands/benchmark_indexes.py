@@ -0,0 +1,137 @@
+import random
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import Account
+from categories.models import Category
+from chat.models import ChatMessage, ChatRoom
+from customers.models import CustomerAddress
+from orders.models import Order
+from products.models import Product, ProductVariant
+from reviews.models import Review
+from voucher.models import UserVoucher, Voucher
+
+SIZES = ["S", "M", "L", "XL"]
+COLORS = ["Đen", "Trắng", "Đỏ", "Xanh", "Be"]
+SHIP_STATUSES = ["Pending", "Processing", "Completed", "Cancelled"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed dữ liệu giả trong 1 transaction (rollback khi xong), in EXPLAIN và thời gian "
+        "của các truy vấn nóng. Chạy trước và sau khi migrate index để so sánh query plan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=5000)
+        parser.add_argument("--customers", type=int, default=200)
+        parser.add_argument("--orders", type=int, default=20000)
+        parser.add_argument("--runs", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                fixtures = self.seed(options)
+                self.run_benchmarks(fixtures, options["runs"])
+                raise Rollback()
+        except Rollback:
+            self.stdout.write("Đã rollback dữ liệu seed.")
+
+    def seed(self, options):
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        rnd = random.Random(42)
+
+        category = Category.objects.create(name=tag, status="Active")
+        accounts = [
+            Account.objects.create(username=f"{tag}-{i}") for i in range(options["customers"])
+        ]
+        addresses = [
+            CustomerAddress.objects.create(
+                account=a, receiver_name="bench", phone="0", province="x", ward="x", address_detail="x"
+            ) for a in accounts
+        ]
+
+        Product.objects.bulk_create([
+            Product(
+                category=category, name=f"{tag}-{i}", current_price=rnd.randint(50, 3000) * 1000,
+                description="bench", status=rnd.choice(["Active", "Active", "Active", "Hidden"]),
+            ) for i in range(options["products"])
+        ], batch_size=1000)
+        product_ids = list(Product.objects.filter(category=category).values_list("id", flat=True))
+
+        ProductVariant.objects.bulk_create([
+            ProductVariant(
+                product_id=pid, sku=f"{pid}-{size}-{c}", size=size, color=color,
+                stock_quantity=rnd.randint(0, 50), status="Active",
+            )
+            for pid in product_ids
+            for size in SIZES
+            for c, color in enumerate(rnd.sample(COLORS, 2))
+        ], batch_size=2000)
+
+        Order.objects.bulk_create([
+            Order(
+                customer=accounts[i % len(accounts)], address=addresses[i % len(addresses)],
+                ship_method="bench", payment_method="COD", note="",
+                ship_status=rnd.choice(SHIP_STATUSES), total_amount=rnd.randint(100, 5000) * 1000,
+            ) for i in range(options["orders"])
+        ], batch_size=2000)
+
+        Review.objects.bulk_create([
+            Review(
+                product_id=rnd.choice(product_ids), account=rnd.choice(accounts),
+                rating=rnd.randint(1, 5), status=rnd.choice(["Pending", "approved"]),
+            ) for _ in range(options["products"])
+        ], batch_size=2000)
+
+        room = ChatRoom.objects.create(customer=accounts[0])
+        rooms = [room] + [ChatRoom.objects.create(customer=a) for a in accounts[1:20]]
+        ChatMessage.objects.bulk_create([
+            ChatMessage(room=rnd.choice(rooms), sender=accounts[0], message="bench")
+            for _ in range(options["orders"])
+        ], batch_size=2000)
+
+        voucher = Voucher.objects.create(
+            code=tag, discount_type="fixed", discount_value=10000, quantity=10 ** 6,
+            start_date="2000-01-01T00:00:00Z", end_date="2100-01-01T00:00:00Z",
+        )
+        UserVoucher.objects.bulk_create([UserVoucher(user=a, voucher=voucher) for a in accounts])
+
+        variant = ProductVariant.objects.filter(product_id=product_ids[len(product_ids) // 2]).first()
+        return {"account": accounts[0], "room": room, "variant": variant}
+
+    def queries(self, fixtures):
+        variant = fixtures["variant"]
+        return {
+            "variant theo product/color/size": ProductVariant.objects.filter(
+                product_id=variant.product_id, color=variant.color, size=variant.size
+            ),
+            "variant theo sku": ProductVariant.objects.filter(sku=variant.sku),
+            "sản phẩm Active mới nhất": Product.objects.filter(status="Active").order_by("-created_at")[:20],
+            "đơn hàng của customer": Order.objects.filter(customer=fixtures["account"]).order_by("-order_date")[:50],
+            "đơn hàng theo ship_status": Order.objects.filter(ship_status="Pending").order_by("-order_date")[:50],
+            "review approved mới nhất": Review.objects.filter(status="approved").order_by("-review_date")[:4],
+            "tin nhắn của room": ChatMessage.objects.filter(room=fixtures["room"]).order_by("created_at")[:100],
+            "voucher chưa dùng của user": UserVoucher.objects.filter(user=fixtures["account"], is_used=False),
+        }
+
+    def run_benchmarks(self, fixtures, runs):
+        for name, qs in self.queries(fixtures).items():
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                list(qs.all())
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {name}"))
+            self.stdout.write(qs.explain())
+            self.stdout.write(
+                f"median {statistics.median(timings):.3f} ms, "
+                f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.3f} ms ({runs} lần)"
+            )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from products import importer
+from utils.delete_cache import delete_product_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Import sản phẩm hàng loạt từ file CSV (mỗi dòng 1 variant) hoặc JSONL (mỗi dòng 1 product). "
+        "Ghi theo chunk, in ra các dòng lỗi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Mặc định đoán theo đuôi file")
+        parser.add_argument("--chunk-size", type=int, default=importer.DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Chỉ kiểm tra, không ghi DB")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or importer.detect_format(options["path"])
+        reader = importer.get_reader(fmt)
+
+        try:
+            with open(options["path"], "rb") as f:
+                result = importer.import_products(
+                    reader(f), chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if result.products and not options["dry_run"]:
+            delete_product_cache()
+
+        for error in result.errors:
+            self.stderr.write(f"Dòng {error['line']}: {error['error']}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... và {result.error_count - len(result.errors)} lỗi khác")
+
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{result.products} product, {result.variants} variant, {result.error_count} dòng lỗi."
+        ))
@@ -0,0 +1,63 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from products.models import ProductImageUpload
+from products.tasks import process_product_uploads, release_stale_claims
+
+
+# File mới stage có thể thuộc request chưa commit, chỉ dọn file cũ hơn ngưỡng này
+CLEANUP_MIN_AGE = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Upload các ảnh sản phẩm còn pending ngay trong process hiện tại "
+        "(dùng khi worker django_rq không chạy hoặc để chạy lại ảnh lỗi)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retry-failed", action="store_true", help="Đưa các ảnh lỗi về pending để upload lại")
+        parser.add_argument("--cleanup", action="store_true", help="Xóa file staging không còn slot nào dùng")
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            count = ProductImageUpload.objects.filter(
+                status=ProductImageUpload.STATUS_FAILED
+            ).update(status=ProductImageUpload.STATUS_PENDING, error="")
+            self.stdout.write(f"Đưa {count} ảnh lỗi về pending.")
+
+        stale = release_stale_claims()
+        if stale:
+            self.stdout.write(f"Đưa {stale} ảnh đang upload quá hạn (worker đã dừng) về pending.")
+
+        product_ids = ProductImageUpload.objects.filter(
+            status=ProductImageUpload.STATUS_PENDING
+        ).values_list("product_id", flat=True).distinct()
+
+        total = 0
+        for product_id in list(product_ids):
+            total += process_product_uploads(product_id)
+        self.stdout.write(self.style.SUCCESS(f"Đã upload {total} ảnh."))
+
+        if options["cleanup"]:
+            self.cleanup()
+
+    def cleanup(self):
+        staging_dir = settings.PRODUCT_UPLOAD_STAGING_DIR
+        if not os.path.isdir(staging_dir):
+            return
+
+        in_use = set(ProductImageUpload.objects.exclude(
+            status=ProductImageUpload.STATUS_DONE
+        ).values_list("staged_path", flat=True))
+
+        removed = 0
+        for name in os.listdir(staging_dir):
+            path = os.path.join(staging_dir, name)
+            if not os.path.isfile(path) or path in in_use:
+                continue
+            if time.time() - os.path.getmtime(path) > CLEANUP_MIN_AGE:
+                os.remove(path)
+                removed += 1
+        self.stdout.write(f"Đã xóa {removed} file staging không dùng.")
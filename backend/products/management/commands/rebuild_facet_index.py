@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from products.facets import clear_facet_index, index_facets
+from products.models import Product
+from utils.batching import iter_batches
+
+
+class Command(BaseCommand):
+    help = "Xây lại toàn bộ facet index (bitmap) trong Redis"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        clear_facet_index()
+
+        total = 0
+        for batch in iter_batches(Product.objects.order_by("id").values_list("id", flat=True), batch_size):
+            index_facets(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Đã index facet cho {total} sản phẩm"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from products.cards import rebuild_cards
+from products.models import Product
+from utils.batching import iter_batches
+from utils.delete_cache import delete_product_cache
+
+
+class Command(BaseCommand):
+    help = "Build lại toàn bộ product card (JSON catalog dựng sẵn)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        total = 0
+        for batch in iter_batches(Product.objects.order_by("id").values_list("id", flat=True), batch_size):
+            rebuild_cards(batch)
+            total += len(batch)
+
+        delete_product_cache()
+        self.stdout.write(self.style.SUCCESS(f"Đã build {total} product card"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from products.models import Product
+from products.search import index_products
+from utils.batching import iter_batches
+from utils.delete_cache import delete_product_cache
+
+
+class Command(BaseCommand):
+    help = "Xây lại toàn bộ inverted index tìm kiếm sản phẩm"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        ids = Product.objects.order_by("id").values_list("id", flat=True)
+
+        total = 0
+        for batch in iter_batches(ids, batch_size):
+            index_products(batch)
+            total += len(batch)
+
+        delete_product_cache()
+        self.stdout.write(self.style.SUCCESS(f"Đã index {total} sản phẩm"))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_productcard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImageUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(choices=[('main', 'Main'), ('gallery', 'Gallery'), ('variant', 'Variant')], max_length=10)),
+                ('variant_sku', models.CharField(blank=True, default='', max_length=20)),
+                ('staged_path', models.CharField(max_length=255)),
+                ('status', models.CharField(default='pending', max_length=20)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_uploads', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'status'], name='products_pr_product_11df84_idx'), models.Index(fields=['status'], name='products_pr_status_e28be1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_productimageupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimageupload',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -27,6 +27,7 @@ class Product(models.Model):
             models.Index(fields=["is_featured"]),
             models.Index(fields=["status"]),
             models.Index(fields=["current_price"]),  # price filter
+            models.Index(fields=["status", "-created_at"]),  # active listing
         ]
 
     def update_average_rating(self):
@@ -34,10 +35,11 @@ class Product(models.Model):
         self.average_rating = round(avg, 1)
         self.save()
 
-    def update_status_by_stockq(self):
+    def update_status_by_stockq(self, save=True):
         if self.stock_quantity == 0:
             self.status = "out-of-stock"
-        self.save()
+        if save:
+            self.save()
 
     def __str__(self):
         return str(self.name)
@@ -53,13 +55,14 @@ class ProductVariant(models.Model):
     PV_img = CloudinaryField('image', blank=True, null=True)
     status = models.CharField(max_length=50)
 
-    indexes = [
-        models.Index(fields=["product"]),
-        models.Index(fields=["color"]),
-        models.Index(fields=["size"]),
-        models.Index(fields=["status"]),
-        models.Index(fields=["product", "color", "size"]),  # BEST
-    ]
+    class Meta:
+        indexes = [
+            models.Index(fields=["color"]),
+            models.Index(fields=["size"]),
+            models.Index(fields=["status"]),
+            models.Index(fields=["sku"]),
+            models.Index(fields=["product", "color", "size"]),  # BEST
+        ]
 
     def update_status_by_stock(self):
         if self.stock_quantity == 0:
@@ -79,3 +82,59 @@ class ProductImage(models.Model):
         return f"{self.product.name} Image"
 
 
+#model productSearchToken (inverted index cho tìm kiếm)
+class ProductSearchToken(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ['token', 'product']
+
+    def __str__(self):
+        return f"{self.token} -> {self.product_id}"
+
+
+#model productCard (JSON đã serialize sẵn cho các trang catalog)
+class ProductCard(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    data = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Card {self.product_id}"
+
+
+#model productImageUpload (ảnh đang chờ upload nền lên storage)
+class ProductImageUpload(models.Model):
+    TARGET_MAIN = "main"
+    TARGET_GALLERY = "gallery"
+    TARGET_VARIANT = "variant"
+    TARGET_CHOICES = [
+        (TARGET_MAIN, "Main"),
+        (TARGET_GALLERY, "Gallery"),
+        (TARGET_VARIANT, "Variant"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_UPLOADING = "uploading"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='pending_uploads')
+    target = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    variant_sku = models.CharField(max_length=20, blank=True, default="")
+    staged_path = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, default=STATUS_PENDING)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "status"]),
+            models.Index(fields=["status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.target} upload for {self.product_id} ({self.status})"
@@ -0,0 +1,125 @@
+import re
+import unicodedata
+from django.db import transaction
+from django.db.models import Max
+from products.models import Product, ProductSearchToken
+
+# Inverted index: mỗi (token, product) là 1 dòng trong ProductSearchToken.
+# Truy vấn chỉ quét theo index của cột token (exact hoặc prefix),
+# không còn icontains quét toàn bảng.
+
+NAME_WEIGHT = 8
+SKU_WEIGHT = 6
+CATEGORY_WEIGHT = 4
+DESCRIPTION_WEIGHT = 1
+
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+MIN_PREFIX_LENGTH = 2
+MAX_RESULTS = 60
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text):
+    # Bỏ dấu tiếng Việt: "Áo Khoác Đỏ" -> "ao khoac do"
+    text = (text or "").replace("đ", "d").replace("Đ", "D")
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return text.lower()
+
+
+def tokenize(text):
+    return [token[:MAX_TOKEN_LENGTH] for token in _TOKEN_RE.findall(normalize_text(text))]
+
+
+def build_product_tokens(product):
+    weights = {}
+
+    def add(tokens, weight):
+        for token in set(tokens):
+            weights[token] = weights.get(token, 0) + weight
+
+    add(tokenize(product.name), NAME_WEIGHT)
+    add(tokenize(product.category.name if product.category_id else ""), CATEGORY_WEIGHT)
+    add(tokenize(product.description), DESCRIPTION_WEIGHT)
+
+    sku_tokens = []
+    for variant in product.product_variants.all():
+        parts = tokenize(variant.sku)
+        sku_tokens.extend(parts)
+        # "AO-001-RED" còn được index dạng liền "ao001red"
+        if len(parts) > 1:
+            sku_tokens.append("".join(parts)[:MAX_TOKEN_LENGTH])
+    add(sku_tokens, SKU_WEIGHT)
+
+    return weights
+
+
+def index_products(product_ids):
+    products = Product.objects.select_related("category").prefetch_related(
+        "product_variants"
+    ).filter(id__in=list(product_ids))
+
+    rows = []
+    indexed_ids = []
+    for product in products:
+        indexed_ids.append(product.id)
+        rows.extend(
+            ProductSearchToken(product=product, token=token, weight=weight)
+            for token, weight in build_product_tokens(product).items()
+        )
+
+    with transaction.atomic():
+        ProductSearchToken.objects.filter(product_id__in=indexed_ids).delete()
+        ProductSearchToken.objects.bulk_create(rows, batch_size=1000)
+
+
+def index_product(product):
+    index_products([product.id])
+
+
+def search_product_ids(query, limit=MAX_RESULTS):
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    # Các từ đầy đủ match chính xác, từ cuối match prefix (gõ dở / autocomplete)
+    scores = None
+    for i, term in enumerate(terms):
+        is_last = i == len(terms) - 1
+        if is_last and len(term) >= MIN_PREFIX_LENGTH:
+            rows = ProductSearchToken.objects.filter(token__startswith=term)
+        else:
+            rows = ProductSearchToken.objects.filter(token=term)
+
+        if scores is not None:
+            rows = rows.filter(product_id__in=list(scores))
+
+        term_scores = dict(
+            rows.values("product_id").annotate(score=Max("weight")).values_list("product_id", "score")
+        )
+        if scores is None:
+            scores = term_scores
+        else:
+            scores = {pid: scores[pid] + score for pid, score in term_scores.items()}
+
+        if not scores:
+            return []
+
+    # Lấy đủ mọi sản phẩm cùng điểm với vị trí cuối (điểm cắt) rồi mới xét rating,
+    # để sản phẩm rating cao nằm ở điểm cắt không bị loại chỉ vì id nhỏ hơn
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    cutoff = ranked[min(limit, len(ranked)) - 1][1]
+    candidates = [(pid, score) for pid, score in ranked if score >= cutoff]
+    ratings = dict(
+        Product.objects.filter(id__in=[pid for pid, _ in candidates]).values_list("id", "average_rating")
+    )
+    # Cùng điểm thì ưu tiên sản phẩm được đánh giá cao hơn
+    candidates = [item for item in candidates if item[0] in ratings]
+    candidates.sort(key=lambda item: (item[1], ratings[item[0]], item[0]), reverse=True)
+    return [pid for pid, _ in candidates[:limit]]
+
+
+def normalized_query(query):
+    return " ".join(list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS])
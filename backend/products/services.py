@@ -0,0 +1,146 @@
+import json
+from django.db import transaction
+from products.models import ProductImage, ProductVariant
+from products.uploads import PendingUploads
+from utils.cloudinary_helper import get_cloudinary_url
+
+# Ghi product + ảnh + variant theo kiểu diff: variant khớp theo SKU, chỉ tạo / sửa / xóa phần thay đổi
+# bằng bulk_create / bulk_update, product chỉ save 1 lần. Số query không phụ thuộc số variant,
+# và variant giữ nguyên id nên cart_items / order_items không bị mất liên kết.
+# File ảnh không upload trong request: chỉ stage lại rồi upload nền (products/uploads.py).
+
+VARIANT_FIELDS = ["size", "color", "stock_quantity", "status"]
+
+
+def image_url(image):
+    # Dựng URL giống serializer để so với URL frontend gửi lại
+    if not image:
+        return None
+    return get_cloudinary_url(str(image.url))
+
+
+def parse_variants(variants_json, files):
+    # Trả về {sku: {...}}; bỏ qua dòng thiếu sku/size/color, SKU trùng thì lấy dòng sau
+    if not variants_json:
+        return {}
+
+    variants = {}
+    for i, v in enumerate(json.loads(variants_json)):
+        if not all([v.get("sku"), v.get("size"), v.get("color")]):
+            continue
+        variants[v["sku"]] = {
+            "size": v["size"],
+            "color": v["color"],
+            "stock_quantity": int(v.get("stock", 0)),
+            "status": v.get("status", "Active"),
+            "file": files.get(f"variant_images_{i}"),
+            "image_url": v.get("image_url"),
+        }
+    return variants
+
+
+def _apply_stock(product, variants):
+    product.stock_quantity = sum(v["stock_quantity"] for v in variants.values())
+    product.update_status_by_stockq(save=False)
+
+
+def _new_variant(product, sku, v, pending):
+    if v["file"]:
+        pending.variant(sku, v["file"])
+    return ProductVariant(
+        product=product,
+        sku=sku,
+        PV_img=v["image_url"],
+        **{name: v[name] for name in VARIANT_FIELDS},
+    )
+
+
+def create_product(product, variants, images, main_image=None):
+    # product chưa được lưu; trả về số ảnh đang chờ upload
+    pending = PendingUploads()
+    if main_image:
+        pending.main(main_image)
+    for img in images:
+        pending.gallery(img)
+
+    with transaction.atomic():
+        _apply_stock(product, variants)
+        product.save()
+
+        ProductVariant.objects.bulk_create([_new_variant(product, sku, v, pending) for sku, v in variants.items()])
+        return pending.save(product)
+
+
+def update_product(product, variants, keep_image_urls, new_images, main_image=None):
+    pending = PendingUploads()
+    if main_image:
+        pending.main(main_image)
+    for img in new_images:
+        pending.gallery(img)
+
+    with transaction.atomic():
+        _apply_stock(product, variants)
+        product.save()
+
+        _sync_images(product, keep_image_urls)
+        _sync_variants(product, variants, pending)
+        return pending.save(product)
+
+
+def _sync_images(product, keep_image_urls):
+    keep = set(keep_image_urls)
+    existing_urls = set()
+    removed = []
+    for img in product.product_imgs.all():
+        url = image_url(img.PI_img)
+        if url in keep:
+            existing_urls.add(url)
+        else:
+            removed.append(img.id)
+
+    if removed:
+        ProductImage.objects.filter(id__in=removed).delete()
+
+    # URL cũ chưa có trong DB thì lưu lại dạng URL như trước
+    ProductImage.objects.bulk_create([
+        ProductImage(product=product, PI_img=url) for url in keep_image_urls if url not in existing_urls
+    ])
+
+
+def _sync_variants(product, variants, pending):
+    existing = {}
+    removed = []
+    for variant in product.product_variants.all():
+        if variant.sku in existing or variant.sku not in variants:
+            removed.append(variant.id)
+        else:
+            existing[variant.sku] = variant
+
+    to_create, to_update = [], []
+    for sku, v in variants.items():
+        variant = existing.get(sku)
+        if variant is None:
+            to_create.append(_new_variant(product, sku, v, pending))
+            continue
+
+        changed = False
+        for name in VARIANT_FIELDS:
+            if getattr(variant, name) != v[name]:
+                setattr(variant, name, v[name])
+                changed = True
+
+        if v["file"]:
+            # Giữ ảnh cũ đến khi job upload xong ảnh mới
+            pending.variant(sku, v["file"])
+        elif image_url(variant.PV_img) != v["image_url"]:
+            variant.PV_img = v["image_url"]
+            changed = True
+
+        if changed:
+            to_update.append(variant)
+
+    if removed:
+        ProductVariant.objects.filter(id__in=removed).delete()
+    ProductVariant.objects.bulk_create(to_create)
+    if to_update:
+        ProductVariant.objects.bulk_update(to_update, VARIANT_FIELDS + ["PV_img"])
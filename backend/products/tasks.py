@@ -0,0 +1,87 @@
+# products/tasks.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from products.cards import rebuild_cards
+from products.models import Product, ProductImage, ProductImageUpload, ProductVariant
+from products.uploads import get_upload_backend, remove_staged
+from utils.delete_cache import delete_product_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _claim(upload_ids):
+    # Mỗi slot chỉ được 1 job xử lý (2 lần sửa liên tiếp có thể xếp 2 job cho cùng product)
+    now = timezone.now()
+    return [
+        uid for uid in upload_ids
+        if ProductImageUpload.objects.filter(
+            id=uid, status=ProductImageUpload.STATUS_PENDING
+        ).update(status=ProductImageUpload.STATUS_UPLOADING, claimed_at=now)
+    ]
+
+
+def release_stale_claims():
+    # Worker chết giữa chừng để lại slot "uploading"; quá hạn thì đưa về pending cho job sau
+    cutoff = timezone.now() - timedelta(seconds=settings.PRODUCT_UPLOAD_CLAIM_TIMEOUT)
+    return ProductImageUpload.objects.filter(
+        status=ProductImageUpload.STATUS_UPLOADING, claimed_at__lt=cutoff
+    ).update(status=ProductImageUpload.STATUS_PENDING, claimed_at=None)
+
+
+def process_product_uploads(product_id):
+    pending_ids = list(ProductImageUpload.objects.filter(
+        product_id=product_id, status=ProductImageUpload.STATUS_PENDING
+    ).order_by("id").values_list("id", flat=True))
+    uploads = list(ProductImageUpload.objects.filter(id__in=_claim(pending_ids)).order_by("id"))
+    if not uploads:
+        return 0
+
+    backend = get_upload_backend()
+
+    def upload_one(upload):
+        try:
+            return upload, backend.upload(upload.staged_path), None
+        except Exception as e:
+            return upload, None, e
+
+    # Chỉ phần upload chạy song song; ghi DB ở thread của job
+    with ThreadPoolExecutor(max_workers=settings.PRODUCT_UPLOAD_WORKERS) as pool:
+        results = list(pool.map(upload_one, uploads))
+
+    done, failed = [], []
+    with transaction.atomic():
+        gallery = []
+        for upload, value, error in results:
+            if error is not None:
+                logger.error("Upload ảnh %s lỗi: %s", upload.id, error)
+                upload.status = ProductImageUpload.STATUS_FAILED
+                upload.error = str(error)
+                failed.append(upload)
+                continue
+
+            if upload.target == ProductImageUpload.TARGET_MAIN:
+                Product.objects.filter(id=product_id).update(product_img=value)
+            elif upload.target == ProductImageUpload.TARGET_VARIANT:
+                ProductVariant.objects.filter(product_id=product_id, sku=upload.variant_sku).update(PV_img=value)
+            else:
+                gallery.append(ProductImage(product_id=product_id, PI_img=value))
+
+            upload.status = ProductImageUpload.STATUS_DONE
+            upload.error = ""
+            done.append(upload)
+
+        ProductImage.objects.bulk_create(gallery)
+        ProductImageUpload.objects.bulk_update(done + failed, ["status", "error"])
+
+    # File lỗi được giữ lại để chạy lại bằng lệnh process_image_uploads --retry-failed
+    for upload in done:
+        remove_staged(upload.staged_path)
+
+    if done:
+        rebuild_cards([product_id])
+        delete_product_cache()
+    return len(done)
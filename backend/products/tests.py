@@ -1,3 +1,158 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from categories.models import Category
+from products.models import Product, ProductCard, ProductImageUpload
+from products import services
+from products.search import index_products, search_product_ids
+from products.tasks import process_product_uploads
 
-# Create your tests here.
+
+class FailingUploadBackend:
+    def upload(self, path):
+        raise RuntimeError("storage down")
+
+
+def image(name):
+    return SimpleUploadedFile(name, b"fake-image-bytes", content_type="image/jpeg")
+
+
+class ProductImageUploadPipelineTest(TestCase):
+    def setUp(self):
+        self.staging_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.staging_dir, ignore_errors=True)
+        overrides = override_settings(
+            PRODUCT_UPLOAD_STAGING_DIR=self.staging_dir,
+            PRODUCT_UPLOAD_BACKEND="products.uploads.LocalUploadBackend",
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.category = Category.objects.create(name="Áo", status="Active")
+
+    def create_product(self):
+        variants = services.parse_variants(
+            json.dumps([
+                {"sku": "AO-M", "size": "M", "color": "Đen", "stock": 3},
+                {"sku": "AO-L", "size": "L", "color": "Đen", "stock": 2},
+            ]),
+            {"variant_images_0": image("variant.jpg")},
+        )
+        product = Product(
+            category=self.category, name="Áo thun", current_price=100000, description="", status="Active"
+        )
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            pending = services.create_product(product, variants, [image("gallery.jpg")], image("main.jpg"))
+        return product, pending, callbacks
+
+    def test_create_product_stages_files_without_uploading(self):
+        product, pending, callbacks = self.create_product()
+
+        self.assertEqual(pending, 3)
+        self.assertEqual(len(callbacks), 1)
+        product.refresh_from_db()
+        self.assertFalse(product.product_img)
+        self.assertEqual(product.product_imgs.count(), 0)
+        self.assertEqual(product.stock_quantity, 5)
+
+        uploads = ProductImageUpload.objects.filter(product=product)
+        self.assertEqual(
+            sorted(uploads.values_list("target", "variant_sku")),
+            [("gallery", ""), ("main", ""), ("variant", "AO-M")],
+        )
+        for upload in uploads:
+            self.assertTrue(os.path.exists(upload.staged_path))
+
+    def test_process_uploads_patches_results_back(self):
+        product, _, _ = self.create_product()
+        ProductCard.objects.create(product=product, data={"product_img": None})
+
+        self.assertEqual(process_product_uploads(product.id), 3)
+
+        product.refresh_from_db()
+        self.assertIn("local/", str(product.product_img))
+        self.assertEqual(product.product_imgs.count(), 1)
+        self.assertIn("local/", str(product.product_variants.get(sku="AO-M").PV_img))
+        self.assertFalse(product.product_variants.get(sku="AO-L").PV_img)
+
+        uploads = ProductImageUpload.objects.filter(product=product)
+        self.assertTrue(all(u.status == ProductImageUpload.STATUS_DONE for u in uploads))
+        self.assertFalse(any(os.path.exists(u.staged_path) for u in uploads))
+
+        # Card được build lại với ảnh mới
+        self.assertIsNotNone(ProductCard.objects.get(product=product).data["product_img"])
+
+        # Chạy lại job không upload lần nữa
+        self.assertEqual(process_product_uploads(product.id), 0)
+
+    def test_failed_upload_keeps_staged_file(self):
+        product, _, _ = self.create_product()
+
+        with override_settings(PRODUCT_UPLOAD_BACKEND="products.tests.FailingUploadBackend"):
+            self.assertEqual(process_product_uploads(product.id), 0)
+
+        product.refresh_from_db()
+        self.assertFalse(product.product_img)
+        for upload in ProductImageUpload.objects.filter(product=product):
+            self.assertEqual(upload.status, ProductImageUpload.STATUS_FAILED)
+            self.assertEqual(upload.error, "storage down")
+            self.assertTrue(os.path.exists(upload.staged_path))
+
+    def test_update_keeps_old_variant_image_until_uploaded(self):
+        product, _, _ = self.create_product()
+        process_product_uploads(product.id)
+        variant = product.product_variants.get(sku="AO-M")
+        old_image = str(variant.PV_img)
+
+        variants = services.parse_variants(
+            json.dumps([{"sku": "AO-M", "size": "M", "color": "Đen", "stock": 1,
+                         "image_url": services.image_url(variant.PV_img)}]),
+            {"variant_images_0": image("variant-new.jpg")},
+        )
+        with self.captureOnCommitCallbacks(execute=False):
+            pending = services.update_product(product, variants, [], [])
+
+        self.assertEqual(pending, 1)
+        variant.refresh_from_db()
+        self.assertEqual(str(variant.PV_img), old_image)
+        self.assertFalse(product.product_variants.filter(sku="AO-L").exists())
+
+        process_product_uploads(product.id)
+        variant.refresh_from_db()
+        self.assertNotEqual(str(variant.PV_img), old_image)
+        self.assertEqual(variant.id, product.product_variants.get(sku="AO-M").id)
+
+    def test_stale_uploading_claims_are_retried(self):
+        product, _, _ = self.create_product()
+        uploads = ProductImageUpload.objects.filter(product=product)
+        # Worker chết sau khi claim: 1 slot quá hạn, 1 slot vừa claim
+        stale, fresh = list(uploads[:2])
+        uploads.update(status=ProductImageUpload.STATUS_UPLOADING, claimed_at=timezone.now())
+        ProductImageUpload.objects.filter(id=stale.id).update(claimed_at=timezone.now() - timedelta(hours=1))
+
+        call_command("process_image_uploads", stdout=io.StringIO())
+
+        self.assertEqual(ProductImageUpload.objects.get(id=stale.id).status, ProductImageUpload.STATUS_DONE)
+        self.assertEqual(ProductImageUpload.objects.get(id=fresh.id).status, ProductImageUpload.STATUS_UPLOADING)
+
+
+class SearchRankingTest(TestCase):
+    def test_rating_breaks_ties_at_the_cutoff(self):
+        category = Category.objects.create(name="Quần", status="Active")
+        products = [
+            Product.objects.create(
+                category=category, name="Áo len", current_price=1, description="", status="Active", average_rating=rating,
+            ) for rating in (5, 1, 2, 3)
+        ]
+        index_products([p.id for p in products])
+
+        # Cùng điểm: 2 sản phẩm rating cao nhất phải lọt top 2, dù id nhỏ hơn
+        self.assertEqual(search_product_ids("ao len", limit=2), [products[0].id, products[3].id])
+        self.assertEqual(len(search_product_ids("ao len")), 4)
@@ -0,0 +1,92 @@
+import logging
+import os
+import shutil
+import uuid
+import django_rq
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from products.models import ProductImageUpload
+
+logger = logging.getLogger(__name__)
+
+# Pipeline upload ảnh sản phẩm:
+# 1. Request admin chỉ ghi file vào thư mục staging và tạo ProductImageUpload (slot "pending").
+# 2. Sau khi transaction commit, job django_rq (products.tasks.process_product_uploads)
+#    upload song song bằng thread pool, ghi kết quả vào product / ảnh / variant và làm mới cache.
+# Backend upload cấu hình qua settings.PRODUCT_UPLOAD_BACKEND để test với storage local.
+
+
+class CloudinaryUploadBackend:
+    def upload(self, path):
+        from cloudinary import uploader
+        resource = uploader.upload_resource(path, type="upload", resource_type="image")
+        # Giá trị lưu vào CloudinaryField, vd "image/upload/v123/abc.jpg"
+        return resource.get_prep_value()
+
+
+class LocalUploadBackend:
+    # Storage giả cho dev / test: copy file sang thư mục khác và trả về giá trị dạng Cloudinary
+    def __init__(self, root=None):
+        self.root = root or os.path.join(settings.PRODUCT_UPLOAD_STAGING_DIR, "uploaded")
+
+    def upload(self, path):
+        os.makedirs(self.root, exist_ok=True)
+        name = os.path.basename(path)
+        shutil.copyfile(path, os.path.join(self.root, name))
+        return f"image/upload/v1/local/{name}"
+
+
+def get_upload_backend():
+    return import_string(settings.PRODUCT_UPLOAD_BACKEND)()
+
+
+def stage_file(uploaded):
+    os.makedirs(settings.PRODUCT_UPLOAD_STAGING_DIR, exist_ok=True)
+    ext = os.path.splitext(uploaded.name or "")[1].lower()
+    path = os.path.join(settings.PRODUCT_UPLOAD_STAGING_DIR, f"{uuid.uuid4().hex}{ext}")
+    with open(path, "wb") as f:
+        for chunk in uploaded.chunks():
+            f.write(chunk)
+    return path
+
+
+def remove_staged(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PendingUploads:
+    # Gom các file của 1 lần ghi product, lưu slot pending và xếp job upload khi commit
+
+    def __init__(self):
+        self.items = []
+
+    def main(self, uploaded):
+        self.items.append((ProductImageUpload.TARGET_MAIN, "", uploaded))
+
+    def gallery(self, uploaded):
+        self.items.append((ProductImageUpload.TARGET_GALLERY, "", uploaded))
+
+    def variant(self, sku, uploaded):
+        self.items.append((ProductImageUpload.TARGET_VARIANT, sku, uploaded))
+
+    def save(self, product):
+        if not self.items:
+            return 0
+
+        uploads = [
+            ProductImageUpload(product=product, target=target, variant_sku=sku, staged_path=stage_file(f))
+            for target, sku, f in self.items
+        ]
+        ProductImageUpload.objects.bulk_create(uploads)
+        # Nếu transaction rollback thì file stage bị bỏ lại, lệnh process_image_uploads --cleanup sẽ dọn
+        transaction.on_commit(lambda: enqueue_uploads(product.id), robust=True)
+        return len(uploads)
+
+
+def enqueue_uploads(product_id):
+    from products.tasks import process_product_uploads
+    django_rq.enqueue(process_product_uploads, product_id)
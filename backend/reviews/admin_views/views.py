@@ -1,9 +1,10 @@
-from django.core.cache import cache
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from reviews.models import Review
 from reviews.serializers import ReviewSerializer
+from utils.cache_fetch import get_or_build
+from utils.cache_tags import REVIEW_TAG
 from utils.delete_cache import delete_review_cache
 
 
@@ -11,19 +12,15 @@ from utils.delete_cache import delete_review_cache
 @permission_classes([IsAdminUser])
 def get_all_reviews(request):
     try:
-        delete_review_cache()
-        KEY = f"all_reviews"
-        reviews = cache.get(KEY)
-
-        if reviews is None:
+        def build():
             reviews_qs = Review.objects.select_related(
                 'product'
             ).prefetch_related(
                 'account__user'
             ).all().order_by('-review_date')
+            return ReviewSerializer(reviews_qs, many=True).data
 
-            reviews = ReviewSerializer(reviews_qs, many=True).data
-            cache.set(KEY, reviews, timeout=86400)
+        reviews = get_or_build("all_reviews", build, tags=(REVIEW_TAG,))
 
         return JsonResponse({
             "success": True,
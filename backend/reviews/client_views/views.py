@@ -1,4 +1,3 @@
-from django.core.cache import cache
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -6,6 +5,8 @@ from orders.models import Order
 from products.models import Product
 from reviews.models import Review
 from reviews.serializers import ReviewSerializer
+from utils.cache_fetch import get_or_build
+from utils.cache_tags import REVIEW_TAG
 from utils.delete_cache import delete_review_cache
 
 
@@ -77,10 +78,7 @@ def add_review(request):
 @permission_classes([IsAuthenticated])
 def get_all_reviews_by_product_id(request, product_id):
     try:
-        KEY = f"all_reviews_{product_id}"
-        reviews = cache.get(KEY)
-
-        if reviews is None:
+        def build():
             product_qs = Product.objects.get(id=product_id)
             reviews_qs = Review.objects.filter(product=product_qs
             ).select_related(
@@ -88,8 +86,9 @@ def get_all_reviews_by_product_id(request, product_id):
             ).prefetch_related(
                 'account__user'
             ).filter(status='approved').order_by('-review_date')
-            reviews = ReviewSerializer(reviews_qs, many=True).data
-            cache.set(KEY, reviews, timeout=86400)
+            return ReviewSerializer(reviews_qs, many=True).data
+
+        reviews = get_or_build(f"all_reviews_{product_id}", build, tags=(REVIEW_TAG,))
 
         return JsonResponse({
             "success": True,
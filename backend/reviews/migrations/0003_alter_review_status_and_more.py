@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_products_pr_status_8ee08e_idx_and_more'),
+        ('reviews', '0002_remove_review_is_browse_review_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='status',
+            field=models.CharField(default='Pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['status', '-review_date'], name='reviews_rev_status_beda31_idx'),
+        ),
+    ]
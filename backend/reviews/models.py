@@ -8,13 +8,14 @@ class Review(models.Model):
     rating = models.IntegerField(default=0)
     comment = models.TextField(blank=True)
     review_date = models.DateTimeField(auto_now_add=True)
-    status = models.TextField(default='Pending')
+    status = models.CharField(max_length=20, default='Pending')
 
     class Meta:
         indexes = [
             models.Index(fields=["product"]),  # auto but ok
             models.Index(fields=["account"]),
             models.Index(fields=["product", "-review_date"]),  # BEST
+            models.Index(fields=["status", "-review_date"]),  # review đã duyệt mới nhất
         ]
 
     def __str__(self):
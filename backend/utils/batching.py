@@ -0,0 +1,13 @@
+# Duyệt queryset lớn theo từng lô (lệnh rebuild / backfill): đọc bằng iterator nên không nạp hết vào bộ nhớ
+
+
+def iter_batches(queryset, batch_size):
+    """Trả về lần lượt các list tối đa batch_size phần tử của queryset."""
+    batch = []
+    for item in queryset.iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
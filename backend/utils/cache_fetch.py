@@ -0,0 +1,102 @@
+import logging
+import math
+import random
+import time
+import uuid
+from django.core.cache import cache
+from utils.cache_tags import tagged_key
+
+logger = logging.getLogger(__name__)
+
+# Read-through cache chống stampede, dùng chung cho mọi view:
+# - single-flight: khi miss, chỉ request giữ được lock (cache.add = SET NX trên Redis) mới build,
+#   các request khác trả bản stale hoặc chờ kết quả thay vì cùng đập vào DB.
+# - stale-while-revalidate: mỗi lần build xong lưu thêm 1 bản "stale" dưới key không gắn version,
+#   nên sau khi invalidate tag (version đổi) vẫn còn dữ liệu cũ để phục vụ trong lúc build lại.
+# - refresh sớm theo xác suất (XFetch): gần hết TTL, mỗi request có xác suất nhỏ
+#   tự build lại trước, nên key nóng không hết hạn cùng lúc cho mọi request.
+# - TTL có jitter ±10% để các key set cùng lúc không hết hạn cùng lúc.
+
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 3
+WAIT_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0
+TTL_JITTER = 0.1
+STALE_TTL_FACTOR = 2
+
+
+def _lock_key(cache_key):
+    return f"lock:{cache_key}"
+
+
+def _stale_key(key):
+    return f"stale:{key}"
+
+
+def jittered(timeout):
+    return int(timeout * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER))
+
+
+def _should_refresh_early(delta, expires_at, beta):
+    # 1 - random() nằm trong (0, 1] nên log luôn xác định và <= 0
+    return time.time() - delta * beta * math.log(1 - random.random()) >= expires_at
+
+
+def _release_lock(lock_key, token):
+    # Chỉ xóa lock của chính mình (lock có thể đã hết hạn và bị request khác lấy)
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _build_and_store(key, cache_key, build, timeout):
+    start = time.time()
+    value = build()
+    delta = time.time() - start
+
+    ttl = jittered(timeout)
+    cache.set(cache_key, (value, delta, time.time() + ttl), timeout=ttl)
+    cache.set(_stale_key(key), value, timeout=ttl * STALE_TTL_FACTOR)
+    return value
+
+
+def get_or_build(key, build, tags=(), timeout=86400, beta=EARLY_REFRESH_BETA, allow_stale=True):
+    cache_key = tagged_key(key, *tags)
+    entry = cache.get(cache_key)
+
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not _should_refresh_early(delta, expires_at, beta):
+            return value
+
+    lock_key = _lock_key(cache_key)
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, timeout=LOCK_TIMEOUT):
+        try:
+            return _build_and_store(key, cache_key, build, timeout)
+        except Exception:
+            stale = entry[0] if entry is not None else (cache.get(_stale_key(key)) if allow_stale else None)
+            if stale is None:
+                raise
+            logger.exception("Build cache %s lỗi, trả dữ liệu stale", cache_key)
+            return stale
+        finally:
+            _release_lock(lock_key, token)
+
+    if entry is not None:
+        # Request khác đang refresh sớm, dùng giá trị hiện tại
+        return entry[0]
+
+    if allow_stale:
+        stale = cache.get(_stale_key(key))
+        if stale is not None:
+            return stale
+
+    deadline = time.time() + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return entry[0]
+
+    # Request giữ lock quá chậm hoặc đã lỗi, tự build để không treo request
+    return build()
@@ -0,0 +1,57 @@
+import time
+from django.core.cache import cache
+
+# Mỗi tag giữ một số version trong cache. Key thật = key gốc + version của các tag,
+# nên invalidate chỉ cần tăng version (1 lệnh INCR), không phải quét KEYS.
+# Các entry cũ không còn được đọc tới và tự hết hạn theo TTL.
+
+PRODUCT_TAG = "products"
+CATEGORY_TAG = "categories"
+REVIEW_TAG = "reviews"
+ORDER_TAG = "orders"
+VOUCHER_TAG = "vouchers"
+ACCOUNT_TAG = "accounts"
+ADDRESS_TAG = "addresses"
+
+
+def user_tag(tag, user_id):
+    return f"{tag}_{user_id}"
+
+
+def _version_key(tag):
+    return f"tag_version_{tag}"
+
+
+def _new_version():
+    # Dùng timestamp để version mới luôn lớn hơn version cũ,
+    # kể cả khi key version bị Redis evict.
+    return int(time.time() * 1000)
+
+
+def get_tag_versions(*tags):
+    keys = [_version_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), timeout=None)
+        versions.update(cache.get_many(missing))
+
+    return [versions.get(key, 0) for key in keys]
+
+
+def tagged_key(key, *tags):
+    if not tags:
+        return key
+    versions = get_tag_versions(*tags)
+    return f"{key}:v" + ".".join(str(v) for v in versions)
+
+
+def invalidate_tags(*tags):
+    for tag in tags:
+        key = _version_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
@@ -1,9 +1,15 @@
+from functools import lru_cache
 from decouple import config
 
+
+@lru_cache(maxsize=1)
+def get_cloud_name():
+    return config('API_CLOUD_NAME')
+
+
 def get_cloudinary_url(path):
     if not path:
         return None
-    cloud_name = config('API_CLOUD_NAME')
     if path.startswith('http'):
         return path
-    return f"https://res.cloudinary.com/{cloud_name}/{path}"
\ No newline at end of file
+    return f"https://res.cloudinary.com/{get_cloud_name()}/{path}"
@@ -1,48 +1,41 @@
-from django.core.cache import cache
+from utils.cache_tags import (
+    invalidate_tags, user_tag,
+    PRODUCT_TAG, CATEGORY_TAG, REVIEW_TAG, ORDER_TAG,
+    VOUCHER_TAG, ACCOUNT_TAG, ADDRESS_TAG,
+)
 
-def delete_product_cache():
-    KEYS = [
-        "all_products",
-        "home_featured_products",
-        "home_new_products",
-        "home_review",
-        "new_products",
-        "bs_products"
-    ]
 
-    for key in KEYS:
-        cache.delete(key)
+def delete_product_cache():
+    invalidate_tags(PRODUCT_TAG)
 
-    for key in cache.keys("category_*"):
-        cache.delete(key)
 
-    for key in cache.keys("all_products_page_*"):
-        cache.delete(key)
+def delete_category_cache():
+    # Tên category nằm trong dữ liệu sản phẩm nên cache sản phẩm cũng phải bỏ
+    invalidate_tags(CATEGORY_TAG, PRODUCT_TAG)
 
-    for key in cache.keys("product_*"):
-        cache.delete(key)
 
 def delete_review_cache():
-    cache.delete("all_reviews")
-    for key in cache.keys("all_reviews_*"):
-        cache.delete(key)
+    invalidate_tags(REVIEW_TAG)
+
 
 def delete_order_cache(id):
-    cache.delete("all_orders")
-    cache.delete("all_products")
-    cache.delete("all_orders_admin")
-    cache.delete(f"all_orders_{id}")
+    # Đơn hàng làm thay đổi tồn kho nên cache sản phẩm cũng phải bỏ
+    invalidate_tags(ORDER_TAG, user_tag(ORDER_TAG, id), PRODUCT_TAG)
 
 
 def delete_account_cache(account_id=None):
-    cache.delete("all_users")
     if account_id:
-        cache.delete(f"user_{account_id}")
+        invalidate_tags(ACCOUNT_TAG, user_tag(ACCOUNT_TAG, account_id))
+    else:
+        invalidate_tags(ACCOUNT_TAG)
 
 
 def delete_voucher_cache(user_id=None):
-    from django.core.cache import cache
     if user_id:
-        cache.delete(f"user_active_vouchers_{user_id}")
+        invalidate_tags(user_tag(VOUCHER_TAG, user_id))
     else:
-        cache.delete("all_active_vouchers")
\ No newline at end of file
+        invalidate_tags(VOUCHER_TAG)
+
+
+def delete_address_cache(account_id):
+    invalidate_tags(user_tag(ADDRESS_TAG, account_id))
@@ -0,0 +1,94 @@
+import base64
+import binascii
+import hashlib
+import json
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from utils.cache_fetch import get_or_build
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def _encode_value(value):
+    # Giữ nguyên microsecond của datetime để so sánh keyset chính xác
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        raise InvalidCursor("Cursor không hợp lệ")
+    if not isinstance(values, list):
+        raise InvalidCursor("Cursor không hợp lệ")
+    return values
+
+
+def keyset_paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, field="created_at", descending=True):
+    """
+    Phân trang keyset theo (field, pk): trang sau chỉ lọc "nhỏ hơn bản ghi cuối"
+    nên mọi trang tốn như trang đầu, không có OFFSET.
+    Trả về (items, next_cursor); next_cursor là None ở trang cuối.
+    """
+    model_field = queryset.model._meta.get_field(field)
+    direction = "-" if descending else ""
+    qs = queryset.order_by(f"{direction}{field}", f"{direction}pk")
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2:
+            raise InvalidCursor("Cursor không hợp lệ")
+        try:
+            value = model_field.to_python(values[0])
+            last_id = int(values[1])
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor("Cursor không hợp lệ")
+
+        op = "lt" if descending else "gt"
+        qs = qs.filter(
+            Q(**{f"{field}__{op}": value}) |
+            Q(**{field: value, f"pk__{op}": last_id})
+        )
+
+    items = list(qs[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([model_field.value_from_object(last), last.pk])
+
+    return items, next_cursor
+
+
+def cached_count(prefix, filters, queryset, timeout):
+    """
+    Tổng số bản ghi cho màn hình phân trang keyset: chỉ COUNT(*) 1 lần cho mỗi bộ lọc
+    rồi cache theo TTL, nên là số gần đúng (total_is_estimate).
+    filters: {tham số lọc: giá trị} dùng làm key cache.
+    """
+    key = json.dumps(sorted(filters.items()))
+    return get_or_build(f"{prefix}_{hashlib.md5(key.encode()).hexdigest()}", queryset.count, timeout=timeout)
@@ -0,0 +1,56 @@
+import gzip
+import hashlib
+import json
+import time
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+from utils.cache_fetch import get_or_build
+
+# Cache toàn bộ response JSON dưới dạng bytes đã nén gzip (kèm ETag / Last-Modified).
+# Cache hit chỉ tốn 1 lệnh GET + ghi socket, không phải unpickle dữ liệu serializer
+# rồi encode lại JSON như trước.
+
+
+def render_json_entry(payload):
+    body = json.dumps(
+        payload, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+    last_modified = int(time.time())
+    return etag, last_modified, gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+def json_bytes_response(request, entry, status=200):
+    etag, last_modified, compressed = entry
+
+    if status == 200 and _not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+    elif "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+        response = HttpResponse(compressed, status=status, content_type="application/json; charset=utf-8")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(
+            gzip.decompress(compressed), status=status, content_type="application/json; charset=utf-8"
+        )
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "no-cache"
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+def cached_json_response(request, key, build, tags=(), timeout=86400):
+    entry = get_or_build(key, lambda: render_json_entry(build()), tags=tags, timeout=timeout)
+    return json_bytes_response(request, entry)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voucher', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='uservoucher',
+            index=models.Index(fields=['user', 'is_used'], name='user_vouche_user_id_dc6ac7_idx'),
+        ),
+    ]
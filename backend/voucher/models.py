@@ -84,6 +84,9 @@ class UserVoucher(models.Model):
     class Meta:
         unique_together = ("user", "voucher")
         db_table = "user_voucher"
+        indexes = [
+            models.Index(fields=["user", "is_used"]),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.voucher.code}"
\ No newline at end of file
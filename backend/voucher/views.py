@@ -2,7 +2,8 @@ from django.utils import timezone
 from django.db.models import F
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
-from django.core.cache import cache
+from utils.cache_fetch import get_or_build
+from utils.cache_tags import user_tag, VOUCHER_TAG
 from utils.delete_cache import delete_voucher_cache
 from .models import Voucher, UserVoucher
 from .serializers import VoucherSerializer, UserVoucherSerializer
@@ -83,12 +84,9 @@ def admin_hide_voucher(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_active_vouchers(request):
-    from django.core.cache import cache
     now = timezone.now()
-    key = f"user_active_vouchers_{request.user.id}"
-    data = cache.get(key)
 
-    if not data:
+    def build():
         # FIX: Thay uservoucher -> user_vouchers
         vouchers = Voucher.objects.filter(
             user_vouchers__user=request.user,
@@ -96,9 +94,12 @@ def user_active_vouchers(request):
             end_date__gte=now,
             used_count__lt=F("quantity")
         ).order_by('end_date')
-        serializer = VoucherSerializer(vouchers, many=True)
-        data = serializer.data
-        cache.set(key, data, timeout=3600)
+        return VoucherSerializer(vouchers, many=True).data
+
+    data = get_or_build(
+        f"user_active_vouchers_{request.user.id}", build,
+        tags=(VOUCHER_TAG, user_tag(VOUCHER_TAG, request.user.id)), timeout=3600
+    )
 
     return JsonResponse({
         "success": True,
@@ -111,18 +112,16 @@ def user_active_vouchers(request):
 @permission_classes([AllowAny])
 def get_active_vouchers(request):
     now = timezone.now()
-    key = "all_active_vouchers"
-    data = cache.get(key)
 
-    if not data:
+    def build():
         vouchers = Voucher.objects.filter(
             is_active=True,
             end_date__gte=now,
             used_count__lt=F("quantity")
         ).order_by('end_date')
-        serializer = VoucherSerializer(vouchers, many=True)
-        data = serializer.data
-        cache.set(key, data, timeout=3600)
+        return VoucherSerializer(vouchers, many=True).data
+
+    data = get_or_build("all_active_vouchers", build, tags=(VOUCHER_TAG,), timeout=3600)
 
     return JsonResponse({
         "success": True,